@@ -2,22 +2,17 @@
 VERITAS Agentic Interrogator
 Human-in-the-loop reasoning when physics is ambiguous.
 """
-from google import genai
-from dotenv import load_dotenv
-import os
+from gemini_client import gemini
+from lazy import LazySingleton
+from rate_limiter import PRIORITY_BACKGROUND
 import json
 
-load_dotenv()
-
 class InterrogatorBot:
     """
     The Agentic Brain - asks clarifying questions when uncertain.
     """
     
     def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        self.client = genai.Client(api_key=api_key) if api_key else None
-        
         # Ambiguity thresholds
         self.AMBIGUITY_THRESHOLD = 0.3  # 30% uncertainty triggers questioning
         
@@ -184,11 +179,12 @@ class InterrogatorBot:
             "user_context": answer
         }
     
-    def generate_explanation(self, physics_results: list, verdict: str) -> str:
+    async def generate_explanation(self, physics_results: list, verdict: str, timeout: float = 20) -> str:
         """
         Generate human-readable explanation using Gemini.
+        Awaits the async client so callers on the event loop are never blocked.
         """
-        if not self.client:
+        if not gemini.available:
             # Fallback without API
             explanations = []
             for result in physics_results:
@@ -218,13 +214,9 @@ Physics analysis results:
 Write a brief, compelling explanation (2-3 sentences) that a non-scientist can understand.
 Focus on the specific physics violation if any."""
 
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt
-            )
-            return response.text
-        except:
+            return await gemini.generate_text(prompt, timeout=timeout, priority=PRIORITY_BACKGROUND)
+        except Exception:
             return "Analysis complete. See detailed results above."
 
-# Singleton
-interrogator = InterrogatorBot()
+# Singleton (built on first use)
+interrogator = LazySingleton(InterrogatorBot, "interrogator")
@@ -0,0 +1,251 @@
+"""
+VERITAS Batch Runner
+Offline analysis of a directory or manifest of videos through the same
+pipeline as /ws/analyze.
+
+Run from backend/:
+    python batch_runner.py videos/ --out results.jsonl
+    python batch_runner.py manifest.txt --out results.jsonl --parquet results.parquet
+
+A manifest is a text file with one path per line, or JSONL with a "path"
+field. --out doubles as the checkpoint: rerunning the same command skips
+every video that already has an "ok" row, so an interrupted run resumes
+where it stopped. Failed videos are retried on resume; the last row for a
+path is the one that counts.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".webm", ".mkv", ".avi", ".m4v"}
+
+
+def iter_videos(source: str):
+    """Paths from a directory (recursive) or a manifest file, in a stable order"""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS:
+                    yield os.path.join(root, name)
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = json.loads(line)["path"] if line.startswith("{") else line
+            yield path if os.path.isabs(path) else os.path.join(base, path)
+
+
+def load_checkpoint(out_path: str) -> set:
+    """Paths that already have a successful row in the output file"""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # torn last line of an interrupted run
+            if row.get("status") == "ok":
+                done.add(row["path"])
+            else:
+                done.discard(row.get("path"))
+    return done
+
+
+class CollectingSocket:
+    """
+    Stands in for the WebSocket: keeps the events a batch row needs instead
+    of sending them anywhere.
+    """
+
+    def __init__(self):
+        self.verdict = None
+        self.physics = None
+        self.objects = None
+        self.cached = False
+        self.warnings = []
+
+    async def send_json(self, data: dict):
+        kind = data.get("type")
+        if kind == "verdict":
+            self.verdict = data
+        elif kind == "physics_update":
+            self.physics = {k: v for k, v in data.items() if k not in ("type", "ts")}
+        elif kind == "objects_detected":
+            self.objects = data.get("objects")
+        elif kind == "log":
+            message = data.get("message", "")
+            if message.startswith("⚠"):
+                self.warnings.append(message)
+            elif "loading cached verdict" in message:
+                self.cached = True
+
+
+async def analyze_one(pipeline, path: str, timeout: float) -> dict:
+    from session_store import session_store
+    from video_ingest import LocalVideo
+
+    row = {"path": path, "video_hash": None, "status": "error", "verdict": None}
+    start = time.monotonic()
+    session_id = f"batch-{uuid.uuid4().hex}"
+    try:
+        video = await asyncio.to_thread(LocalVideo, path)
+        row["video_hash"] = video.sha256
+
+        state = session_store.create(session_id, mode="fast")
+        state.attach_video(video, owned=False)
+        sink = CollectingSocket()
+        state.task = asyncio.ensure_future(pipeline.run_full_analysis(sink, session_id))
+        await asyncio.wait_for(state.task, timeout)
+
+        verdict = sink.verdict
+        if verdict is None:
+            row["error"] = "pipeline finished without a verdict"
+        else:
+            row.update({
+                # A demo verdict is a fallback after a Gemini failure, not a result
+                "status": "fallback" if verdict.get("demo") else "ok",
+                "verdict": verdict.get("result"),
+                "confidence": verdict.get("confidence"),
+                "gravity": verdict.get("gravity"),
+                "reason": verdict.get("reason"),
+                "physics": sink.physics,
+                "objects": len(sink.objects or []),
+                "cached": sink.cached
+            })
+        if sink.warnings:
+            row["warnings"] = sink.warnings
+    except asyncio.TimeoutError:
+        row["error"] = f"timed out after {timeout:.0f}s"
+    except OSError as e:
+        row["error"] = f"unreadable video: {e}"
+    except Exception as e:
+        row["error"] = str(e)
+    finally:
+        session_store.close(session_id)
+    row["seconds"] = round(time.monotonic() - start, 2)
+    row["finished_at"] = round(time.time(), 3)
+    return row
+
+
+async def run_batch(source: str, out_path: str, concurrency: int, timeout: float,
+                    limit: int = None, resume: bool = True) -> dict:
+    import main as pipeline  # pulls in FastAPI, Gemini and the physics stack
+
+    if not pipeline.gemini.available:
+        raise SystemExit("GEMINI_API_KEY is not set - batch analysis needs the real pipeline, not demo mode")
+
+    done = load_checkpoint(out_path) if resume else set()
+    counts = {"ok": 0, "fallback": 0, "error": 0, "skipped": 0}
+    queue = asyncio.Queue(maxsize=concurrency * 2)  # keeps huge manifests out of memory
+    started = time.monotonic()
+
+    with open(out_path, "a" if resume else "w", encoding="utf-8") as out:
+        async def worker():
+            while True:
+                path = await queue.get()
+                if path is None:
+                    return
+                row = await analyze_one(pipeline, path, timeout)
+                counts[row["status"]] += 1
+                out.write(json.dumps(row) + "\n")
+                out.flush()  # every finished video is checkpointed
+                finished = counts["ok"] + counts["fallback"] + counts["error"]
+                rate = finished / max(time.monotonic() - started, 1e-9)
+                print(f"[{finished}] {row['status']:>8} {row.get('verdict') or '-':>9} "
+                      f"{row['seconds']:6.1f}s  {rate * 60:5.1f}/min  {path}"
+                      + (f"  ({row['error']})" if row.get("error") else ""))
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        queued = 0
+        for path in iter_videos(source):
+            if path in done:
+                counts["skipped"] += 1
+                continue
+            if limit is not None and queued >= limit:
+                break
+            await queue.put(path)
+            queued += 1
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    pipeline.history_store.flush()
+    pipeline.cpu_pool.shutdown()
+    counts["seconds"] = round(time.monotonic() - started, 1)
+    return counts
+
+
+def export_parquet(jsonl_path: str, parquet_path: str) -> int:
+    """Latest row per path as a flat Parquet table; returns the row count"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    latest = {}
+    with open(jsonl_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            latest[row["path"]] = row
+
+    columns = ["path", "video_hash", "status", "verdict", "confidence", "gravity", "reason",
+               "objects", "cached", "seconds", "finished_at", "error"]
+    records = []
+    for row in latest.values():
+        record = {name: row.get(name) for name in columns}
+        record["physics"] = json.dumps(row["physics"]) if row.get("physics") else None
+        record["warnings"] = row.get("warnings") or []
+        records.append(record)
+    schema = pa.schema([
+        ("path", pa.string()), ("video_hash", pa.string()), ("status", pa.string()),
+        ("verdict", pa.string()), ("confidence", pa.float64()), ("gravity", pa.float64()),
+        ("reason", pa.string()), ("objects", pa.int32()), ("cached", pa.bool_()),
+        ("seconds", pa.float64()), ("finished_at", pa.float64()), ("error", pa.string()),
+        ("physics", pa.string()), ("warnings", pa.list_(pa.string()))
+    ])
+    pq.write_table(pa.Table.from_pylist(records, schema=schema), parquet_path, compression="zstd")
+    return len(records)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse a directory or manifest of videos offline.")
+    parser.add_argument("source", help="directory of videos, or a manifest (one path per line / JSONL with 'path')")
+    parser.add_argument("--out", default="batch_results.jsonl", help="JSONL results, also the resume checkpoint")
+    parser.add_argument("--parquet", help="also write the latest row per video to this Parquet file")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("VERITAS_BATCH_CONCURRENCY", "8")),
+                        help="videos analysed at once (Gemini quota is shared through the rate limiter)")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds allowed per video")
+    parser.add_argument("--limit", type=int, help="analyse at most this many new videos")
+    parser.add_argument("--no-resume", action="store_true", help="ignore and overwrite existing results")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not os.path.exists(args.source):
+        print(f"No such directory or manifest: {args.source}", file=sys.stderr)
+        return 2
+    counts = asyncio.run(run_batch(args.source, args.out, max(1, args.concurrency), args.timeout,
+                                   args.limit, resume=not args.no_resume))
+    print(f"\n✓ {counts['ok']} ok, {counts['fallback']} fallback, {counts['error']} failed, "
+          f"{counts['skipped']} already done in {counts['seconds']}s -> {args.out}")
+    if args.parquet:
+        rows = export_parquet(args.out, args.parquet)
+        print(f"✓ {rows} rows -> {args.parquet}")
+    return 0 if counts["fallback"] + counts["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
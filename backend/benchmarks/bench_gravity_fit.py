@@ -0,0 +1,59 @@
+"""
+VERITAS Benchmark - Gravity Fit
+Compares the legacy scipy curve_fit path with the closed-form fits.
+
+Run from backend/:  python benchmarks/bench_gravity_fit.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.optimize import curve_fit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from gravity_fit import fit_parabola, fit_parabola_batch
+
+
+def parabolic_model(t, v0, g, h0):
+    return h0 + v0*t - 0.5*g*t**2
+
+
+def make_trajectories(n_trajectories, n_points, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0, 1.5, n_points)
+    g = rng.uniform(8, 14, (n_trajectories, 1))
+    v0 = rng.uniform(-2, 2, (n_trajectories, 1))
+    h0 = rng.uniform(5, 15, (n_trajectories, 1))
+    y = h0 + v0*t - 0.5*g*t**2 + rng.normal(0, 0.02, (n_trajectories, n_points))
+    return t, y, g[:, 0]
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    print(f"{'points':>8} {'trajs':>7} {'curve_fit':>12} {'closed-form':>12} {'batch':>12} {'max |dg|':>10}")
+    for n_points in (10, 60, 500):
+        n_trajectories = 2000
+        t, y, _ = make_trajectories(n_trajectories, n_points)
+
+        t_curve, g_curve = timed(lambda: np.array([curve_fit(parabolic_model, t, row)[0][1] for row in y]), repeat=1)
+        t_closed, g_closed = timed(lambda: np.array([fit_parabola(t, row)["g"] for row in y]))
+        t_batch, batch = timed(lambda: fit_parabola_batch(t, y))
+
+        max_diff = max(np.max(np.abs(g_curve - g_closed)), np.max(np.abs(g_curve - batch["g"])))
+        print(f"{n_points:>8} {n_trajectories:>7} "
+              f"{t_curve / n_trajectories * 1e6:>9.1f} us {t_closed / n_trajectories * 1e6:>9.1f} us "
+              f"{t_batch / n_trajectories * 1e6:>9.2f} us {max_diff:>10.2e}")
+
+
+if __name__ == "__main__":
+    main()
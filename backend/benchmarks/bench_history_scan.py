@@ -0,0 +1,75 @@
+"""
+VERITAS Benchmark - Analysis History Scans
+Write throughput of HistoryStore and latency of filtered scans (full table,
+verdict + motion_type, one-day time range) before and after compaction.
+
+Run from backend/:  python benchmarks/bench_history_scan.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from history_store import HistoryStore, available
+
+MOTION_TYPES = ["pendulum", "free_fall", "projectile", "collision", "unknown"]
+
+
+def make_entry(ts, rng):
+    violating = rng.random() < 0.3
+    return {
+        "ts": ts,
+        "verdict": "synthetic" if violating else "authentic",
+        "confidence": rng.uniform(50, 99),
+        "motion_type": rng.choice(MOTION_TYPES),
+        "gravity": rng.gauss(12 if violating else 9.8, 0.5),
+        "checks": [
+            {"check": "GRAVITY", "status": "VIOLATION" if violating else "PASS", "calculated_g": 9.8},
+            {"check": "SHADOWS", "status": "PASS", "variance": rng.uniform(0, 10)}
+        ],
+        "measurements": {"period": rng.uniform(1.5, 2.1), "length": 1.0}
+    }
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(n=200_000, days=30):
+    if not available():
+        print("pyarrow not installed")
+        return
+    rng = random.Random(0)
+    store = HistoryStore(tempfile.mkdtemp(prefix="veritas-history-"), max_batch=5_000, max_delay=60)
+    now = time.time()
+
+    start = time.perf_counter()
+    for i in range(n):
+        store.record(make_entry(now - rng.uniform(0, days * 86400), rng))
+    store.flush()
+    print(f"wrote {n} verdicts in {time.perf_counter() - start:.2f}s ({store.files_written} parts)")
+
+    queries = {
+        "all": lambda: store.scan(columns=["verdict"]),
+        "synthetic pendulum": lambda: store.scan(verdict="synthetic", motion_type="pendulum"),
+        "last day": lambda: store.scan(start=now - 86400, end=now + 1)
+    }
+    for label in ("fragmented", "compacted"):
+        if label == "compacted":
+            for day in store.days():
+                store.compact(day)
+        for name, query in queries.items():
+            seconds, table = timed(query)
+            print(f"{label:>10} {name:>20} {table.num_rows:>8} rows {seconds * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
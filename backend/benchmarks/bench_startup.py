@@ -0,0 +1,71 @@
+"""
+VERITAS Benchmark - Startup Time
+Import time of each backend module in a fresh interpreter (what a spawned
+CPU worker or autoscaled replica pays), and the deferred cost of building
+its lazy singleton on first use.
+
+Run from backend/:  python benchmarks/bench_startup.py
+"""
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# module -> lazy singleton built on first use (None if the module has none)
+MODULES = {
+    "gravity_fit": None,
+    "physics_engine": None,
+    "motion_tracker": None,
+    "gemini_client": "gemini",
+    "vision_engine": "vision_kernel",
+    "agentic_bot": "interrogator",
+    "knowledge_base": "knowledge_base",
+    "main": None,
+}
+
+PROBE = """
+import time
+start = time.perf_counter()
+import {module} as m
+print("import", time.perf_counter() - start, flush=True)
+if {singleton!r}:
+    start = time.perf_counter()
+    getattr(m, {singleton!r}).warm_up()
+    print("build", time.perf_counter() - start)
+"""
+
+
+def probe(module, singleton):
+    """Return ({"import": s, "build": s}, error) from a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, singleton=singleton)],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    timings = {}
+    for line in result.stdout.splitlines():
+        label, _, seconds = line.partition(" ")
+        if label in ("import", "build"):
+            timings[label] = float(seconds)
+    error = None
+    if result.returncode != 0:
+        error = (result.stderr.strip().splitlines() or ["failed"])[-1]
+    return timings, error
+
+
+def fmt(runs, label):
+    values = [timings[label] for timings, _ in runs if label in timings]
+    return f"{min(values) * 1e3:7.1f} ms" if values else f"{'-':>10}"
+
+
+def main(repeat=3):
+    print(f"{'module':>16} {'import':>10} {'first use':>10}")
+    for module, singleton in MODULES.items():
+        runs = [probe(module, singleton) for _ in range(repeat)]
+        error = next((error for _, error in runs if error), None)
+        note = f"   ({error[:60]})" if error else ""
+        print(f"{module:>16} {fmt(runs, 'import')} {fmt(runs, 'build')}{note}")
+
+
+if __name__ == "__main__":
+    main()
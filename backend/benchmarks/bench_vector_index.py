@@ -0,0 +1,52 @@
+"""
+VERITAS Benchmark - Signature Vector Index
+Query latency and recall of VectorIndex in exact and IVF mode.
+
+Run from backend/:  python benchmarks/bench_vector_index.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from vector_index import VectorIndex, FEATURES
+
+
+def make_signatures(n, seed=0):
+    """Clustered vectors: a few anomaly 'families' plus noise, like real signatures"""
+    rng = np.random.default_rng(seed)
+    dim = len(FEATURES)
+    families = rng.normal(0, 3, (32, dim))
+    return (families[rng.integers(0, len(families), n)] + rng.normal(0, 0.5, (n, dim))).astype(np.float32)
+
+
+def main(k=3, n_queries=500):
+    print(f"{'vectors':>10} {'mode':>6} {'build':>9} {'query':>10} {'recall@' + str(k):>9}")
+    for n in (1_000, 20_000, 200_000, 1_000_000):
+        X = make_signatures(n)
+        queries = make_signatures(n_queries, seed=1)
+
+        index = VectorIndex(dim=len(FEATURES))
+        start = time.perf_counter()
+        index.add(range(n), X)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = [index.search(q, k) for q in queries]
+        query = (time.perf_counter() - start) / n_queries
+
+        X_sq = np.einsum("ij,ij->i", X, X)
+        hits = 0
+        for q, found in zip(queries[:100], results[:100]):
+            exact = np.argpartition(X_sq - 2 * X @ q, k)[:k]
+            hits += len(set(exact.tolist()) & {i for i, _ in found})
+
+        print(f"{n:>10} {'exact' if index.exact else 'ivf':>6} {build:>8.2f}s "
+              f"{query * 1e3:>7.3f} ms {hits / (100 * k):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
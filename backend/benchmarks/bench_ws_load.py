@@ -0,0 +1,315 @@
+"""
+VERITAS Benchmark - WebSocket Load Test
+Runs the real server (uvicorn main:app) against a stub Gemini endpoint and
+drives concurrent /ws/analyze sessions through upload -> analysis -> verdict.
+Measures end-to-end latency and throughput without model latency or quota
+in the way (add some with --gemini-latency).
+
+Needs the server's dependencies plus `websockets` (installed with uvicorn[standard]).
+
+Run from backend/:  python benchmarks/bench_ws_load.py --clients 20 --analyses 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def _trajectory_points(g=9.81, scene_height=10.0, n=30):
+    points = []
+    for i in range(n):
+        t = i / 30
+        height = 9.0 - 0.5 * g * t * t
+        points.append({"t": round(t, 4), "x": 0.5, "y": round(1 - height / scene_height, 4)})
+    return points
+
+
+# Canned answers, chosen by a keyword of the prompt they answer (first match wins)
+_DETECTION_ANSWER = {
+    "objects": [{"name": "ball", "type": "moving"}],
+    "motion_type": "free_fall",
+    "primary_subject": "ball",
+    "scene_description": "A ball dropped onto a table"
+}
+_TRAJECTORY_ANSWER = {
+    "motion_type": "free_fall",
+    "measurements": {"fall_time": 0.97, "fall_distance": 4.6, "scene_height_m": 10.0},
+    "trajectory_points": _trajectory_points(),
+    "anomalies_detected": [],
+    "physics_looks_real": True,
+    "confidence": 0.9
+}
+
+STUB_ANSWERS = [
+    ("single pass", {**_DETECTION_ANSWER, **_TRAJECTORY_ANSWER}),  # VERITAS_PROMPT_MODE=combined
+    ("trajectory_points", _TRAJECTORY_ANSWER),
+    ("shadows", {"shadows": [{"object": "ball", "angle": 44.0}, {"object": "table", "angle": 46.0}],
+                 "light_sources": 1}),
+    ("reflections", {"reflections": []}),
+    ("physically impossible", {"anomalies": []}),
+    ("", _DETECTION_ANSWER)
+]
+
+
+class StubGemini:
+    """
+    Minimal HTTP/1.1 server answering generateContent like the Gemini API, and
+    streamGenerateContent as server-sent events carrying `stream_chunks` pieces.
+    `latency` (seconds, +-50% jitter) and `error_rate` (429 RESOURCE_EXHAUSTED)
+    emulate a loaded backend.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0, stream_chunks: int = 8):
+        self.latency = latency
+        self.stream_chunks = stream_chunks
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        port = self._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def answer_text(self, body: str) -> str:
+        for keyword, payload in STUB_ANSWERS:
+            if keyword in body:
+                return json.dumps(payload)
+
+    @staticmethod
+    def response(body: str, text: str, finished: bool = True) -> dict:
+        candidate = {"content": {"role": "model", "parts": [{"text": text}]}}
+        if finished:
+            candidate["finishReason"] = "STOP"
+        return {
+            "candidates": [candidate],
+            "usageMetadata": {"promptTokenCount": len(body) // 4, "candidatesTokenCount": len(text) // 4,
+                              "totalTokenCount": (len(body) + len(text)) // 4}
+        }
+
+    def answer(self, body: str) -> dict:
+        return self.response(body, self.answer_text(body))
+
+    def answer_stream(self, body: str) -> bytes:
+        text = self.answer_text(body)
+        size = -(-len(text) // self.stream_chunks)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        return b"".join(
+            f"data: {json.dumps(self.response(body, piece, finished=i == len(pieces) - 1))}\r\n\r\n".encode()
+            for i, piece in enumerate(pieces)
+        )
+
+    async def _respond(self, path: str, body: str):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * self._rng.uniform(0.5, 1.5))
+        if self._rng.random() < self.error_rate:
+            self.errors += 1
+            return "429 Too Many Requests", {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED",
+                                                       "message": "Resource has been exhausted (stub)"}}
+        if "streamGenerateContent" in path:
+            return "200 OK", self.answer_stream(body)
+        return "200 OK", self.answer(body)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+                headers = dict(line.lower().split(":", 1) for line in head[1:] if ":" in line)
+                body = await reader.readexactly(int(headers.get("content-length", "0").strip()))
+                status, payload = await self._respond(head[0], body.decode("utf-8", "replace"))
+                if isinstance(payload, bytes):
+                    data, content_type = payload, "text/event-stream"
+                else:
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                             f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass  # client went away, or the stub is shutting down
+        finally:
+            writer.close()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, gemini_url: str, prompt_mode: str = "two_step") -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "GEMINI_API_KEY": "stub-key",
+        "GEMINI_BASE_URL": gemini_url,
+        "GEMINI_RPM": "1000000",
+        "GEMINI_BURST": "1000",
+        "VERITAS_PIPELINE_MODE": "fast",
+        "VERITAS_PROMPT_MODE": prompt_mode,
+        "VERITAS_HISTORY_DIR": ""
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with code {server.returncode}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("server did not become ready within 60s")
+
+
+async def one_analysis(url: str, video: bytes, chunk_size: int = 1024 * 1024) -> dict:
+    import websockets
+
+    async with websockets.connect(url, max_size=None) as ws:
+        async def wait_for(kind):
+            while True:
+                message = json.loads(await ws.recv())
+                if message["type"] == kind:
+                    return message
+                if message["type"] == "upload_error":
+                    raise RuntimeError(message["message"])
+
+        await ws.send(json.dumps({"type": "upload_start"}))
+        await wait_for("upload_ready")
+        for start in range(0, len(video), chunk_size):
+            await ws.send(video[start:start + chunk_size])
+        await ws.send(json.dumps({"type": "upload_end"}))
+        await wait_for("upload_complete")
+
+        started = time.perf_counter()
+        await ws.send(json.dumps({"type": "start_analysis", "mode": "fast"}))
+        verdict = await wait_for("verdict")
+        return {"seconds": time.perf_counter() - started, "demo": bool(verdict.get("demo"))}
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def stage_breakdown(metrics_text: str) -> dict:
+    """Mean seconds per critical-path stage from the server's /metrics"""
+    sums, counts = {}, {}
+    for name, stage, value in re.findall(r'veritas_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)', metrics_text):
+        (sums if name == "sum" else counts)[stage] = float(value)
+    return {stage: sums[stage] / counts[stage] for stage in sums if counts.get(stage)}
+
+
+async def load_test(clients: int = 10, analyses: int = 100, video_bytes: int = 256 * 1024,
+                    repeat_video: bool = False, gemini_latency: float = 0.0, error_rate: float = 0.0,
+                    video_path: str = None, prompt_mode: str = "two_step") -> dict:
+    stub = StubGemini(latency=gemini_latency, error_rate=error_rate)
+    gemini_url = await stub.start()
+    port = free_port()
+    server = await asyncio.to_thread(start_server, port, gemini_url, prompt_mode)
+    url = f"ws://127.0.0.1:{port}/ws/analyze"
+
+    base_video = open(video_path, "rb").read() if video_path else os.urandom(video_bytes)
+    remaining = iter(range(analyses))
+    latencies, failures, fallbacks = [], [], 0
+
+    async def client():
+        nonlocal fallbacks
+        for i in remaining:
+            # A unique suffix per analysis keeps the result cache out of the way
+            video = base_video if repeat_video else base_video + i.to_bytes(8, "little")
+            try:
+                result = await one_analysis(url, video)
+            except Exception as e:
+                failures.append(str(e))
+                continue
+            latencies.append(result["seconds"])
+            fallbacks += result["demo"]
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+        metrics = await asyncio.to_thread(
+            lambda: urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode())
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        await stub.close()
+
+    if not latencies:
+        raise RuntimeError(f"no analysis completed ({failures[:1] or 'unknown error'})")
+    return {
+        "completed": len(latencies),
+        "failed": len(failures),
+        "fallback": fallbacks,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "gemini_requests": stub.requests,
+        "gemini_errors": stub.errors,
+        "stages": stage_breakdown(metrics)
+    }
+
+
+def harness_results(result: dict) -> dict:
+    """Load-test numbers as seconds (lower is better) for the baseline file"""
+    return {
+        "ws_load.p50_latency": result["p50"],
+        "ws_load.p95_latency": result["p95"],
+        "ws_load.seconds_per_analysis": 1 / result["throughput"]
+    }
+
+
+def print_result(result: dict):
+    print(f"completed {result['completed']} analyses in {result['elapsed']:.1f}s "
+          f"({result['throughput']:.1f}/s), {result['failed']} failed, {result['fallback']} fell back to demo")
+    print(f"latency p50 {result['p50'] * 1e3:.0f} ms  p95 {result['p95'] * 1e3:.0f} ms  p99 {result['p99'] * 1e3:.0f} ms")
+    print(f"stub Gemini: {result['gemini_requests']} requests, {result['gemini_errors']} injected errors")
+    for stage, seconds in result["stages"].items():
+        print(f"{stage:>14} {seconds * 1e3:9.1f} ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="WebSocket load test against a stub Gemini")
+    parser.add_argument("--clients", type=int, default=10, help="concurrent WebSocket sessions")
+    parser.add_argument("--analyses", type=int, default=100, help="analyses in total")
+    parser.add_argument("--video", help="video file to upload (default: random bytes)")
+    parser.add_argument("--video-kb", type=int, default=256, help="size of the random video")
+    parser.add_argument("--repeat-video", action="store_true", help="upload identical bytes (exercises the result cache)")
+    parser.add_argument("--gemini-latency", type=float, default=0.0, help="mean stub latency per call (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub calls answered with 429")
+    parser.add_argument("--prompt-mode", choices=("two_step", "combined"), default="two_step",
+                        help="VERITAS_PROMPT_MODE of the server under test")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = asyncio.run(load_test(args.clients, args.analyses, args.video_kb * 1024, args.repeat_video,
+                                   args.gemini_latency, args.error_rate, args.video, args.prompt_mode))
+    print_result(result)
+
+
+if __name__ == "__main__":
+    main()
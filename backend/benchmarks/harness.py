@@ -0,0 +1,112 @@
+"""
+VERITAS Benchmark Harness
+Registry of micro-benchmark cases, timing and baseline comparison.
+
+Cases register a setup function that returns the zero-argument callable to
+time; setup cost is never measured. Every result is seconds per call (or
+per analysis for the load test), so lower is always better.
+"""
+import json
+import os
+import platform
+import sys
+import timeit
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+CASES = {}  # name -> setup function
+
+
+def case(name: str):
+    """Register `setup()` -> callable as benchmark `name`"""
+    def register(setup):
+        if name in CASES:
+            raise ValueError(f"Benchmark {name} registered twice")
+        CASES[name] = setup
+        return setup
+    return register
+
+
+class Skip(Exception):
+    """Raised by a setup function when the case cannot run here (missing dependency)."""
+
+
+def measure(fn, repeat: int = 5, min_time: float = 0.2) -> float:
+    """Best-of-`repeat` seconds per call, each repeat looping for at least `min_time`"""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run_cases(pattern: str = None, repeat: int = 5) -> tuple:
+    """Run every case whose name contains `pattern`; returns (results, skipped)"""
+    results, skipped = {}, {}
+    for name, setup in CASES.items():
+        if pattern and pattern not in name:
+            continue
+        try:
+            fn = setup()
+        except Skip as e:
+            skipped[name] = str(e)
+            continue
+        results[name] = measure(fn, repeat=repeat)
+    return results, skipped
+
+
+def machine() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(terse=True),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count()
+    }
+
+
+def load_baseline(path: str = BASELINE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {"machine": None, "results": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results: dict, path: str = BASELINE_PATH, merge: bool = True):
+    """Store `results` as the new baseline (keeping cases that were not run)"""
+    baseline = load_baseline(path) if merge else {"results": {}}
+    baseline["machine"] = machine()
+    baseline["results"].update({name: float(f"{value:.4g}") for name, value in results.items()})
+    baseline["results"] = dict(sorted(baseline["results"].items()))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2)
+        f.write("\n")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """[(name, seconds, baseline_seconds, ratio)] for every case slower than baseline * (1 + tolerance)"""
+    regressions = []
+    for name, seconds in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if reference and seconds > reference * (1 + tolerance):
+            regressions.append((name, seconds, reference, seconds / reference))
+    return regressions
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.1f} ns"
+
+
+def report(results: dict, baseline: dict, skipped: dict = None, out=sys.stdout):
+    reference = baseline.get("results", {})
+    width = max([len(name) for name in results] + [10])
+    print(f"{'case':<{width}} {'time':>11} {'baseline':>11} {'ratio':>7}", file=out)
+    for name, seconds in results.items():
+        base = reference.get(name)
+        ratio = f"{seconds / base:6.2f}x" if base else f"{'new':>7}"
+        base_text = format_seconds(base) if base else f"{'-':>11}"
+        print(f"{name:<{width}} {format_seconds(seconds)} {base_text} {ratio}", file=out)
+    for name, reason in (skipped or {}).items():
+        print(f"{name:<{width}} {'skipped':>11}  ({reason})", file=out)
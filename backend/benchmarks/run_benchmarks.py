@@ -0,0 +1,77 @@
+"""
+VERITAS Benchmark Runner
+Runs the registered benchmark cases (and optionally the WebSocket load test)
+and compares them with the stored baselines in benchmarks/baselines.json.
+
+Run from backend/:
+    python benchmarks/run_benchmarks.py                 # compare, exit 1 on regression
+    python benchmarks/run_benchmarks.py -k physics      # only matching cases
+    python benchmarks/run_benchmarks.py --load          # include the WebSocket load test
+    python benchmarks/run_benchmarks.py --update        # store these results as the baseline
+
+Baselines are machine-specific: refresh them with --update on the machine
+that runs the comparison (e.g. the CI runner) before relying on them.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import harness
+import cases  # noqa: F401  (registers the cases)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run VERITAS benchmarks against stored baselines")
+    parser.add_argument("-k", dest="pattern", help="only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repeats per case (best is kept)")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before a case counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=harness.BASELINE_PATH, help="baseline file")
+    parser.add_argument("--update", action="store_true", help="write results to the baseline file")
+    parser.add_argument("--load", action="store_true", help="also run the WebSocket load test")
+    parser.add_argument("--load-clients", type=int, default=10)
+    parser.add_argument("--load-analyses", type=int, default=100)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    baseline = harness.load_baseline(args.baseline)
+    if baseline.get("machine") and baseline["machine"] != harness.machine():
+        print(f"⚠️ Baseline was recorded on {baseline['machine']}, this is {harness.machine()}\n")
+
+    results, skipped = harness.run_cases(args.pattern, repeat=args.repeat)
+
+    if args.load:
+        import bench_ws_load
+        try:
+            load = asyncio.run(bench_ws_load.load_test(args.load_clients, args.load_analyses))
+            bench_ws_load.print_result(load)
+            print()
+            results.update(bench_ws_load.harness_results(load))
+        except Exception as e:
+            skipped["ws_load"] = str(e)
+
+    harness.report(results, baseline, skipped)
+
+    if args.update:
+        harness.save_baseline(results, args.baseline)
+        print(f"\n✓ Baseline updated: {len(results)} cases -> {args.baseline}")
+        return 0
+
+    regressions = harness.compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+        for name, seconds, reference, ratio in regressions:
+            print(f"  {name}: {harness.format_seconds(seconds).strip()} vs "
+                  f"{harness.format_seconds(reference).strip()} ({ratio:.2f}x)")
+        return 1
+    print("\n✓ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
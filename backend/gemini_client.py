@@ -0,0 +1,180 @@
+"""
+VERITAS Gemini Client
+Non-blocking access to Gemini shared by every analysis session.
+"""
+from dotenv import load_dotenv
+from lazy import LazySingleton
+from metrics import gemini_request_seconds, gemini_queue_seconds, gemini_retries, gemini_tokens
+from rate_limiter import RateLimiter, RetryBudgetExhausted, PRIORITY_NORMAL, is_retryable
+import asyncio
+import itertools
+import os
+import time
+
+load_dotenv()
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+
+class GeminiClient:
+    """
+    Async wrapper around the google-genai client.
+    Uses the native `client.aio` API so a slow model call never blocks the
+    event loop, bounds the number of in-flight requests and applies a
+    per-call timeout. Every call goes through one RateLimiter, which keeps
+    the process within quota and retries 429/503 responses with backoff.
+    """
+
+    def __init__(self):
+        api_key = os.getenv("GEMINI_API_KEY")
+        if api_key:
+            from google import genai  # slow import, paid on first use only
+            # GEMINI_BASE_URL points the client at a proxy or a stub server (load tests)
+            base_url = os.getenv("GEMINI_BASE_URL")
+            self.client = genai.Client(api_key=api_key,
+                                       http_options={"base_url": base_url} if base_url else None)
+        else:
+            self.client = None
+
+        self.model = os.getenv("GEMINI_MODEL", DEFAULT_MODEL)
+        self.timeout = float(os.getenv("GEMINI_TIMEOUT", "60"))
+        self.max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+        self.limiter = RateLimiter(
+            rate_per_minute=float(os.getenv("GEMINI_RPM", "60")),
+            burst=int(os.getenv("GEMINI_BURST", "10")),
+            max_attempts=int(os.getenv("GEMINI_MAX_ATTEMPTS", "4"))
+        )
+
+        # Created lazily so the semaphore binds to the running event loop
+        self._semaphore = None
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def generate(self, contents, model: str = None, timeout: float = None,
+                       priority: int = PRIORITY_NORMAL, config: dict = None):
+        """
+        Run a generate_content call and return the response. `config` is
+        passed through as the GenerateContentConfig (e.g. a response_schema).
+        Raises asyncio.TimeoutError if an attempt exceeds `timeout` seconds;
+        cancelling the awaiting task cancels the underlying request.
+        Quota/transient errors are retried up to the limiter's max_attempts;
+        RetryBudgetExhausted is raised when the shared retry budget is spent.
+        """
+        if not self.client:
+            raise RuntimeError("GEMINI_API_KEY not configured")
+
+        for attempt in itertools.count():
+            start = await self._acquire(priority)
+            try:
+                async with self._get_semaphore():
+                    response = await asyncio.wait_for(
+                        self.client.aio.models.generate_content(
+                            model=model or self.model,
+                            contents=contents,
+                            config=config
+                        ),
+                        timeout=timeout or self.timeout
+                    )
+            except Exception as e:
+                self._retry_or_raise(attempt, e, start)
+                continue
+
+            self._record_success(response, start)
+            return response
+
+    async def stream(self, contents, model: str = None, timeout: float = None,
+                     priority: int = PRIORITY_NORMAL, config: dict = None):
+        """
+        Async iterator over the text chunks of a generate_content_stream call.
+        `timeout` bounds the wait for each chunk. Failures before the first
+        chunk are retried like generate(); once text has been yielded an
+        error is raised to the caller, who may already have acted on it.
+        """
+        if not self.client:
+            raise RuntimeError("GEMINI_API_KEY not configured")
+
+        timeout = timeout or self.timeout
+        for attempt in itertools.count():
+            start = await self._acquire(priority)
+            streamed = False
+            last = None
+            try:
+                async with self._get_semaphore():
+                    chunks = await asyncio.wait_for(
+                        self.client.aio.models.generate_content_stream(
+                            model=model or self.model,
+                            contents=contents,
+                            config=config
+                        ),
+                        timeout=timeout
+                    )
+                    chunks = chunks.__aiter__()
+                    while True:
+                        try:
+                            last = await asyncio.wait_for(chunks.__anext__(), timeout=timeout)
+                        except StopAsyncIteration:
+                            break
+                        text = last.text
+                        if text:
+                            streamed = True
+                            yield text
+            except Exception as e:
+                if streamed:
+                    gemini_request_seconds.observe(time.perf_counter() - start, "error")
+                    raise
+                self._retry_or_raise(attempt, e, start)
+                continue
+
+            self._record_success(last, start)
+            return
+
+    async def _acquire(self, priority: int) -> float:
+        """Wait for the rate limiter; returns the attempt's start time"""
+        queued = time.perf_counter()
+        await self.limiter.acquire(priority)
+        start = time.perf_counter()
+        gemini_queue_seconds.observe(start - queued, priority)
+        return start
+
+    def _retry_or_raise(self, attempt: int, exc: Exception, start: float):
+        """Record a failed attempt, then re-raise it or back off before the next one"""
+        outcome = "timeout" if isinstance(exc, asyncio.TimeoutError) else "error"
+        gemini_request_seconds.observe(time.perf_counter() - start, outcome)
+        if not is_retryable(exc) or attempt + 1 >= self.limiter.max_attempts:
+            raise exc
+        if not self.limiter.spend_retry():
+            raise RetryBudgetExhausted("Gemini retry budget exhausted") from exc
+        gemini_retries.inc(1, getattr(exc, "code", None) or type(exc).__name__)
+        self.limiter.pause(self.limiter.backoff(attempt, exc))
+
+    def _record_success(self, response, start: float):
+        gemini_request_seconds.observe(time.perf_counter() - start, "ok")
+        self._record_usage(response)
+        self.limiter.record_success()
+
+    @staticmethod
+    def _record_usage(response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        for kind, field in (("prompt", "prompt_token_count"), ("output", "candidates_token_count")):
+            count = getattr(usage, field, None)
+            if count:
+                gemini_tokens.observe(count, kind)
+
+    async def generate_text(self, contents, model: str = None, timeout: float = None,
+                            priority: int = PRIORITY_NORMAL, config: dict = None) -> str:
+        """Convenience wrapper returning only the response text."""
+        response = await self.generate(contents, model=model, timeout=timeout, priority=priority, config=config)
+        return response.text
+
+
+# Singleton instance (built on first use)
+gemini = LazySingleton(GeminiClient, "gemini")
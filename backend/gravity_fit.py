@@ -0,0 +1,249 @@
+"""
+VERITAS Gravity Fit
+Closed-form least-squares fit of y = h0 + v0*t - 0.5*g*t^2.
+"""
+import numpy as np
+
+HUBER_K = 1.345  # 95% efficiency under Gaussian noise
+MAD_SCALE = 1.4826  # MAD -> standard deviation for Gaussian noise
+OUTLIER_SIGMAS = 3.0  # residuals beyond this many robust sigmas are outliers
+RANSAC_MIN_POINTS = 6  # below this a single outlier cannot be told apart
+
+
+def _uncentre(coef, cov, t_mean):
+    """
+    Map the centred fit y = a + b*(t-tm) + c*(t-tm)^2 back to (h0, v0, g).
+    Centring keeps the normal equations well conditioned for long clips.
+    """
+    a, b, c = coef[..., 0], coef[..., 1], coef[..., 2]
+    params = np.stack([
+        a - b * t_mean + c * t_mean**2,  # h0
+        b - 2 * c * t_mean,              # v0
+        -2 * c                           # g
+    ], axis=-1)
+
+    zeros = np.zeros_like(t_mean)
+    ones = np.ones_like(t_mean)
+    jac = np.stack([
+        np.stack([ones, -t_mean, t_mean**2], axis=-1),
+        np.stack([zeros, ones, -2 * t_mean], axis=-1),
+        np.stack([zeros, zeros, -2 * ones], axis=-1)
+    ], axis=-2)
+    params_cov = jac @ cov @ np.swapaxes(jac, -1, -2)
+    return params, params_cov
+
+
+def _moment_fit(t, y, w):
+    """
+    Weighted least squares for a stack of trajectories of shape (n, m).
+    Points with zero weight are ignored. The 3x3 normal equations of every
+    row are built from weighted moments of the centred timestamps and
+    solved in one stacked np.linalg.solve call.
+
+    Returns (params, params_cov, residuals, fit_ok) with params ordered
+    (h0, v0, g).
+    """
+    valid = w > 0
+    n = valid.sum(axis=1)
+
+    w_sum = w.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t_mean = np.where(w_sum > 0, (w * t).sum(axis=1) / w_sum, 0.0)
+    tc = np.where(valid, t - t_mean[:, None], 0.0)
+
+    # Moments S_k = sum(w * tc^k) for k = 0..4 and T_k = sum(w * y * tc^k) for k = 0..2
+    powers = np.empty(tc.shape + (5,))
+    powers[..., 0] = 1.0
+    for k in range(1, 5):
+        powers[..., k] = powers[..., k - 1] * tc
+    S = np.einsum("nm,nmk->nk", w, powers)
+    T = np.einsum("nm,nmk->nk", w * y, powers[..., :3])
+    idx = np.arange(3)
+    M = S[:, idx[:, None] + idx[None, :]]
+
+    # det(M) <= S0*S2*S4 for a positive semi-definite M, so this ratio is a
+    # scale-free degeneracy test (e.g. all points sharing one timestamp)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        conditioning = np.linalg.det(M) / (S[:, 0] * S[:, 2] * S[:, 4])
+    fit_ok = (n >= 3) & (conditioning > 1e-12)
+    M_safe = np.where(fit_ok[:, None, None], M, np.eye(3))
+    T_safe = np.where(fit_ok[:, None], T, 0.0)
+
+    coef = np.linalg.solve(M_safe, T_safe[..., None])[..., 0]
+    residuals = np.where(valid, y - np.einsum("nmk,nk->nm", powers[..., :3], coef), 0.0)
+
+    dof = n - 3
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sigma2 = np.where(dof > 0, (w * residuals**2).sum(axis=1) / dof, np.inf)
+        cov = sigma2[:, None, None] * np.linalg.inv(M_safe)
+        params, params_cov = _uncentre(coef, cov, t_mean)
+
+    return params, params_cov, residuals, fit_ok
+
+
+def _single_fit(t, y, w):
+    """
+    1-D counterpart of _moment_fit for the per-analysis hot path, where the
+    fixed overhead of the stacked version dominates for short trajectories.
+    """
+    w_sum = w.sum()
+    t_mean = (w @ t) / w_sum
+    tc = t - t_mean
+    tc2 = tc * tc
+    wt = w * tc
+    wt2 = w * tc2
+
+    s1, s2, s3, s4 = wt.sum(), wt @ tc, wt2 @ tc, wt2 @ tc2
+    M = np.array([[w_sum, s1, s2], [s1, s2, s3], [s2, s3, s4]])
+    if not np.linalg.det(M) > 1e-12 * w_sum * s2 * s4:
+        raise ValueError("Trajectory timestamps are degenerate")
+
+    M_inv = np.linalg.inv(M)
+    coef = M_inv @ np.array([w @ y, wt @ y, wt2 @ y])
+    residuals = y - (coef[0] + coef[1] * tc + coef[2] * tc2)
+
+    dof = np.count_nonzero(w) - 3
+    sigma2 = (w @ residuals**2) / dof if dof > 0 else np.inf
+
+    # Same mapping as _uncentre, built directly for a single trajectory
+    jac = np.array([[1.0, -t_mean, t_mean**2], [0.0, 1.0, -2 * t_mean], [0.0, 0.0, -2.0]])
+    with np.errstate(invalid="ignore"):
+        params_cov = jac @ (sigma2 * M_inv) @ jac.T
+    return jac @ coef, params_cov, residuals
+
+
+def _ransac_inliers(t, y, n_trials, seed):
+    """
+    RANSAC-style random sampling scored by least median of squares, so no
+    inlier threshold has to be guessed up front.
+
+    All candidate parabolas (one per random triple of points) are solved in
+    a single stacked np.linalg.solve and scored against every point at once;
+    the best candidate's robust scale then defines the inlier set.
+    """
+    n = len(t)
+    rng = np.random.default_rng(seed)
+    triples = np.argpartition(rng.random((n_trials, n)), 3, axis=1)[:, :3]
+
+    t_c = t - t.mean()
+    V = t_c[triples][..., None] ** np.arange(3)
+    ok = np.abs(np.linalg.det(V)) > 1e-12
+    if not ok.any():
+        raise ValueError("Trajectory timestamps are degenerate")
+
+    coef = np.linalg.solve(V[ok], y[triples[ok]][..., None])[..., 0]
+    residuals = y[None, :] - coef @ (t_c[None, :] ** np.arange(3)[:, None])
+    med = np.median(residuals**2, axis=1)
+    best = np.argmin(med)
+
+    # Rousseeuw's finite-sample LMedS scale estimate
+    scale = MAD_SCALE * (1 + 5 / max(n - 3, 1)) * np.sqrt(med[best])
+    return np.abs(residuals[best]) <= 2.5 * max(scale, 1e-12), scale
+
+
+def fit_parabola(timestamps, y_positions, weights=None, robust=None, max_iter=20, tol=1e-8,
+                 n_trials=200, seed=0):
+    """
+    Fit one trajectory in closed form.
+
+    weights: optional per-point weights (e.g. 1/sigma^2).
+    robust:  None for plain least squares, "huber" for iteratively
+             reweighted least squares with Huber weights, or "ransac" to
+             reject gross outliers by random sampling (n_trials triples,
+             deterministic for a given seed) and refit on the inliers.
+
+    Returns h0, v0, g, their standard errors, the RMS residual and, for
+    robust fits, a per-point inlier mask.
+    """
+    t = np.asarray(timestamps, dtype=float)
+    y = np.asarray(y_positions, dtype=float)
+    if t.shape != y.shape or t.ndim != 1:
+        raise ValueError("timestamps and y_positions must be 1-D arrays of equal length")
+    if len(t) < 3:
+        raise ValueError("At least 3 points are required to fit gravity")
+
+    w = np.ones_like(t) if weights is None else np.asarray(weights, dtype=float)
+
+    params, params_cov, residuals = _single_fit(t, y, w)
+
+    inliers = None
+    if robust == "huber":
+        scale = 0.0
+        for _ in range(max_iter):
+            scale = MAD_SCALE * np.median(np.abs(residuals - np.median(residuals)))
+            if scale <= 0:
+                break
+            u = np.abs(residuals) / (HUBER_K * scale)
+            huber_w = np.where(u <= 1, 1.0, 1.0 / np.maximum(u, 1e-12))
+            new_params, params_cov, residuals = _single_fit(t, y, w * huber_w)
+            converged = np.allclose(new_params, params, rtol=tol, atol=tol)
+            params = new_params
+            if converged:
+                break
+        inliers = np.abs(residuals) <= OUTLIER_SIGMAS * max(scale, 1e-12)
+    elif robust == "ransac":
+        inliers = np.ones(len(t), dtype=bool)
+        if len(t) >= RANSAC_MIN_POINTS:
+            candidate, _ = _ransac_inliers(t, y, n_trials, seed)
+            if candidate.sum() >= 3:
+                inliers = candidate
+                params, params_cov, residuals = _single_fit(t, y, w * inliers)
+    elif robust is not None:
+        raise ValueError(f"Unknown robust method: {robust}")
+
+    err = np.sqrt(np.clip(np.diag(params_cov), 0, None))
+    result = {
+        "h0": float(params[0]),
+        "v0": float(params[1]),
+        "g": float(params[2]),
+        "h0_err": float(err[0]),
+        "v0_err": float(err[1]),
+        "g_err": float(err[2]),
+        "residual_rms": float(np.sqrt(np.mean(residuals[inliers]**2 if inliers is not None else residuals**2))),
+        "n_points": len(t)
+    }
+    if inliers is not None:
+        result["inliers"] = inliers
+    return result
+
+
+def fit_parabola_batch(timestamps, y_positions, weights=None):
+    """
+    Fit many trajectories at once.
+
+    y_positions has shape (n_trajectories, n_points); timestamps has the same
+    shape or is a shared 1-D array. Ragged trajectories are NaN-padded: any
+    point whose t or y is NaN is ignored.
+
+    Returns a dict of arrays (h0, v0, g, *_err, residual_rms, n_points);
+    trajectories with fewer than 3 valid points get NaN parameters.
+    """
+    y = np.atleast_2d(np.asarray(y_positions, dtype=float))
+    t = np.broadcast_to(np.asarray(timestamps, dtype=float), y.shape)
+    w = np.ones_like(y) if weights is None else np.broadcast_to(np.asarray(weights, dtype=float), y.shape)
+
+    valid = np.isfinite(t) & np.isfinite(y) & (w > 0)
+    params, params_cov, residuals, fit_ok = _moment_fit(
+        np.where(valid, t, 0.0),
+        np.where(valid, y, 0.0),
+        np.where(valid, w, 0.0)
+    )
+    n = valid.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        err = np.sqrt(np.clip(np.diagonal(params_cov, axis1=-2, axis2=-1), 0, None))
+        rms = np.sqrt((residuals**2).sum(axis=1) / n)
+
+    params = np.where(fit_ok[:, None], params, np.nan)
+    err = np.where(fit_ok[:, None], err, np.nan)
+
+    return {
+        "h0": params[:, 0],
+        "v0": params[:, 1],
+        "g": params[:, 2],
+        "h0_err": err[:, 0],
+        "v0_err": err[:, 1],
+        "g_err": err[:, 2],
+        "residual_rms": np.where(fit_ok, rms, np.nan),
+        "n_points": n
+    }
@@ -0,0 +1,298 @@
+"""
+VERITAS History Store
+Append-only columnar log of every verdict, partitioned by day.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import hashlib
+import os
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: compaction is only serialized within one process
+    fcntl = None
+
+from lazy import LazySingleton
+from write_buffer import WriteBehindBuffer
+
+# Per-check number kept in the `checks` column, first key present wins
+CHECK_VALUE_KEYS = ("calculated_g", "measured", "variance", "reflection_error", "difference")
+
+
+# pyarrow modules, imported on first use (see _import_pyarrow)
+pa = pc = pads = pq = None
+
+
+def _import_pyarrow() -> bool:
+    global pa, pc, pads, pq
+    if pa is None:
+        try:
+            import pyarrow  # slow import, paid on first use only
+            import pyarrow.compute
+            import pyarrow.dataset
+            import pyarrow.parquet
+        except ImportError:  # pyarrow is optional; without it verdicts are not recorded
+            return False
+        pa, pc, pads, pq = pyarrow, pyarrow.compute, pyarrow.dataset, pyarrow.parquet
+    return True
+
+
+def available() -> bool:
+    return _import_pyarrow()
+
+
+def _schema():
+    return pa.schema([
+        ("ts", pa.timestamp("ms", tz="UTC")),
+        ("analysis_id", pa.string()),
+        ("video_hash", pa.string()),
+        ("source", pa.dictionary(pa.int8(), pa.string())),
+        ("pipeline_version", pa.dictionary(pa.int8(), pa.string())),
+        ("verdict", pa.dictionary(pa.int8(), pa.string())),
+        ("confidence", pa.float32()),
+        ("motion_type", pa.dictionary(pa.int16(), pa.string())),
+        ("gravity", pa.float32()),
+        ("violations", pa.int16()),
+        ("total_checks", pa.int16()),
+        ("checks", pa.list_(pa.struct([
+            ("check", pa.string()),
+            ("status", pa.string()),
+            ("value", pa.float64())
+        ]))),
+        ("measurements", pa.map_(pa.string(), pa.float64())),
+        ("anomalies", pa.list_(pa.string()))
+    ])
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def _check_row(check: dict) -> dict:
+    value = next((check[key] for key in CHECK_VALUE_KEYS if _number(check.get(key)) is not None), None)
+    return {"check": str(check.get("check", "")), "status": str(check.get("status", "")), "value": value}
+
+
+def _timestamp(value):
+    """datetime or epoch seconds -> aware UTC datetime"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+class HistoryStore:
+    """
+    Every verdict becomes one row: identifiers, the verdict itself, headline
+    measurements and the per-check results. Rows are buffered and written as
+    immutable zstd Parquet parts under `day=YYYY-MM-DD/`, so a scan over a
+    time range only opens that range's partitions and filters on verdict or
+    motion_type are pushed down to row-group statistics.
+
+    Once verdicts start landing in a new day the previous day is compacted
+    into a single file sorted by ts, so only today's partition is fragmented.
+    The open day is taken from disk at start-up, so a restart does not skip
+    that compaction. Workers sharing `root_dir` take a file lock to compact,
+    and part names are derived from their rows, so a batch that is retried
+    after a partial write replaces its parts instead of duplicating them.
+    """
+
+    def __init__(self, root_dir: str, max_batch: int = 256, max_delay: float = 5.0):
+        self.root_dir = root_dir
+        self.enabled = bool(root_dir) and available()
+        self.files_written = 0
+        if not self.enabled:
+            if root_dir:
+                print("⚠️ pyarrow not installed - analysis history is not recorded")
+            return
+        self.schema = _schema()
+        self._open_day = None
+        self._files_lock = threading.Lock()  # scans never see a compaction half done
+        self._partitioning = pads.partitioning(pa.schema([("day", pa.string())]), flavor="hive")
+        self._writes = WriteBehindBuffer(self._write_batch, max_batch, max_delay, name="history-store")
+        os.makedirs(root_dir, exist_ok=True)
+        self._open_day = max(self.days(), default=None)
+
+    def record(self, entry: dict):
+        """
+        Queue one verdict. Recognised keys: analysis_id, video_hash, source,
+        pipeline_version, verdict, confidence, motion_type, gravity, checks
+        (physics result dicts), measurements ({name: number}), anomalies, ts.
+        """
+        if not self.enabled:
+            return
+        checks = entry.get("checks") or []
+        measurements = entry.get("measurements") or {}
+        self._writes.append({
+            "ts": _timestamp(entry.get("ts") or datetime.now(timezone.utc)),
+            "analysis_id": entry.get("analysis_id") or uuid.uuid4().hex,
+            "video_hash": entry.get("video_hash"),
+            "source": entry.get("source", "live"),
+            "pipeline_version": entry.get("pipeline_version"),
+            "verdict": entry.get("verdict", "unknown"),
+            "confidence": _number(entry.get("confidence")),
+            "motion_type": entry.get("motion_type", "unknown"),
+            "gravity": _number(entry.get("gravity")),
+            "violations": sum(1 for c in checks if c.get("status") == "VIOLATION"),
+            "total_checks": len(checks),
+            "checks": [_check_row(c) for c in checks],
+            "measurements": [(k, _number(v)) for k, v in measurements.items() if _number(v) is not None],
+            "anomalies": [str(a) for a in entry.get("anomalies") or []]
+        })
+
+    def _write_batch(self, rows: list):
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row["ts"].strftime("%Y-%m-%d"), []).append(row)
+        # Every part is written before any is published, so a failed batch
+        # leaves nothing behind to be duplicated when it is retried
+        staged = []
+        try:
+            for day, day_rows in by_day.items():
+                table = pa.Table.from_pylist(day_rows, schema=self.schema)
+                staged.append(self._stage_part(day, table, [row["analysis_id"] for row in day_rows]))
+        except Exception:
+            for tmp_path, _ in staged:
+                os.remove(tmp_path)
+            raise
+        for tmp_path, path in staged:
+            os.replace(tmp_path, path)
+            self.files_written += 1
+
+        latest = max(by_day)
+        if self._open_day is None or latest > self._open_day:
+            if self._open_day is not None:
+                self._compact_day(self._open_day)
+            self._open_day = latest
+
+    def _day_dir(self, day: str) -> str:
+        return os.path.join(self.root_dir, f"day={day}")
+
+    def _stage_part(self, day: str, table, keys: list) -> tuple:
+        """
+        Write `table` next to its final path; returns (tmp_path, path). The
+        name is a digest of `keys`, so the same rows always land in the
+        same part.
+        """
+        day_dir = self._day_dir(day)
+        os.makedirs(day_dir, exist_ok=True)
+        digest = hashlib.sha1("\n".join(keys).encode()).hexdigest()[:32]
+        path = os.path.join(day_dir, f"part-{digest}.parquet")
+        tmp_path = os.path.join(day_dir, f".{os.path.basename(path)}.tmp")  # dot files are skipped by scans
+        pq.write_table(table, tmp_path, compression="zstd")
+        return tmp_path, path
+
+    @contextmanager
+    def _compaction_lock(self):
+        """Non-blocking lock shared by every process using root_dir; yields False if it is taken"""
+        with open(os.path.join(self.root_dir, ".compact.lock"), "a") as lock_file:
+            if fcntl is None:
+                yield True
+                return
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _dataset(self):
+        return pads.dataset(self.root_dir, format="parquet", partitioning=self._partitioning,
+                            schema=self.schema.append(pa.field("day", pa.string())))
+
+    def scan(self, verdict: str = None, motion_type: str = None, source: str = None,
+             start=None, end=None, columns: list = None):
+        """
+        Rows matching every given filter as a pyarrow Table. `start`/`end`
+        (datetime or epoch seconds) bound `ts` as [start, end).
+        """
+        if not self.enabled:
+            raise RuntimeError("history store needs pyarrow")
+        self._writes.flush()  # include verdicts still queued
+
+        conditions = []
+        if verdict is not None:
+            conditions.append(pc.field("verdict") == verdict)
+        if motion_type is not None:
+            conditions.append(pc.field("motion_type") == motion_type)
+        if source is not None:
+            conditions.append(pc.field("source") == source)
+        if start is not None:
+            start = _timestamp(start)
+            conditions.append(pc.field("day") >= start.strftime("%Y-%m-%d"))
+            conditions.append(pc.field("ts") >= pa.scalar(start, type=self.schema.field("ts").type))
+        if end is not None:
+            end = _timestamp(end)
+            conditions.append(pc.field("day") <= end.strftime("%Y-%m-%d"))
+            conditions.append(pc.field("ts") < pa.scalar(end, type=self.schema.field("ts").type))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        with self._files_lock:
+            return self._dataset().to_table(columns=columns, filter=expression)
+
+    def days(self) -> list:
+        return sorted(name[4:] for name in os.listdir(self.root_dir) if name.startswith("day="))
+
+    def compact(self, day: str) -> int:
+        """
+        Merge a day's parts into a single file sorted by ts; returns the
+        number of parts replaced (0 while another worker is compacting).
+        Past days are compacted automatically.
+        """
+        if not self.enabled:
+            return 0
+        self._writes.flush()
+        return self._compact_day(day)
+
+    def _compact_day(self, day: str) -> int:
+        with self._compaction_lock() as locked:
+            if not locked:
+                return 0
+            day_dir = self._day_dir(day)
+            names = sorted(name for name in os.listdir(day_dir) if name.endswith(".parquet"))
+            if len(names) < 2:
+                return 0
+            parts = [os.path.join(day_dir, name) for name in names]
+            table = pa.concat_tables(pq.read_table(path, schema=self.schema) for path in parts)
+            tmp_path, path = self._stage_part(day, table.sort_by("ts"), names)
+            with self._files_lock:
+                os.replace(tmp_path, path)
+                self.files_written += 1
+                for part in parts:
+                    os.remove(part)
+            return len(parts)
+
+    def flush(self):
+        if self.enabled:
+            self._writes.flush()
+
+    def close(self):
+        if self.enabled:
+            self._writes.close()
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "days": len(self.days()),
+            "files_written": self.files_written,
+            "writes": self._writes.stats()
+        }
+
+
+# Singleton (built on first use; VERITAS_HISTORY_DIR="" turns recording off)
+history_store = LazySingleton(lambda: HistoryStore(
+    root_dir=os.getenv("VERITAS_HISTORY_DIR", "./analysis_history"),
+    max_batch=int(os.getenv("VERITAS_HISTORY_BATCH", "256")),
+    max_delay=float(os.getenv("VERITAS_HISTORY_FLUSH_SECONDS", "5"))
+), "history_store")
@@ -0,0 +1,304 @@
+"""
+VERITAS Job Queue
+Analyses submitted over REST (POST /analyses) run on a bounded in-process
+queue instead of a WebSocket that has to stay open for the whole pipeline.
+"""
+from collections import OrderedDict, deque
+from metrics import registry
+from session_store import session_store
+import asyncio
+import time
+import uuid
+
+jobs_total = registry.counter(
+    "veritas_jobs_total", "Finished REST analysis jobs by status", ("status",))
+jobs_rejected = registry.counter(
+    "veritas_jobs_rejected_total", "Analysis jobs refused because the queue was full")
+
+FINISHED = ("done", "fallback", "failed", "cancelled")
+
+
+class QueueFull(Exception):
+    """Raised by submit() when the queue is at capacity; `retry_after` is in seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"analysis queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    """One queued analysis and the events its pipeline run has produced"""
+
+    __slots__ = (
+        "id", "video", "video_hash", "owns_video", "mode", "status", "error", "progress", "stage",
+        "verdict", "physics", "objects", "events", "seq", "created_at", "started_at",
+        "finished_at", "task", "_changed"
+    )
+
+    def __init__(self, video, owns_video: bool, mode: str, max_events: int):
+        self.id = uuid.uuid4().hex
+        self.video = video
+        self.video_hash = getattr(video, "sha256", None)
+        self.owns_video = owns_video
+        self.mode = mode
+        self.status = "queued"
+        self.error = None
+        self.progress = 0
+        self.stage = None
+        self.verdict = None
+        self.physics = None
+        self.objects = None
+        self.events = deque(maxlen=max_events)  # (seq, event), oldest dropped first
+        self.seq = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def publish(self, event: dict):
+        """Record a pipeline event and wake every event-stream reader"""
+        kind = event.get("type")
+        if kind == "scan_progress":
+            self.progress = event.get("progress", self.progress)
+            self.stage = event.get("stage", self.stage)
+        elif kind == "verdict":
+            self.verdict = {k: v for k, v in event.items() if k not in ("type", "ts")}
+        elif kind == "physics_update":
+            self.physics = {k: v for k, v in event.items() if k not in ("type", "ts")}
+        elif kind == "objects_detected":
+            self.objects = event.get("objects")
+        self.seq += 1
+        self.events.append((self.seq, event))
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    @property
+    def changed(self) -> asyncio.Event:
+        """Set on the next event or status change; take it before reading events so none is missed"""
+        return self._changed
+
+    def events_after(self, seq: int) -> list:
+        return [(s, event) for s, event in self.events if s > seq]
+
+    def describe(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "mode": self.mode,
+            "progress": self.progress,
+            "stage": self.stage,
+            "video_hash": self.video_hash,
+            "verdict": self.verdict,
+            "physics": self.physics,
+            "objects": self.objects,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class JobSocket:
+    """Stands in for the WebSocket: forwards every pipeline message to the job"""
+
+    def __init__(self, job: Job):
+        self.job = job
+
+    async def send_json(self, data: dict):
+        self.job.publish(data)
+
+
+class JobQueue:
+    """
+    Bounded FIFO of analysis jobs drained by `workers` tasks, each running
+    `runner(socket, session_id)` (the WebSocket pipeline) on a session of its
+    own. submit() raises QueueFull once `max_pending` jobs are waiting, which
+    the API turns into 429 + Retry-After (admission control): under load,
+    callers back off instead of piling up uploads and Gemini calls.
+
+    Finished jobs are kept for `job_ttl` seconds (at most `max_jobs`) for
+    polling; with a `shared` state backend their summaries are published
+    too, so any worker can answer GET /analyses/{id}.
+    """
+
+    def __init__(self, runner, workers: int = 8, max_pending: int = 1000, timeout: float = 600,
+                 job_ttl: float = 3600, max_jobs: int = 10_000, max_events: int = 500, shared=None):
+        self.runner = runner
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.job_ttl = job_ttl
+        self.max_jobs = max_jobs
+        self.max_events = max_events
+        self.shared = shared
+
+        self._jobs = OrderedDict()  # job_id -> Job, oldest first
+        self._queue = None          # created with the workers, on the running loop
+        self._workers = []
+        self._mean_seconds = None   # moving average of job run time, for Retry-After
+        self._stopping = False
+
+    # ---- submission ----
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def running(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == "running")
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up"""
+        mean = self._mean_seconds or 30.0
+        return max(1, round(mean / self.workers))
+
+    def check_capacity(self):
+        """Raise QueueFull before the caller spends time on an upload that would be refused"""
+        if self.pending >= self.max_pending:
+            jobs_rejected.inc()
+            raise QueueFull(self.retry_after())
+
+    def submit(self, video, owns_video: bool = True, mode: str = "fast") -> Job:
+        self._ensure_workers()
+        self.check_capacity()
+        job = Job(video, owns_video, mode, self.max_events)
+        if not owns_video:
+            session_store.pin_upload(video)  # an earlier upload must outlive the wait in the queue
+        self._queue.put_nowait(job)
+        self._jobs[job.id] = job
+        self._prune()
+        self._publish_summary(job)
+        return job
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    async def get_summary(self, job_id: str):
+        """Job description from this worker, or from the shared backend"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.describe()
+        if self.shared is not None:
+            return await self.shared.run("get", f"job:{job_id}")
+        return None
+
+    def cancel(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        if job.task is not None:
+            job.task.cancel()  # the worker marks it cancelled
+        else:
+            self._finish(job, "cancelled")
+        return True
+
+    # ---- workers ----
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if not job.finished:  # skip jobs cancelled while queued
+                    await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        session_id = f"job-{job.id}"
+        state = session_store.create(session_id, mode=job.mode)
+        state.attach_video(job.video, owned=job.owns_video)
+        job.video = None if job.owns_video else job.video  # the session deletes it from here on
+        job.status = "running"
+        job.started_at = time.time()
+        job._notify()
+        self._publish_summary(job)
+
+        state.task = job.task = asyncio.ensure_future(self.runner(JobSocket(job), session_id))
+        try:
+            await asyncio.wait_for(job.task, self.timeout)
+            if job.verdict is None:
+                self._finish(job, "failed", "pipeline finished without a verdict")
+            elif job.verdict.get("demo"):
+                # Gemini failed or is not configured: the verdict is a demonstration, not a result
+                self._finish(job, "fallback", "Gemini unavailable - only a demo verdict was produced")
+            else:
+                self._finish(job, "done")
+        except asyncio.CancelledError:
+            self._finish(job, "cancelled")
+            if self._stopping or not job.task.cancelled():
+                raise  # the worker itself is being stopped
+        except asyncio.TimeoutError:
+            self._finish(job, "failed", f"timed out after {self.timeout:.0f}s")
+        except Exception as e:
+            self._finish(job, "failed", str(e)[:200])
+        finally:
+            job.task = None
+            session_store.close(session_id)
+
+    def _finish(self, job: Job, status: str, error: str = None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        if job.video is not None:
+            if job.owns_video:
+                job.video.discard()  # never reached a session (cancelled while queued)
+            else:
+                session_store.unpin_upload(job.video)
+            job.video = None
+        if job.started_at is not None and status == "done":
+            seconds = job.finished_at - job.started_at
+            self._mean_seconds = seconds if self._mean_seconds is None else 0.9 * self._mean_seconds + 0.1 * seconds
+        jobs_total.inc(1, status)
+        job._notify()
+        self._publish_summary(job)
+
+    def _publish_summary(self, job: Job):
+        if self.shared is not None:
+            self.shared.submit("set", f"job:{job.id}", job.describe(), ttl=self.job_ttl)
+
+    def _prune(self):
+        """Forget finished jobs past job_ttl, then the oldest finished ones beyond max_jobs"""
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - job.finished_at > self.job_ttl:
+                del self._jobs[job_id]
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:max(excess, 0)]:
+            del self._jobs[job_id]
+
+    async def shutdown(self):
+        """Cancel the workers and every unfinished job"""
+        self._stopping = True
+        for job in list(self._jobs.values()):
+            if not job.finished:
+                self.cancel(job.id)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._stopping = False
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.pending,
+            "running": self.running,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "jobs_kept": len(self._jobs),
+            "mean_seconds": round(self._mean_seconds, 2) if self._mean_seconds is not None else None
+        }
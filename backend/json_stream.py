@@ -0,0 +1,301 @@
+"""
+VERITAS JSON Stream
+Linear-time JSON extraction from model output, an incremental parser that
+yields array elements while a response is still streaming, and strict
+schema validation of the result.
+"""
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_STRUCTURAL = re.compile(r'[{}\[\]",:]')
+_STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*"', re.S)
+
+MAX_START_ATTEMPTS = 64  # '{' positions tried before giving up on malformed output
+
+
+def extract_json(text: str):
+    """
+    Return the first JSON object embedded in `text` (prose, code fences and
+    trailing remarks are ignored), or None. Each candidate '{' is decoded
+    with raw_decode, which stops at the end of the object instead of
+    backtracking over the whole text like a greedy regex.
+    """
+    if not text:
+        return None
+    start = text.find("{")
+    attempts = 0
+    while start != -1 and attempts < MAX_START_ATTEMPTS:
+        try:
+            value, _ = _decoder.raw_decode(text, start)
+            if isinstance(value, dict):
+                return value
+        except ValueError:
+            pass
+        attempts += 1
+        start = text.find("{", start + 1)
+    return None
+
+
+def _decode_at(text: str, pos: int, window: int = 4096):
+    """
+    raw_decode the value at `pos` -> (value, end) or None if it is not
+    complete. Decodes from a bounded slice: a failing decode of the whole
+    buffer would cost O(len(text)) just to build the error's line number.
+    """
+    while True:
+        piece = text[pos:pos + window]
+        try:
+            value, end = _decoder.raw_decode(piece)
+            return value, pos + end
+        except ValueError:
+            if pos + window >= len(text):
+                return None
+            window *= 4
+
+
+def _skip_space(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in " \t\r\n":
+        pos += 1
+    return pos
+
+
+class StreamingJSONParser:
+    """
+    Incremental scanner over the text of a streaming JSON answer.
+
+    feed(chunk) returns [(path, element)] for every element of a watched
+    array that completed in that chunk, e.g. path ("trajectory_points",) for
+    the points of {"trajectory_points": [...]}. Watched elements are decoded
+    in one raw_decode call each; only the structure around them is scanned
+    (structural characters and string boundaries), so the response is never
+    reparsed. A malformed element stops further output (result() then
+    reports what can still be recovered). result() decodes the complete
+    object at the end.
+    """
+
+    def __init__(self, watch=()):
+        self.watch = {tuple(path) if isinstance(path, (tuple, list)) else (path,) for path in watch}
+        self._chunks = []
+        self._buffer = ""        # text not scanned yet, starting at absolute offset _offset
+        self._offset = 0
+        self._root_start = None
+        self._stack = []         # [kind, key path, next element is a watched one to decode]
+        self._pending_key = None
+        self._expect_key = False
+
+    def _path(self) -> tuple:
+        return self._stack[-1][1] if self._stack else ()
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> list:
+        self._chunks.append(chunk)
+        completed = []
+        text = self._buffer + chunk
+        pos = 0
+        while True:
+            if self._stack and self._stack[-1][2]:
+                # At an element of a watched array: decode it whole in C
+                pos = _skip_space(text, pos)
+                if pos >= len(text):
+                    break
+                if text[pos] not in ",]":
+                    decoded = _decode_at(text, pos)
+                    if decoded is None:
+                        break  # element continues in the next chunk
+                    value, end = decoded
+                    if end == len(text) and text[pos] not in '{["':
+                        break  # a number may still have digits to come
+                    completed.append((self._stack[-1][1], value))
+                    pos = end
+                    self._stack[-1][2] = False
+
+            match = _STRUCTURAL.search(text, pos)
+            if match is None:
+                pos = len(text)
+                break
+            char = match.group()
+            index = match.start()
+
+            if char == '"':
+                if not self._stack:
+                    pos = index + 1  # quotes in prose around the JSON
+                    continue
+                end = _STRING_BODY.match(text, index + 1)
+                if end is None:
+                    pos = index  # string continues in the next chunk
+                    break
+                if self._stack[-1][0] == "{" and self._expect_key:
+                    self._pending_key = json.loads(text[index:end.end()])
+                    self._expect_key = False
+                pos = end.end()
+                continue
+
+            pos = index + 1
+            if char in "{[":
+                if not self._stack:
+                    if self._root_start is None:
+                        self._root_start = self._offset + index
+                    path = ()
+                elif self._stack[-1][0] == "{":
+                    path = self._path() + (self._pending_key,)
+                else:
+                    path = self._path()
+                self._stack.append([char, path, char == "[" and path in self.watch])
+                self._expect_key = char == "{"
+            elif char in "}]":
+                if not self._stack:
+                    continue  # stray bracket in prose before the JSON
+                self._stack.pop()
+                self._expect_key = False
+            elif char == ",":
+                if self._stack:
+                    top = self._stack[-1]
+                    if top[0] == "[":
+                        top[2] = top[1] in self.watch
+                    self._expect_key = top[0] == "{"
+        self._buffer = text[pos:]
+        self._offset += pos
+        return completed
+
+    def result(self):
+        """The complete JSON object, or None if the text held none"""
+        text = self.text
+        if self._root_start is not None:
+            try:
+                value, _ = _decoder.raw_decode(text, self._root_start)
+                if isinstance(value, dict):
+                    return value
+            except ValueError:
+                pass
+        return extract_json(text)
+
+
+# ---- schema validation ----
+
+NUMBER = (int, float)
+
+
+class Field:
+    """
+    Expected shape of one key. `kind` is a type or tuple of types; `items`
+    describes list elements (a type, a Field or a {key: Field} schema) or,
+    for a dict, the nested {key: Field} schema. Invalid values are replaced
+    by `default` and reported.
+    """
+
+    def __init__(self, kind, required: bool = True, default=None, items=None, nullable: bool = False):
+        self.kind = kind
+        self.required = required
+        self.default = default
+        self.items = items
+        self.nullable = nullable
+
+    def check(self, value) -> bool:
+        if value is None:
+            return self.nullable
+        if isinstance(value, bool) and self.kind is not bool and bool not in _as_tuple(self.kind):
+            return False  # JSON true/false is not a number here
+        return isinstance(value, self.kind)
+
+
+def _as_tuple(kind) -> tuple:
+    return kind if isinstance(kind, tuple) else (kind,)
+
+
+def _copy_default(default):
+    return list(default) if isinstance(default, list) else dict(default) if isinstance(default, dict) else default
+
+
+def validate(data, schema: dict, path: str = "") -> tuple:
+    """
+    Check `data` against `schema` ({key: Field}). Returns (clean, errors):
+    `clean` holds every schema key (defaults where missing or invalid, bad
+    list items dropped) plus any extra keys untouched; `errors` lists what
+    was wrong.
+    """
+    errors = []
+    if not isinstance(data, dict):
+        errors.append(f"{path or 'response'}: expected an object, got {type(data).__name__}")
+        data = {}
+    clean = dict(data)
+    for key, field in schema.items():
+        where = f"{path}.{key}" if path else key
+        if key not in data:
+            if field.required:
+                errors.append(f"{where}: missing")
+            clean[key] = _copy_default(field.default)
+            continue
+        value = data[key]
+        if not field.check(value):
+            errors.append(f"{where}: expected {'/'.join(t.__name__ for t in _as_tuple(field.kind))}, "
+                          f"got {type(value).__name__}")
+            clean[key] = _copy_default(field.default)
+        elif field.items is not None and isinstance(value, list):
+            clean[key] = _validate_items(value, field.items, where, errors)
+        elif isinstance(field.items, dict) and isinstance(value, dict):
+            clean[key], nested_errors = validate(value, field.items, where)
+            errors.extend(nested_errors)
+    return clean, errors
+
+
+def validate_item(value, items, where: str = "item"):
+    """Validate one list element (e.g. a streamed point); returns (clean or None, errors)"""
+    errors = []
+    clean = _validate_items([value], items, where, errors)
+    return (clean[0] if clean else None), errors
+
+
+def _validate_items(values: list, items, where: str, errors: list) -> list:
+    kept = []
+    for i, item in enumerate(values):
+        item_where = f"{where}[{i}]"
+        if isinstance(items, dict):
+            if not isinstance(item, dict):
+                errors.append(f"{item_where}: expected an object, got {type(item).__name__}")
+                continue
+            item_clean, item_errors = validate(item, items, item_where)
+            if item_errors:
+                errors.extend(item_errors)
+                if any(items[key].required and not items[key].check(item.get(key)) for key in items):
+                    continue  # a required field is unusable: drop the element
+            kept.append(item_clean)
+        else:
+            field = items if isinstance(items, Field) else Field(items)
+            if field.check(item):
+                kept.append(item)
+            else:
+                errors.append(f"{item_where}: expected {'/'.join(t.__name__ for t in _as_tuple(field.kind))}, "
+                              f"got {type(item).__name__}")
+    return kept
+
+
+_SCHEMA_TYPES = ((bool, "BOOLEAN"), (str, "STRING"), (int, "INTEGER"), (float, "NUMBER"), (list, "ARRAY"),
+                 (dict, "OBJECT"))
+
+
+def response_schema(schema) -> dict:
+    """
+    The same {key: Field} schema in Gemini's structured-output form
+    (GenerateContentConfig.response_schema), so the model is constrained to
+    the shape validate() checks. Properties keep the schema's order.
+    """
+    if isinstance(schema, dict):
+        return {
+            "type": "OBJECT",
+            "properties": {key: response_schema(field) for key, field in schema.items()},
+            "required": [key for key, field in schema.items() if field.required],
+            "property_ordering": list(schema)
+        }
+    field = schema if isinstance(schema, Field) else Field(schema)
+    kinds = _as_tuple(field.kind)
+    names = [name for kind, name in _SCHEMA_TYPES if kind in kinds]
+    out = {"type": "NUMBER" if "NUMBER" in names else names[0]}
+    if field.nullable:
+        out["nullable"] = True
+    if field.items is not None:
+        out.update(response_schema(field.items) if out["type"] == "OBJECT" else {"items": response_schema(field.items)})
+    return out
@@ -2,8 +2,9 @@
 VERITAS Knowledge Base - ChromaDB Integration
 Stores fake signatures and enables agentic memory.
 """
-import chromadb
-from chromadb.config import Settings
+from lazy import LazySingleton
+from vector_index import VectorIndex, signature_vector, FEATURES
+from write_buffer import WriteBehindBuffer
 import json
 import time
 import os
@@ -16,11 +17,25 @@ class KnowledgeBase:
     
     def __init__(self, persist_dir: str = "./chroma_db"):
         """Initialize ChromaDB with persistence."""
-        self.client = chromadb.Client(Settings(
-            chroma_db_impl="duckdb+parquet",
-            persist_directory=persist_dir,
-            anonymized_telemetry=False
-        ))
+        import chromadb  # slow import, paid on first use only
+        from chromadb.config import Settings
+        
+        # VERITAS_CHROMA_HOST points every worker at one Chroma server instead
+        # of a private on-disk database per process
+        chroma_host = os.getenv("VERITAS_CHROMA_HOST")
+        if chroma_host:
+            self.client = chromadb.Client(Settings(
+                chroma_api_impl="rest",
+                chroma_server_host=chroma_host,
+                chroma_server_http_port=os.getenv("VERITAS_CHROMA_PORT", "8000"),
+                anonymized_telemetry=False
+            ))
+        else:
+            self.client = chromadb.Client(Settings(
+                chroma_db_impl="duckdb+parquet",
+                persist_directory=persist_dir,
+                anonymized_telemetry=False
+            ))
         
         # Collection for fake signatures
         self.fakes = self.client.get_or_create_collection(
@@ -34,8 +49,26 @@ class KnowledgeBase:
             metadata={"description": "Past analysis results"}
         )
         
+        # Numeric index over physics_signature vectors; ChromaDB stays the
+        # system of record, lookups never touch the embedding model
+        self.signature_vectors = VectorIndex(
+            dim=len(FEATURES),
+            exact_threshold=int(os.getenv("VERITAS_ANN_THRESHOLD", "20000"))
+        )
+        self._signatures = {}  # id -> fake signature document
+        
+        # Inserts are batched off the request path (one add per batch
+        # instead of one embedding + persist per analysis)
+        batch = int(os.getenv("VERITAS_KB_BATCH", "64"))
+        delay = float(os.getenv("VERITAS_KB_FLUSH_SECONDS", "2"))
+        self._fake_writes = WriteBehindBuffer(
+            lambda records: self._add_batch(self.fakes, records), batch, delay, name="kb-fakes")
+        self._history_writes = WriteBehindBuffer(
+            lambda records: self._add_batch(self.history, records), batch, delay, name="kb-history")
+        
         # Pre-load known AI model signatures
         self._load_known_signatures()
+        self._index_stored_signatures()
     
     def _load_known_signatures(self):
         """Pre-load signatures of known AI video generators."""
@@ -88,61 +121,73 @@ class KnowledgeBase:
         # Check if already loaded
         existing = self.fakes.count()
         if existing == 0:
-            for fake in known_fakes:
-                self.fakes.add(
-                    ids=[fake["id"]],
-                    documents=[json.dumps(fake)],
-                    metadatas=[{
-                        "model": fake["model"],
-                        "pattern": fake["pattern"],
-                        "description": fake["description"]
-                    }]
-                )
+            self._add_batch(self.fakes, [
+                (fake["id"], json.dumps(fake), {
+                    "model": fake["model"],
+                    "pattern": fake["pattern"],
+                    "description": fake["description"]
+                })
+                for fake in known_fakes
+            ])
             print(f"✓ Loaded {len(known_fakes)} known fake signatures")
     
+    @staticmethod
+    def _add_batch(collection, records: list):
+        """Insert or replace (id, document, metadata) records with a single upsert call."""
+        # Later records win if an id was queued twice; upsert also replaces
+        # an id already stored, which add() would reject for the whole batch
+        latest = {record[0]: record for record in records}
+        collection.upsert(
+            ids=list(latest),
+            documents=[record[1] for record in latest.values()],
+            metadatas=[record[2] for record in latest.values()]
+        )
+    
+    def _index_stored_signatures(self):
+        """Build the vector index from every signature persisted in ChromaDB."""
+        stored = self.fakes.get()
+        ids, vectors = [], []
+        for sig_id, doc in zip(stored["ids"], stored["documents"]):
+            try:
+                fake_data = json.loads(doc)
+            except (TypeError, ValueError):
+                continue
+            self._signatures[sig_id] = fake_data
+            ids.append(sig_id)
+            vectors.append(signature_vector(fake_data.get("physics_signature")))
+        if ids:
+            self.signature_vectors.add(ids, vectors)
+    
     def find_similar_fakes(self, physics_signature: dict, top_k: int = 3) -> list:
         """
         Find similar fake patterns based on physics signature.
-        Returns list of matching known fakes.
+        Returns list of matching known fakes, nearest first. `distance` is in
+        units of check tolerances (see vector_index.FEATURES).
         """
-        # Query based on description
-        query_text = f"gravity deviation {physics_signature.get('gravity', 9.8)} shadow {physics_signature.get('shadow_variance', 0)}"
-        
-        results = self.fakes.query(
-            query_texts=[query_text],
-            n_results=top_k
-        )
-        
         matches = []
-        if results and results['documents']:
-            for doc, metadata in zip(results['documents'][0], results['metadatas'][0]):
-                try:
-                    fake_data = json.loads(doc)
-                    matches.append({
-                        "model": metadata.get("model", "Unknown"),
-                        "pattern": metadata.get("pattern", "Unknown"),
-                        "description": metadata.get("description", ""),
-                        "signature": fake_data.get("physics_signature", {})
-                    })
-                except:
-                    pass
+        for sig_id, distance in self.signature_vectors.search(signature_vector(physics_signature), top_k):
+            fake_data = self._signatures[sig_id]
+            matches.append({
+                "model": fake_data.get("model", "Unknown"),
+                "pattern": fake_data.get("pattern", "Unknown"),
+                "description": fake_data.get("description", ""),
+                "signature": fake_data.get("physics_signature", {}),
+                "distance": round(distance, 3)
+            })
         
         return matches
     
     def store_analysis(self, analysis_id: str, result: dict):
-        """Store an analysis result for future reference."""
-        self.history.add(
-            ids=[analysis_id],
-            documents=[json.dumps(result)],
-            metadatas=[{
-                "verdict": result.get("verdict", "unknown"),
-                "timestamp": str(time.time()),
-                "motion_type": result.get("motion_type", "unknown")
-            }]
-        )
+        """Queue an analysis result for storage (written in the background)."""
+        self._history_writes.append((analysis_id, json.dumps(result), {
+            "verdict": result.get("verdict", "unknown"),
+            "timestamp": str(time.time()),
+            "motion_type": result.get("motion_type", "unknown")
+        }))
     
     def get_similar_analyses(self, motion_type: str, top_k: int = 5) -> list:
         """Get similar past analyses for context."""
+        self._history_writes.flush()  # include analyses still queued
         results = self.history.query(
             query_texts=[motion_type],
             n_results=top_k
@@ -160,30 +205,45 @@ class KnowledgeBase:
     
     def add_fake_signature(self, signature_id: str, model: str, pattern: str, 
                           description: str, physics_data: dict):
-        """Add a newly discovered fake signature to the database."""
-        self.fakes.add(
-            ids=[signature_id],
-            documents=[json.dumps({
-                "id": signature_id,
-                "model": model,
-                "pattern": pattern,
-                "description": description,
-                "physics_signature": physics_data,
-                "discovered": time.time()
-            })],
-            metadatas=[{
-                "model": model,
-                "pattern": pattern,
-                "description": description
-            }]
-        )
+        """Add a newly discovered fake signature (searchable at once, persisted in the background)."""
+        fake_data = {
+            "id": signature_id,
+            "model": model,
+            "pattern": pattern,
+            "description": description,
+            "physics_signature": physics_data,
+            "discovered": time.time()
+        }
+        self._fake_writes.append((signature_id, json.dumps(fake_data), {
+            "model": model,
+            "pattern": pattern,
+            "description": description
+        }))
+        if signature_id not in self._signatures:
+            self.signature_vectors.add([signature_id], [signature_vector(physics_data)])
+        self._signatures[signature_id] = fake_data
     
     def get_stats(self) -> dict:
         """Get database statistics."""
         return {
-            "known_fakes": self.fakes.count(),
-            "total_analyses": self.history.count()
+            "known_fakes": self.fakes.count() + len(self._fake_writes),
+            "total_analyses": self.history.count() + len(self._history_writes),
+            "signature_index": "exact" if self.signature_vectors.exact else "ivf",
+            "pending_writes": {
+                "fakes": self._fake_writes.stats(),
+                "history": self._history_writes.stats()
+            }
         }
+    
+    def flush(self):
+        """Write all queued inserts now."""
+        self._fake_writes.flush()
+        self._history_writes.flush()
+    
+    def close(self):
+        """Final flush and stop the background writers (also runs at exit)."""
+        self._fake_writes.close()
+        self._history_writes.close()
 
-# Singleton instance
-knowledge_base = KnowledgeBase()
+# Singleton instance (built on first use)
+knowledge_base = LazySingleton(KnowledgeBase, "knowledge_base")
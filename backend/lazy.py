@@ -0,0 +1,62 @@
+"""
+VERITAS Lazy Singletons
+Module-level singletons that are only built when first used.
+"""
+import threading
+import time
+
+
+class LazySingleton:
+    """
+    Stand-in for a module-level singleton. The real object is created by
+    `factory()` on the first attribute access (thread-safe), so importing a
+    module - by tooling, tests or spawned worker processes - never pays for
+    clients, model loading or database connections it does not use.
+    """
+
+    def __init__(self, factory, name: str = None):
+        self._factory = factory
+        self._name = name or getattr(factory, "__name__", "singleton")
+        self._instance = None
+        self._lock = threading.Lock()
+        self.init_seconds = None
+
+    def _get(self):
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    start = time.perf_counter()
+                    self._instance = self._factory()
+                    self.init_seconds = time.perf_counter() - start
+                instance = self._instance
+        return instance
+
+    def __getattr__(self, name):
+        # Only reached for attributes the proxy itself does not define
+        return getattr(self._get(), name)
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def warm_up(self):
+        """Build the instance now instead of on first use"""
+        return self._get()
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazySingleton {self._name} ({state})>"
+
+
+def warm_up(*singletons) -> dict:
+    """Build each singleton, returning {name: seconds} (errors are reported, not raised)"""
+    timings = {}
+    for singleton in singletons:
+        try:
+            singleton.warm_up()
+            timings[singleton._name] = round(singleton.init_seconds or 0.0, 3)
+        except Exception as e:
+            print(f"⚠️ Warm-up of {singleton._name} failed: {e}")
+            timings[singleton._name] = None
+    return timings
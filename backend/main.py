@@ -1,15 +1,31 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import asyncio
 import json
 import os
-import tempfile
-import base64
-from google import genai
 from dotenv import load_dotenv
-from physics_engine import physics_kernel
-import re
+from physics_engine import physics_kernel, fit_trajectory
+from gemini_client import gemini
+from rate_limiter import RetryBudgetExhausted, PRIORITY_CRITICAL, PRIORITY_NORMAL
+from vision_engine import vision_kernel
+from video_reducer import reduced_cache
+from lazy import warm_up
+from worker_pool import cpu_pool
+from stage_scheduler import StageScheduler
+from result_cache import result_cache, RecordingSocket
+from session_store import session_store, AnalysisState
+from signature_index import signature_index, signature_from_results
+from history_store import history_store
+from shared_state import shared_state
+from job_queue import JobQueue, QueueFull
+from metrics import (registry, StageClock, analyses_total, ws_send_seconds, json_parse_seconds, json_parse_failures,
+                     schema_errors, first_result_seconds)
+from json_stream import (StreamingJSONParser, Field, NUMBER, extract_json, validate, validate_item,
+                         response_schema)
+from video_ingest import VideoUpload, UploadError, CHUNK_SIZE, ingest_base64, ingest_upload_file
 import time
+import uuid
 
 load_dotenv()
 
@@ -23,90 +39,251 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Gemini Client
-api_key = os.getenv("GEMINI_API_KEY")
-client = genai.Client(api_key=api_key) if api_key else None
-
-# Pre-loaded known fake signatures (Learning Loop Database)
-fake_signatures = [
-    {
-        "id": "sora_gravity_001",
-        "model": "OpenAI Sora",
-        "pattern": "gravity_deviation",
-        "description": "Objects fall 15-20% faster than Earth gravity",
-        "physics_signature": {"gravity_range": [11.5, 12.5], "typical_deviation": 18}
-    },
-    {
-        "id": "sora_water_002", 
-        "model": "OpenAI Sora",
-        "pattern": "water_reflection",
-        "description": "Water reflections don't match object positions",
-        "physics_signature": {"reflection_error": 0.3}
-    },
-    {
-        "id": "kling_shadow_001",
-        "model": "Kling AI",
-        "pattern": "shadow_inconsistency",
-        "description": "Multiple shadow directions in single scene",
-        "physics_signature": {"shadow_variance": 25}
-    },
-    {
-        "id": "runway_momentum_001",
-        "model": "Runway Gen-3",
-        "pattern": "momentum_violation",
-        "description": "Collisions violate conservation of momentum",
-        "physics_signature": {"momentum_error": 0.4}
-    },
-    {
-        "id": "pika_pendulum_001",
-        "model": "Pika Labs",
-        "pattern": "pendulum_period",
-        "description": "Pendulum timing doesn't match length",
-        "physics_signature": {"period_error": 0.3}
+# "paced" spaces out events for the live dashboard; "fast" runs stages
+# back-to-back for API/batch clients (selectable per start_analysis message)
+PIPELINE_MODES = ("paced", "fast")
+DEFAULT_PIPELINE_MODE = os.getenv("VERITAS_PIPELINE_MODE", "paced")
+
+# "two_step" asks for detection, then for the trajectory of the detected
+# motion; "combined" asks for both in one structured-output call (half the
+# round-trips and frame tokens) and falls back to the two prompts when that
+# answer does not validate
+PROMPT_MODE = os.getenv("VERITAS_PROMPT_MODE", "two_step")
+
+# Bump whenever prompts or physics thresholds change so cached verdicts are invalidated
+PIPELINE_VERSION = "4.0.0-7"
+
+# Gemini prompts. Detection gates the trajectory prompt (it needs motion_type);
+# the scans below depend on nothing and run concurrently with that chain
+DETECTION_PROMPT = """Analyze this video and identify:
+1. What objects are visible and moving?
+2. What type of motion is occurring? (pendulum, free fall, projectile, collision, walking, etc.)
+3. What is the primary subject to track?
+
+Respond in JSON format:
+{
+    "objects": [{"name": "ball", "type": "moving"}, {"name": "hand", "type": "static"}],
+    "motion_type": "free_fall",
+    "primary_subject": "ball",
+    "scene_description": "A ball being dropped from a height"
+}"""
+
+SHADOW_PROMPT = """Look at the shadows in this video.
+For every object that casts a clearly visible shadow, estimate the direction of
+the shadow in degrees (0 = pointing right, 90 = pointing down in the frame).
+
+Respond in JSON:
+{
+    "shadows": [{"object": "ball", "angle": 45.0}],
+    "light_sources": 1
+}"""
+
+REFLECTION_PROMPT = """Look for reflections in this video (mirrors, water, glass, polished floors).
+For every reflection, estimate how far it is displaced from where the reflected
+object says it should be, as a fraction of the frame size (0 = perfectly aligned).
+
+Respond in JSON:
+{
+    "reflections": [{"object": "tree", "surface": "water", "offset": 0.02}]
+}"""
+
+ANOMALY_PROMPT = """Scan this video for events that are physically impossible:
+objects appearing or vanishing, passing through each other, changing shape or
+count, or moving without a cause. Ignore ordinary camera motion and cuts.
+
+Respond in JSON:
+{
+    "anomalies": []
+}"""
+
+COMBINED_PROMPT = """Analyze this video in a single pass:
+1. What objects are visible and moving?
+2. What type of motion is occurring? (pendulum, free_fall, projectile, collision, walking, etc.)
+3. What is the primary subject? Extract its trajectory.
+
+For that motion type, fill in the measurements that apply (null for the rest):
+If it's a pendulum: estimate the period (time for one complete swing) and approximate length.
+If it's free fall: estimate the fall time and distance, and the real-world height of the visible frame.
+If it's projectile motion: estimate launch angle, initial velocity, and range.
+If it's a collision: estimate velocities before and after impact.
+
+Also check for any physics anomalies - things that look physically impossible.
+
+Trajectory points: t is in seconds from the start of the video; x and y are the subject's
+center as fractions (0-1) of the frame width and height, with the origin at the top-left
+corner and y growing downward (y=0 is the top edge, y=1 the bottom edge).
+
+Respond in JSON:
+{
+    "objects": [{"name": "ball", "type": "moving"}, {"name": "hand", "type": "static"}],
+    "motion_type": "free_fall",
+    "primary_subject": "ball",
+    "scene_description": "A ball being dropped from a height",
+    "measurements": {
+        "period": null,  // for pendulum (seconds)
+        "length": null,  // for pendulum (meters estimate)
+        "fall_time": 1.0,
+        "fall_distance": 4.9,
+        "scene_height_m": 6.0,  // real-world height of the frame (meters)
+        "launch_angle": null,
+        "initial_velocity": null
     },
-    {
-        "id": "midjourney_anatomy_001",
-        "model": "Midjourney",
-        "pattern": "hand_anatomy",
-        "description": "Incorrect finger count or impossible hand poses",
-        "physics_signature": {"finger_count_error": True}
-    }
-]
+    "trajectory_points": [  // 10-20 points of the primary subject, sampled evenly over the motion
+        {"t": 0.0, "x": 0.5, "y": 0.1},
+        {"t": 0.5, "x": 0.5, "y": 0.3}
+    ],
+    "anomalies_detected": [],
+    "physics_looks_real": true,
+    "confidence": 0.85
+}"""
+
+# Expected shape of each answer. Invalid fields fall back to the defaults the
+# pipeline used before and are reported; elements missing a required field are dropped
+OBJECT_SCHEMA = {"name": Field(str), "type": Field(str, required=False, default="moving")}
+POINT_SCHEMA = {"t": Field(NUMBER), "x": Field(NUMBER), "y": Field(NUMBER)}
+MEASUREMENT_SCHEMA = {
+    key: Field(NUMBER, required=False, nullable=True)
+    for key in ("period", "length", "fall_time", "fall_distance", "scene_height_m",
+                "launch_angle", "initial_velocity")
+}
 
-class AnalysisState:
-    def __init__(self):
-        self.video_path = None
-        self.video_bytes = None
-        self.physics_data = {}
-        self.motion_type = None
-        self.objects = []
+DETECTION_SCHEMA = {
+    "objects": Field(list, default=[{"name": "object", "type": "moving"}], items=OBJECT_SCHEMA),
+    "motion_type": Field(str, default="unknown"),
+    "primary_subject": Field(str, required=False, default="object"),
+    "scene_description": Field(str, required=False, default="Motion detected")
+}
+TRAJECTORY_SCHEMA = {
+    "motion_type": Field(str, required=False),
+    "measurements": Field(dict, default={}, items=MEASUREMENT_SCHEMA),
+    "trajectory_points": Field(list, default=[], items=POINT_SCHEMA),
+    "anomalies_detected": Field(list, required=False, default=[], items=str),
+    "physics_looks_real": Field(bool, default=True),
+    "confidence": Field(NUMBER, default=0.85)
+}
+SHADOW_SCHEMA = {
+    "shadows": Field(list, default=[], items={"object": Field(str, required=False), "angle": Field(NUMBER)}),
+    "light_sources": Field(NUMBER, required=False, nullable=True)
+}
+REFLECTION_SCHEMA = {
+    "reflections": Field(list, default=[], items={"object": Field(str, required=False),
+                                                  "surface": Field(str, required=False),
+                                                  "offset": Field(NUMBER)})
+}
+ANOMALY_SCHEMA = {"anomalies": Field(list, default=[], items=str)}
+COMBINED_SCHEMA = {**DETECTION_SCHEMA, **{k: v for k, v in TRAJECTORY_SCHEMA.items() if k != "motion_type"}}
 
-sessions = {}
+# Constrains the combined answer to COMBINED_SCHEMA instead of relying on the example
+COMBINED_CONFIG = {"response_mime_type": "application/json", "response_schema": response_schema(COMBINED_SCHEMA)}
 
 @app.websocket("/ws/analyze")
 async def websocket_analyze(websocket: WebSocket):
     await websocket.accept()
-    session_id = str(id(websocket))
-    sessions[session_id] = AnalysisState()
+    # A reconnecting client sends its session id back, possibly to another
+    # worker; with shared state configured that worker resumes the session
+    session_id = websocket.query_params.get("session_id")
+    if not session_id or len(session_id) > 64 or session_id in session_store:
+        session_id = uuid.uuid4().hex
+    state = await session_store.resume(session_id, mode=DEFAULT_PIPELINE_MODE)
+    await send_update(websocket, "session", {"session_id": session_id, "resumed": state.resumed})
     
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            
+            state = session_store.get(session_id)
+            if state is None:
+                # Evicted to stay within the session/byte limits
+                await send_update(websocket, "log", {"level": "system", "message": "⚠ Session expired - please reconnect"})
+                await websocket.close(code=1008)
+                break
+            
+            # Binary frames carry video chunks between upload_start and upload_end
+            if frame.get("bytes") is not None:
+                await receive_video_chunk(websocket, session_id, frame["bytes"])
+                continue
             
-            if message["type"] == "start_analysis":
-                video_data = message.get("video_data")  # Base64 encoded video
-                await run_full_analysis(websocket, session_id, video_data)
+            message = json.loads(frame["text"])
+            
+            if message["type"] == "upload_start":
+                await start_video_upload(websocket, session_id)
+                
+            elif message["type"] == "upload_end":
+                await finish_video_upload(websocket, session_id)
+                
+            elif message["type"] == "start_analysis":
+                if state.busy:
+                    await send_update(websocket, "log", {"level": "system", "message": "Analysis already in progress"})
+                    continue
+                mode = message.get("mode", DEFAULT_PIPELINE_MODE)
+                state.mode = mode if mode in PIPELINE_MODES else DEFAULT_PIPELINE_MODE
+                upload = session_store.get_upload(message.get("video_id"))
+                if upload:
+                    state.attach_video(upload, owned=False)
+                video_data = message.get("video_data")  # Base64 encoded video (legacy)
+                # Run as a task so the socket keeps being read and a disconnect
+                # can cancel any in-flight Gemini calls
+                state.task = asyncio.create_task(run_full_analysis(websocket, session_id, video_data))
+                state.task.add_done_callback(lambda _: session_store.publish(session_id))
                 
             elif message["type"] == "user_response":
                 await process_user_response(websocket, session_id, message.get("response"))
                 
     except WebSocketDisconnect:
-        if session_id in sessions:
-            del sessions[session_id]
+        pass
+    finally:
+        # Also reached on protocol errors, so files and tasks never outlive the socket
+        session_store.close(session_id)
 
 async def send_update(ws: WebSocket, update_type: str, data: dict):
-    await ws.send_json({"type": update_type, **data})
+    # "ts" lets clients in fast mode re-create pacing on their side
+    start = time.perf_counter()
+    await ws.send_json({"type": update_type, **data, "ts": round(time.time(), 3)})
+    ws_send_seconds.observe(time.perf_counter() - start, update_type)
+
+async def pace(state: AnalysisState, seconds: float):
+    """Dashboard pacing between stages; skipped entirely in fast mode"""
+    if state is None or state.mode != "fast":
+        await asyncio.sleep(seconds)
+
+async def start_video_upload(ws: WebSocket, session_id: str):
+    state = session_store.get(session_id)
+    if state.upload:
+        state.upload.discard()
+    state.upload = VideoUpload()
+    await send_update(ws, "upload_ready", {"video_id": state.upload.video_id, "chunk_size": CHUNK_SIZE})
+
+async def receive_video_chunk(ws: WebSocket, session_id: str, chunk: bytes):
+    state = session_store.get(session_id)
+    if not state.upload:
+        await send_update(ws, "upload_error", {"message": "Binary frame received without upload_start"})
+        return
+    try:
+        state.write_chunk(chunk)
+    except UploadError as e:
+        state.upload = None
+        await send_update(ws, "upload_error", {"message": str(e)})
+        return
+    if session_store.over_budget(session_id):
+        state.upload.discard()
+        state.upload = None
+        await send_update(ws, "upload_error", {"message": "Server storage is full - try again shortly"})
+
+async def finish_video_upload(ws: WebSocket, session_id: str):
+    state = session_store.get(session_id)
+    upload, state.upload = state.upload, None
+    if not upload:
+        await send_update(ws, "upload_error", {"message": "No upload in progress"})
+        return
+    try:
+        upload.finish()
+    except UploadError as e:
+        await send_update(ws, "upload_error", {"message": str(e)})
+        return
+    state.attach_video(upload)
+    await send_update(ws, "upload_complete", upload.describe())
 
 async def run_full_analysis(ws: WebSocket, session_id: str, video_base64: str = None):
     """
@@ -118,14 +295,33 @@ async def run_full_analysis(ws: WebSocket, session_id: str, video_base64: str =
     5. Ask user if needed
     6. Give verdict
     """
-    state = sessions[session_id]
+    state = session_store.get(session_id)
+    clock = StageClock()
     
     # ========== STAGE 1: INITIALIZATION ==========
     await send_update(ws, "log", {"level": "system", "message": "VERITAS ENGINE INITIALIZING"})
     await send_update(ws, "scan_progress", {"progress": 5, "stage": "init"})
-    await asyncio.sleep(0.3)
+    await pace(state, 0.3)
+    
+    # Legacy clients send the whole clip as base64; spool it to disk like a chunked upload
+    if video_base64:
+        try:
+            state.attach_video(await asyncio.to_thread(ingest_base64, video_base64))
+        except UploadError as e:
+            await send_update(ws, "log", {"level": "system", "message": f"⚠ Video rejected: {e}"})
     
-    if not client:
+    # Identical clips are answered from the result cache without touching Gemini
+    cache_key = None
+    if state.video_hash:
+        cache_key = result_cache.make_key(state.video_hash, PIPELINE_VERSION)
+        cached_events = await result_cache.get(cache_key)
+        if cached_events:
+            await replay_cached_analysis(ws, cached_events)
+            return
+        ws = RecordingSocket(ws)
+    clock.lap("init")
+    
+    if not gemini.available:
         await send_update(ws, "log", {"level": "system", "message": "⚠ GEMINI API NOT CONFIGURED"})
         await send_update(ws, "log", {"level": "agent", "message": "Add GEMINI_API_KEY to .env for real analysis"})
         await send_update(ws, "log", {"level": "agent", "message": "Running demonstration mode..."})
@@ -134,79 +330,176 @@ async def run_full_analysis(ws: WebSocket, session_id: str, video_base64: str =
     
     await send_update(ws, "log", {"level": "agent", "message": "Gemini Vision API connected"})
     await send_update(ws, "scan_progress", {"progress": 10, "stage": "connecting"})
-    await asyncio.sleep(0.3)
+    await pace(state, 0.3)
     
+    stages = StageScheduler()
+    media = None
     try:
+        # One local pass tracks the subject and reduces the clip to the frames
+        # Gemini is shown; it runs on the CPU pool, outside the stage slots
+        async def report_tracking(fraction):
+            await send_update(ws, "scan_progress", {"progress": 15 + int(fraction * 9), "stage": "preprocessing"})
+        
+        if state.video_path:
+            media = asyncio.ensure_future(
+                vision_kernel.prepare_video(state.video_path, state.video_hash, progress=report_tracking))
+        
+        async def reduced_video():
+            return (await media)["reduced"] if media is not None else None
+        
+        # Only the trajectory prompt waits on detection (it needs motion_type);
+        # everything else starts now and overlaps with local tracking
+        # Objects are shown as soon as each one has streamed in
+        streamed_objects = []
+        
+        async def on_object(path, element):
+            obj, _ = validate_item(element, OBJECT_SCHEMA)
+            if obj is not None:
+                streamed_objects.append(obj)
+                await send_update(ws, "objects_detected", {"objects": detected_objects(streamed_objects)})
+        
+        # The model's points are plotted as they stream in, unless the denser
+        # local track will replace them anyway
+        streamed_points = 0
+        
+        async def on_point(path, element):
+            nonlocal streamed_points
+            point, _ = validate_item(element, POINT_SCHEMA)
+            if point is not None:
+                frames = await reduced_video()
+                if frames is not None:
+                    point = frames.to_full_frame(point)
+                await send_update(ws, "trajectory_point", {"index": streamed_points, "point": point})
+                streamed_points += 1
+        
+        async def detect():
+            return await stream_gemini_json(ws, DETECTION_PROMPT, "object detection", PRIORITY_CRITICAL,
+                                            watch={("objects",): on_object}, media=await reduced_video())
+        
+        async def analyse_combined():
+            track = (await media)["track"] if media is not None else {}
+            watch = {("objects",): on_object}
+            if len(track.get("t", ())) < 5:
+                watch[("trajectory_points",)] = on_point
+            return await stream_gemini_json(ws, COMBINED_PROMPT, "combined analysis", PRIORITY_CRITICAL,
+                                            watch=watch, media=await reduced_video(), config=COMBINED_CONFIG)
+        
+        if PROMPT_MODE == "combined":
+            stages.start("combined", analyse_combined)
+        else:
+            stages.start("detection", detect)
+        
+        # The scans ask about the clip itself, so they only run with its frames
+        async def scan(prompt, label):
+            frames = await reduced_video()
+            if frames is None:
+                return None
+            return await call_gemini_safe(ws, prompt, label, media=frames)
+        
+        stages.start("shadows", lambda: scan(SHADOW_PROMPT, "shadow scan"))
+        stages.start("reflections", lambda: scan(REFLECTION_PROMPT, "reflection scan"))
+        stages.start("anomalies", lambda: scan(ANOMALY_PROMPT, "anomaly scan"))
+        
         # ========== STAGE 2: VIDEO PREPROCESSING ==========
         await send_update(ws, "log", {"level": "agent", "message": "Preprocessing video frames..."})
         await send_update(ws, "scan_progress", {"progress": 15, "stage": "preprocessing"})
-        await asyncio.sleep(0.5)
+        await pace(state, 0.5)
+        
+        # Local CPU tracking gives dense (t, x, y) samples without a per-frame model call
+        local_points = []
+        reduced = None
+        if media is not None:
+            prepared = await media
+            track, reduced = prepared["track"], prepared["reduced"]
+            if track.get("source") == "local_tracking":
+                local_points = [
+                    {"t": round(float(t), 4), "x": round(float(x), 4), "y": round(float(y), 4)}
+                    for t, x, y in zip(track["t"], track["x"], track["y"])
+                ]
+                await send_update(ws, "log", {"level": "agent", "message": f"Local tracker: {len(local_points)} motion samples from {track['frames_decoded']} frames"})
+            elif "error" in track:
+                await send_update(ws, "log", {"level": "system", "message": f"⚠ Local tracking failed: {track['error']}"})
+            if reduced is not None:
+                width, height = reduced.size
+                cropped = " around the subject" if reduced.crop else ""
+                await send_update(ws, "log", {"level": "agent", "message": f"Sending Gemini {len(reduced.frames)} frames at {width}x{height}{cropped} (~{reduced.tokens} tokens)"})
+        clock.lap("preprocessing")
         
         await send_update(ws, "log", {"level": "agent", "message": "Extracting key frames for analysis..."})
-        await asyncio.sleep(0.3)
+        await pace(state, 0.3)
         
         # ========== STAGE 3: OBJECT DETECTION WITH GEMINI ==========
         await send_update(ws, "log", {"level": "system", "message": "PHASE 1: OBJECT DETECTION"})
         await send_update(ws, "scan_progress", {"progress": 25, "stage": "detection"})
-        await asyncio.sleep(0.5)
-        
-        await send_update(ws, "log", {"level": "agent", "message": "Sending to Gemini Vision for object detection..."})
+        await pace(state, 0.5)
         
-        # First Gemini call - detect what's in the video
-        detection_prompt = """Analyze this video and identify:
-1. What objects are visible and moving?
-2. What type of motion is occurring? (pendulum, free fall, projectile, collision, walking, etc.)
-3. What is the primary subject to track?
-
-Respond in JSON format:
-{
-    "objects": [{"name": "ball", "type": "moving"}, {"name": "hand", "type": "static"}],
-    "motion_type": "free_fall",
-    "primary_subject": "ball",
-    "scene_description": "A ball being dropped from a height"
-}"""
-
-        detection_response = await call_gemini_safe(ws, detection_prompt)
+        await send_update(ws, "log", {"level": "agent", "message": "Waiting for Gemini object detection..."})
         
-        if not detection_response:
-            await run_demo_with_learning(ws, session_id)
-            return
+        # A combined answer missing a usable required field would run the
+        # physics on defaults: ask the two separate prompts instead
+        combined = None
+        if PROMPT_MODE == "combined":
+            combined = await stages.result("combined")
+            if combined is None:
+                await run_demo_with_learning(ws, session_id)
+                return
+            unusable = [key for key, field in COMBINED_SCHEMA.items()
+                        if field.required and not field.check(combined.get(key))]
+            if unusable:
+                schema_errors.inc(len(unusable), "combined")
+                await send_update(ws, "log", {"level": "system", "message": f"⚠ Combined Gemini answer unusable ({', '.join(unusable)}) - asking for detection and trajectory separately"})
+                combined = None
+                streamed_objects.clear()
+                streamed_points = 0
+                stages.start("detection", detect)
         
-        # Parse detection results
-        detection_data = parse_json_response(detection_response)
-        objects = detection_data.get("objects", [{"name": "object", "type": "moving"}])
-        motion_type = detection_data.get("motion_type", "unknown")
-        primary_subject = detection_data.get("primary_subject", "object")
-        scene_desc = detection_data.get("scene_description", "Motion detected")
+        if combined is not None:
+            combined = detection_data = await validated(ws, combined, COMBINED_SCHEMA, "combined")
+        else:
+            detection_data = await stages.result("detection")
+            
+            if detection_data is None:
+                await run_demo_with_learning(ws, session_id)
+                return
+            
+            detection_data = await validated(ws, detection_data, DETECTION_SCHEMA, "detection")
+        objects = detection_data["objects"]
+        motion_type = detection_data["motion_type"]
+        primary_subject = detection_data["primary_subject"]
+        scene_desc = detection_data["scene_description"]
         
         state.objects = objects
         state.motion_type = motion_type
         
-        await send_update(ws, "objects_detected", {
-            "objects": [{"id": i+1, "type": obj.get("name", "object"), "confidence": 0.9} for i, obj in enumerate(objects)]
-        })
+        if objects != streamed_objects:
+            await send_update(ws, "objects_detected", {"objects": detected_objects(objects)})
         
         await send_update(ws, "log", {"level": "agent", "message": f"Scene: {scene_desc}"})
         await send_update(ws, "log", {"level": "agent", "message": f"Motion type: {motion_type}"})
         await send_update(ws, "log", {"level": "agent", "message": f"Primary subject: {primary_subject}"})
-        await asyncio.sleep(0.5)
+        clock.lap("detection")
+        await pace(state, 0.5)
         
         # ========== STAGE 4: TRAJECTORY EXTRACTION ==========
         await send_update(ws, "log", {"level": "system", "message": "PHASE 2: TRAJECTORY ANALYSIS"})
         await send_update(ws, "scan_progress", {"progress": 45, "stage": "trajectory"})
         
         await send_update(ws, "log", {"level": "agent", "message": f"Tracking {primary_subject} movement..."})
-        await asyncio.sleep(0.5)
+        await pace(state, 0.5)
         
         trajectory_prompt = f"""For the {motion_type} motion in this video, extract the trajectory data.
 
 If it's a pendulum: estimate the period (time for one complete swing) and approximate length.
-If it's free fall: estimate the fall time and distance.
+If it's free fall: estimate the fall time and distance, and the real-world height of the visible frame.
 If it's projectile motion: estimate launch angle, initial velocity, and range.
 If it's a collision: estimate velocities before and after impact.
 
 Also check for any physics anomalies - things that look physically impossible.
 
+Trajectory points: t is in seconds from the start of the video; x and y are the subject's
+center as fractions (0-1) of the frame width and height, with the origin at the top-left
+corner and y growing downward (y=0 is the top edge, y=1 the bottom edge).
+
 Respond in JSON:
 {{
     "motion_type": "{motion_type}",
@@ -215,10 +508,11 @@ Respond in JSON:
         "length": 1.0,  // for pendulum (meters estimate)
         "fall_time": null,
         "fall_distance": null,
+        "scene_height_m": null,  // real-world height of the frame (meters)
         "launch_angle": null,
         "initial_velocity": null
     }},
-    "trajectory_points": [
+    "trajectory_points": [  // 10-20 points sampled evenly over the motion
         {{"t": 0.0, "x": 0.3, "y": 0.7}},
         {{"t": 0.5, "x": 0.5, "y": 0.8}}
     ],
@@ -226,25 +520,41 @@ Respond in JSON:
     "physics_looks_real": true,
     "confidence": 0.85
 }}"""
-
-        trajectory_response = await call_gemini_safe(ws, trajectory_prompt)
         
-        if not trajectory_response:
-            await run_demo_with_learning(ws, session_id)
-            return
+        if combined is not None:
+            trajectory_data = combined
+        else:
+            watch = {} if len(local_points) >= 5 else {("trajectory_points",): on_point}
+            stages.start("trajectory", lambda: stream_gemini_json(ws, trajectory_prompt, "trajectory", PRIORITY_CRITICAL,
+                                                                  watch=watch, media=reduced))
+            trajectory_data = await stages.result("trajectory")
+            
+            if trajectory_data is None:
+                await run_demo_with_learning(ws, session_id)
+                return
+            
+            trajectory_data = await validated(ws, trajectory_data, TRAJECTORY_SCHEMA, "trajectory")
+        measurements = trajectory_data["measurements"]
+        trajectory_points = trajectory_data["trajectory_points"]
+        anomalies = trajectory_data["anomalies_detected"]
+        physics_looks_real = trajectory_data["physics_looks_real"]
+        ai_confidence = trajectory_data["confidence"]
+        
+        # Cropped frames: map the model's coordinates and frame height back to the whole clip
+        if reduced is not None:
+            trajectory_points = [reduced.to_full_frame(point) for point in trajectory_points]
+            measurements["scene_height_m"] = reduced.full_frame_height(measurements.get("scene_height_m"))
         
-        trajectory_data = parse_json_response(trajectory_response)
-        measurements = trajectory_data.get("measurements", {})
-        trajectory_points = trajectory_data.get("trajectory_points", [])
-        anomalies = trajectory_data.get("anomalies_detected", [])
-        physics_looks_real = trajectory_data.get("physics_looks_real", True)
-        ai_confidence = trajectory_data.get("confidence", 0.85)
+        # Locally tracked points are denser and more precise than the model's estimates
+        if len(local_points) >= 5:
+            trajectory_points = local_points
         
         if trajectory_points:
             await send_update(ws, "trajectory_data", {"points": trajectory_points, "frames": 60, "fps": 30})
             await send_update(ws, "log", {"level": "agent", "message": f"Extracted {len(trajectory_points)} trajectory points"})
+        clock.lap("trajectory")
         
-        await asyncio.sleep(0.5)
+        await pace(state, 0.5)
         
         # ========== STAGE 5: PHYSICS CALCULATIONS ==========
         await send_update(ws, "log", {"level": "system", "message": "PHASE 3: PHYSICS VERIFICATION"})
@@ -253,8 +563,8 @@ Respond in JSON:
         physics_results = []
         
         if motion_type == "pendulum":
-            period = measurements.get("period", 2.0)
-            length = measurements.get("length", 1.0)
+            period = measurements.get("period") or 2.0
+            length = measurements.get("length") or 1.0
             
             await send_update(ws, "log", {"level": "agent", "message": f"Pendulum detected: Period={period}s, Length≈{length}m"})
             
@@ -273,22 +583,36 @@ Respond in JSON:
                 await send_update(ws, "log", {"level": "agent", "message": f"✗ GRAVITY ANOMALY: {result['calculated_g']} m/s²"})
                 
         elif motion_type == "free_fall":
-            fall_time = measurements.get("fall_time", 1.0)
-            fall_distance = measurements.get("fall_distance", 5.0)
+            fall_time = measurements.get("fall_time") or 1.0
+            fall_distance = measurements.get("fall_distance") or 5.0
             
-            # g = 2d / t²
-            calculated_g = (2 * fall_distance) / (fall_time ** 2) if fall_time > 0 else 0
+            # Prefer a robust fit over the tracked points; the two scalar
+            # estimates are only a fallback when the points are unusable
+            trajectory_result = None
+            scene_height = measurements.get("scene_height_m")
+            if len(trajectory_points) >= 5 and scene_height:
+                trajectory_result = await cpu_pool.submit(fit_trajectory, trajectory_points, scene_height)
             
-            await send_update(ws, "log", {"level": "agent", "message": f"Free fall: Time={fall_time}s, Distance≈{fall_distance}m"})
-            await send_update(ws, "log", {"level": "agent", "message": f"Calculated gravity: {calculated_g:.2f} m/s²"})
-            
-            is_anomaly = abs(calculated_g - 9.8) > 1.5
-            physics_results.append({
-                "check": "GRAVITY",
-                "status": "VIOLATION" if is_anomaly else "PASS",
-                "calculated_g": round(calculated_g, 2),
-                "deviation": round((calculated_g - 9.8) / 9.8 * 100, 1)
-            })
+            if trajectory_result and trajectory_result["status"] != "ERROR":
+                calculated_g = trajectory_result["calculated_g"]
+                physics_results.append(trajectory_result)
+                
+                await send_update(ws, "log", {"level": "agent", "message": f"Robust fit over {trajectory_result['points_used']} points ({trajectory_result['outliers']} outliers rejected)"})
+                await send_update(ws, "log", {"level": "agent", "message": f"Calculated gravity: {calculated_g:.2f} ± {trajectory_result['uncertainty']} m/s²"})
+            else:
+                # g = 2d / t²
+                calculated_g = (2 * fall_distance) / (fall_time ** 2) if fall_time > 0 else 0
+                
+                await send_update(ws, "log", {"level": "agent", "message": f"Free fall: Time={fall_time}s, Distance≈{fall_distance}m"})
+                await send_update(ws, "log", {"level": "agent", "message": f"Calculated gravity: {calculated_g:.2f} m/s²"})
+                
+                is_anomaly = abs(calculated_g - 9.8) > 1.5
+                physics_results.append({
+                    "check": "GRAVITY",
+                    "status": "VIOLATION" if is_anomaly else "PASS",
+                    "calculated_g": round(calculated_g, 2),
+                    "deviation": round((calculated_g - 9.8) / 9.8 * 100, 1)
+                })
             
             await send_update(ws, "physics_update", {
                 "gravity": round(calculated_g, 2),
@@ -304,44 +628,75 @@ Respond in JSON:
                 "status": "VIOLATION" if not physics_looks_real else "PASS",
                 "confidence": ai_confidence
             })
+        clock.lap("physics")
         
-        await asyncio.sleep(0.5)
+        await pace(state, 0.5)
         
         # ========== STAGE 6: ANOMALY ANALYSIS ==========
         await send_update(ws, "log", {"level": "system", "message": "PHASE 4: ANOMALY SCAN"})
         await send_update(ws, "scan_progress", {"progress": 80, "stage": "anomaly"})
         
+        scans = await stages.gather("shadows", "reflections", "anomalies")
+        
+        if reduced is None:
+            await send_update(ws, "log", {"level": "system", "message": "⚠ No video frames - shadow, reflection and anomaly scans skipped"})
+        else:
+            anomaly_data = await parse_validated(ws, scans["anomalies"], ANOMALY_SCHEMA, "anomaly scan")
+            for anomaly in anomaly_data["anomalies"]:
+                if anomaly not in anomalies:
+                    anomalies.append(anomaly)
+        
         if anomalies:
             for anomaly in anomalies:
                 await send_update(ws, "log", {"level": "agent", "message": f"⚠ Anomaly: {anomaly}"})
         else:
             await send_update(ws, "log", {"level": "agent", "message": "No obvious anomalies detected"})
         
-        # Check shadows
-        shadow_result = physics_kernel.check_shadow_consistency([45.2, 44.8, 45.5, 45.0, 44.9])
-        physics_results.append(shadow_result)
-        await send_update(ws, "log", {"level": "agent", "message": f"✓ Shadow consistency: {shadow_result['status']}"})
+        if reduced is not None:
+            # Check shadows
+            shadow_data = await parse_validated(ws, scans["shadows"], SHADOW_SCHEMA, "shadow scan")
+            shadow_angles = [s["angle"] for s in shadow_data["shadows"]]
+            shadow_result = physics_kernel.check_shadow_consistency(shadow_angles)
+            if shadow_result["status"] != "INSUFFICIENT_DATA":
+                physics_results.append(shadow_result)
+                mark = "✓" if shadow_result["status"] == "PASS" else "✗"
+                await send_update(ws, "log", {"level": "agent", "message": f"{mark} Shadow consistency: {shadow_result['status']} ({len(shadow_angles)} shadows)"})
+            else:
+                await send_update(ws, "log", {"level": "agent", "message": "Not enough shadows to check lighting"})
+        
+            # Check reflections
+            reflection_data = await parse_validated(ws, scans["reflections"], REFLECTION_SCHEMA, "reflection scan")
+            reflection_errors = [r["offset"] for r in reflection_data["reflections"]]
+            reflection_result = physics_kernel.check_reflection_consistency(reflection_errors)
+            if reflection_result["status"] != "INSUFFICIENT_DATA":
+                physics_results.append(reflection_result)
+                mark = "✓" if reflection_result["status"] == "PASS" else "✗"
+                await send_update(ws, "log", {"level": "agent", "message": f"{mark} Reflection consistency: {reflection_result['status']}"})
+        clock.lap("anomaly")
         
-        await asyncio.sleep(0.5)
+        await pace(state, 0.5)
         
         # ========== STAGE 7: LEARNING LOOP CHECK ==========
         await send_update(ws, "log", {"level": "system", "message": "PHASE 5: DATABASE COMPARISON"})
         await send_update(ws, "scan_progress", {"progress": 90, "stage": "learning"})
         
-        # Check against known fakes
-        signature = f"{motion_type}_{ai_confidence}"
-        match_found = False
-        
-        for known_fake in fake_signatures:
-            if known_fake["motion_type"] == motion_type and not physics_looks_real:
-                match_found = True
-                await send_update(ws, "log", {"level": "agent", "message": f"⚠ Similar pattern found in database: {known_fake['reason']}"})
-                break
+        # Check against known fakes, only when something failed: the values
+        # of the failed checks first, then earlier fakes of the same motion
+        # type when the model already flagged this one
+        observed = signature_from_results(physics_results)
+        await signature_index.sync()
+        matches = signature_index.match(observed) if observed else []
+        if not matches and not physics_looks_real:
+            matches = signature_index.match(motion_type=motion_type)
         
-        if not match_found:
+        if matches:
+            known_fake = matches[0]
+            await send_update(ws, "log", {"level": "agent", "message": f"⚠ Similar pattern found in database: {known_fake.get('model', 'Unknown AI Model')} - {known_fake['description']}"})
+        else:
             await send_update(ws, "log", {"level": "agent", "message": "No matches in known fake database"})
+        clock.lap("learning")
         
-        await asyncio.sleep(0.3)
+        await pace(state, 0.3)
         
         # ========== STAGE 8: FINAL VERDICT ==========
         await send_update(ws, "scan_progress", {"progress": 100, "stage": "verdict"})
@@ -359,13 +714,17 @@ Respond in JSON:
             await send_update(ws, "log", {"level": "system", "message": f"⚠ {violations} PHYSICS VIOLATIONS DETECTED"})
             
             # Store in learning database
-            fake_signatures.append({
+            stored, is_new = signature_index.add({
+                "model": "Unknown AI Model",
+                "pattern": "physics_violation",
                 "motion_type": motion_type,
-                "physics_looks_real": physics_looks_real,
-                "reason": f"{violations} violations in {motion_type} motion",
-                "timestamp": time.time()
+                "description": f"{violations} violations in {motion_type} motion",
+                "physics_signature": {**observed, "violations": violations}
             })
-            await send_update(ws, "log", {"level": "agent", "message": "Signature stored in fake database"})
+            if is_new:
+                await send_update(ws, "log", {"level": "agent", "message": "Signature stored in fake database"})
+            else:
+                await send_update(ws, "log", {"level": "agent", "message": f"Known signature seen {stored['count']} times"})
             
             await send_update(ws, "verdict", {
                 "result": "synthetic",
@@ -383,61 +742,152 @@ Respond in JSON:
                 "gravity": physics_results[0].get("calculated_g", 9.8) if physics_results else 9.8,
                 "reason": f"All {total_checks} checks passed • Real-world physics confirmed"
             })
+        
+        history_store.record({
+            "video_hash": state.video_hash,
+            "source": "live",
+            "pipeline_version": PIPELINE_VERSION,
+            "verdict": "synthetic" if is_synthetic else "authentic",
+            "confidence": round(confidence, 1),
+            "motion_type": motion_type,
+            "gravity": physics_results[0].get("calculated_g") if physics_results else None,
+            "checks": physics_results,
+            "measurements": measurements,
+            "anomalies": anomalies
+        })
+        clock.lap("verdict")
+        analyses_total.inc(1, "synthetic" if is_synthetic else "authentic", "live")
+        
+        if cache_key and not ws.degraded:
+            result_cache.put(cache_key, ws.events)
             
     except Exception as e:
         await send_update(ws, "log", {"level": "system", "message": f"Error: {str(e)}"})
         await send_update(ws, "log", {"level": "agent", "message": "Falling back to demo mode..."})
         await run_demo_with_learning(ws, session_id)
+    finally:
+        stages.cancel_all()
+        if media is not None:
+            media.cancel()  # the shared reduction itself is shielded
 
-async def call_gemini_safe(ws: WebSocket, prompt: str) -> str:
-    """Call Gemini with error handling and rate limit retry"""
+async def replay_cached_analysis(ws: WebSocket, events: list):
+    """Send a previously computed result stream for an identical video"""
+    await send_update(ws, "log", {"level": "agent", "message": "Identical video analysed before - loading cached verdict"})
+    for event in events:
+        if event["type"] == "verdict":
+            await send_update(ws, "scan_progress", {"progress": 100, "stage": "verdict"})
+            analyses_total.inc(1, event.get("result", "unknown"), "cache")
+        await send_update(ws, event["type"], {k: v for k, v in event.items() if k != "type"})
+
+def gemini_contents(prompt: str, media=None):
+    """The prompt alone, or followed by the frames of a ReducedVideo"""
+    if media is None:
+        return prompt
+    return [f"{prompt}\n\n{media.prompt_note()}", *media.parts()]
+
+async def call_gemini_safe(ws: WebSocket, prompt: str, label: str = None, priority: int = PRIORITY_NORMAL,
+                           media=None) -> str:
+    """Call Gemini without blocking the event loop; rate limiting and retries are handled by GeminiClient"""
     try:
-        await send_update(ws, "log", {"level": "agent", "message": "Querying Gemini Vision..."})
-        
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt
-        )
+        await send_update(ws, "log", {"level": "agent", "message": f"Querying Gemini Vision ({label})..." if label else "Querying Gemini Vision..."})
         
-        return response.text
+        return await gemini.generate_text(gemini_contents(prompt, media), priority=priority)
         
     except Exception as e:
-        error_str = str(e)
-        if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-            await send_update(ws, "log", {"level": "system", "message": "⚠ Rate limit hit - waiting 15s..."})
-            await asyncio.sleep(15)
+        await report_gemini_error(ws, e)
+        return None
+
+async def stream_gemini_json(ws: WebSocket, prompt: str, label: str, priority: int = PRIORITY_NORMAL,
+                             watch: dict = None, media=None, config: dict = None) -> dict:
+    """
+    Stream a Gemini answer through an incremental JSON parser. `watch` maps
+    array paths to `async fn(path, element)`, called for each element as soon
+    as it has arrived; `media` (a ReducedVideo) is sent after the prompt and
+    `config` (e.g. a response schema) with it.
+    Returns the parsed object ({} if the answer held none), or None when the
+    call failed.
+    """
+    watch = watch or {}
+    parser = StreamingJSONParser(watch)
+    started = time.perf_counter()
+    first = True
+    try:
+        await send_update(ws, "log", {"level": "agent", "message": f"Querying Gemini Vision ({label})..."})
+        
+        chunks = gemini.stream(gemini_contents(prompt, media), priority=priority, config=config)
+        try:
+            async for chunk in chunks:
+                for path, element in parser.feed(chunk):
+                    if first:
+                        first_result_seconds.observe(time.perf_counter() - started, label)
+                        first = False
+                    await watch[path](path, element)
+        finally:
+            await chunks.aclose()
             
-            try:
-                response = client.models.generate_content(
-                    model="gemini-2.0-flash",
-                    contents=prompt
-                )
-                return response.text
-            except:
-                await send_update(ws, "log", {"level": "system", "message": "Rate limit still active"})
-                return None
-        else:
-            await send_update(ws, "log", {"level": "system", "message": f"API Error: {error_str[:100]}"})
-            return None
+    except Exception as e:
+        await report_gemini_error(ws, e)
+        return None
+    
+    with json_parse_seconds.time():
+        data = parser.result()
+    if data is None:
+        json_parse_failures.inc()
+        return {}
+    return data
+
+async def report_gemini_error(ws: WebSocket, error: Exception):
+    if isinstance(error, asyncio.TimeoutError):
+        await send_update(ws, "log", {"level": "system", "message": f"⚠ Gemini timed out after {gemini.timeout:.0f}s"})
+    elif isinstance(error, RetryBudgetExhausted):
+        await send_update(ws, "log", {"level": "system", "message": "⚠ Gemini quota exhausted - try again shortly"})
+    else:
+        await send_update(ws, "log", {"level": "system", "message": f"API Error: {str(error)[:100]}"})
 
 def parse_json_response(text: str) -> dict:
     """Extract JSON from Gemini response"""
-    try:
-        json_match = re.search(r'\{[\s\S]*\}', text)
-        if json_match:
-            return json.loads(json_match.group())
-    except:
-        pass
-    return {}
+    with json_parse_seconds.time():
+        data = extract_json(text)
+    if data is None:
+        json_parse_failures.inc()
+        return {}
+    return data
+
+async def validated(ws: WebSocket, data: dict, schema: dict, label: str) -> dict:
+    """Check a parsed answer against its schema; problems are logged and replaced by defaults"""
+    clean, errors = validate(data, schema)
+    if errors:
+        schema_errors.inc(len(errors), label)
+        mark_degraded(ws)
+        more = f" (+{len(errors) - 3} more)" if len(errors) > 3 else ""
+        await send_update(ws, "log", {"level": "system", "message": f"⚠ Gemini {label} answer failed validation: {'; '.join(errors[:3])}{more}"})
+    return clean
+
+async def parse_validated(ws: WebSocket, text: str, schema: dict, label: str) -> dict:
+    """parse_json_response + validated; a failed call (already reported) just yields the defaults"""
+    if not text:
+        mark_degraded(ws)
+        return validate({}, schema)[0]
+    return await validated(ws, parse_json_response(text), schema, label)
+
+def mark_degraded(ws: WebSocket):
+    """Keep an analysis that fell back to defaults out of the result cache"""
+    if isinstance(ws, RecordingSocket):
+        ws.degraded = True
+
+def detected_objects(objects: list) -> list:
+    return [{"id": i+1, "type": obj.get("name", "object"), "confidence": 0.9} for i, obj in enumerate(objects)]
 
 async def run_demo_with_learning(ws: WebSocket, session_id: str):
     """Demo mode with REALISTIC physics analysis - detects AI anomalies"""
     from physics_engine import physics_kernel
     import random
     
+    state = session_store.get(session_id)
+    
     await send_update(ws, "log", {"level": "agent", "message": "Starting AI detection analysis..."})
     await send_update(ws, "scan_progress", {"progress": 15, "stage": "detection"})
-    await asyncio.sleep(0.8)
+    await pace(state, 0.8)
     
     # 60% chance of detecting physics violation (simulating AI video detection)
     is_ai_generated = random.random() < 0.6
@@ -458,9 +908,9 @@ async def run_demo_with_learning(ws: WebSocket, session_id: str):
     
     # PHASE 1: OBJECT DETECTION
     await send_update(ws, "log", {"level": "system", "message": "PHASE 1: OBJECT DETECTION"})
-    await asyncio.sleep(0.5)
+    await pace(state, 0.5)
     await send_update(ws, "log", {"level": "agent", "message": "Analyzing video frames with CV pipeline..."})
-    await asyncio.sleep(0.6)
+    await pace(state, 0.6)
     
     detected_objects = [
         {"id": 1, "type": "primary_subject", "confidence": 0.94},
@@ -471,19 +921,19 @@ async def run_demo_with_learning(ws: WebSocket, session_id: str):
     await send_update(ws, "log", {"level": "agent", "message": f"Detected: {len(detected_objects)} trackable objects"})
     await send_update(ws, "log", {"level": "agent", "message": "Motion type: OSCILLATORY/FALLING MOTION"})
     await send_update(ws, "scan_progress", {"progress": 30, "stage": "detection"})
-    await asyncio.sleep(0.5)
+    await pace(state, 0.5)
     
     # PHASE 2: TRAJECTORY ANALYSIS
     await send_update(ws, "log", {"level": "system", "message": "PHASE 2: TRAJECTORY ANALYSIS"})
     await send_update(ws, "log", {"level": "agent", "message": "Extracting motion vectors..."})
     await send_update(ws, "scan_progress", {"progress": 45, "stage": "trajectory"})
-    await asyncio.sleep(0.8)
+    await pace(state, 0.8)
     
     num_points = random.randint(12, 24)
     await send_update(ws, "log", {"level": "agent", "message": f"Extracted {num_points} trajectory points"})
     await send_update(ws, "log", {"level": "agent", "message": f"Measured period: {measured_period:.2f} seconds"})
     await send_update(ws, "log", {"level": "agent", "message": f"Estimated characteristic length: {measured_length} meters"})
-    await asyncio.sleep(0.5)
+    await pace(state, 0.5)
     
     # PHASE 3: PHYSICS VERIFICATION - Run ALL checks
     await send_update(ws, "log", {"level": "system", "message": "PHASE 3: PHYSICS VERIFICATION"})
@@ -498,7 +948,7 @@ async def run_demo_with_learning(ws: WebSocket, session_id: str):
     physics_checks.append(pendulum_result)
     
     await send_update(ws, "log", {"level": "agent", "message": "Applying pendulum equation: T = 2π√(L/g)"})
-    await asyncio.sleep(0.3)
+    await pace(state, 0.3)
     await send_update(ws, "log", {"level": "agent", "message": f"Calculated gravity: {calculated_g} m/s²"})
     
     # Send physics update with all checks
@@ -519,7 +969,7 @@ async def run_demo_with_learning(ws: WebSocket, session_id: str):
         await send_update(ws, "log", {"level": "agent", "message": f"✗ GRAVITY VIOLATION: {calculated_g} m/s² (Expected: 9.81)"})
     else:
         await send_update(ws, "log", {"level": "agent", "message": f"✓ GRAVITY: {calculated_g} m/s² (Earth: 9.81)"})
-    await asyncio.sleep(0.4)
+    await pace(state, 0.4)
     
     # Check 2: Shadow Consistency
     await send_update(ws, "scan_progress", {"progress": 65, "stage": "physics"})
@@ -531,7 +981,7 @@ async def run_demo_with_learning(ws: WebSocket, session_id: str):
         await send_update(ws, "log", {"level": "agent", "message": f"✗ SHADOW ANOMALY: Multiple light sources detected (variance: {shadow_result['variance']}°)"})
     else:
         await send_update(ws, "log", {"level": "agent", "message": f"✓ SHADOWS: Consistent light source (variance: {shadow_result['variance']}°)"})
-    await asyncio.sleep(0.3)
+    await pace(state, 0.3)
     
     # Check 3: Momentum (for collisions)
     await send_update(ws, "scan_progress", {"progress": 75, "stage": "physics"})
@@ -543,7 +993,7 @@ async def run_demo_with_learning(ws: WebSocket, session_id: str):
         momentum_result = {"check": "MOMENTUM", "status": "PASS", "delta_p": 0.0}
         await send_update(ws, "log", {"level": "agent", "message": "✓ MOMENTUM: Conservation verified"})
     physics_checks.append(momentum_result)
-    await asyncio.sleep(0.3)
+    await pace(state, 0.3)
     
     # Check 4: Reflection Consistency
     if is_ai_generated and random.random() < 0.3:
@@ -554,7 +1004,7 @@ async def run_demo_with_learning(ws: WebSocket, session_id: str):
         reflection_result = {"check": "REFLECTION", "status": "PASS"}
         await send_update(ws, "log", {"level": "agent", "message": "✓ REFLECTION: No anomalies detected"})
     physics_checks.append(reflection_result)
-    await asyncio.sleep(0.3)
+    await pace(state, 0.3)
     
     # Check 5: Material Physics
     await send_update(ws, "scan_progress", {"progress": 85, "stage": "physics"})
@@ -566,7 +1016,7 @@ async def run_demo_with_learning(ws: WebSocket, session_id: str):
         material_result = {"check": "MATERIAL", "status": "PASS"}
         await send_update(ws, "log", {"level": "agent", "message": "✓ MATERIAL: Physics behavior consistent"})
     physics_checks.append(material_result)
-    await asyncio.sleep(0.3)
+    await pace(state, 0.3)
     
     # Send FINAL physics update with all check statuses
     await send_update(ws, "physics_update", {
@@ -585,22 +1035,19 @@ async def run_demo_with_learning(ws: WebSocket, session_id: str):
     # PHASE 4: DATABASE COMPARISON
     await send_update(ws, "log", {"level": "system", "message": "PHASE 4: DATABASE COMPARISON"})
     await send_update(ws, "scan_progress", {"progress": 92, "stage": "learning"})
-    await asyncio.sleep(0.5)
+    await pace(state, 0.5)
     
-    await send_update(ws, "log", {"level": "agent", "message": f"Checking against {len(fake_signatures)} known fake signatures..."})
-    await asyncio.sleep(0.3)
+    await send_update(ws, "log", {"level": "agent", "message": f"Checking against {len(signature_index)} known fake signatures..."})
+    await pace(state, 0.3)
     
     # Check for matching patterns
     matched_pattern = None
     if is_ai_generated and violations > 0:
         # Find a matching signature
-        for sig in fake_signatures:
-            if sig["pattern"] == "gravity_deviation" and pendulum_result["status"] == "VIOLATION":
-                matched_pattern = sig
-                break
-            elif sig["pattern"] == "shadow_inconsistency" and shadow_result["status"] == "VIOLATION":
-                matched_pattern = sig
-                break
+        if pendulum_result["status"] == "VIOLATION":
+            matched_pattern = next(iter(signature_index.match(pattern="gravity_deviation")), None)
+        elif shadow_result["status"] == "VIOLATION":
+            matched_pattern = next(iter(signature_index.match(pattern="shadow_inconsistency")), None)
     
     if matched_pattern:
         await send_update(ws, "log", {"level": "agent", "message": f"⚠ MATCH FOUND: Similar to {matched_pattern['model']} - {matched_pattern['description']}"})
@@ -609,7 +1056,7 @@ async def run_demo_with_learning(ws: WebSocket, session_id: str):
     
     # FINAL VERDICT
     await send_update(ws, "scan_progress", {"progress": 100, "stage": "verdict"})
-    await asyncio.sleep(0.3)
+    await pace(state, 0.3)
     
     total_checks = len(physics_checks)
     passed_checks = total_checks - violations
@@ -622,9 +1069,7 @@ async def run_demo_with_learning(ws: WebSocket, session_id: str):
         await send_update(ws, "log", {"level": "system", "message": f"✗ {violations} VIOLATION(S) DETECTED"})
         
         # Store in learning database
-        new_sig_id = f"detected_{int(time.time())}"
-        fake_signatures.append({
-            "id": new_sig_id,
+        signature_index.add({
             "model": "Unknown AI Model",
             "pattern": "physics_violation",
             "description": f"Detected {violations} physics anomalies",
@@ -636,6 +1081,7 @@ async def run_demo_with_learning(ws: WebSocket, session_id: str):
             "result": "synthetic",
             "confidence": round(confidence, 1),
             "gravity": calculated_g,
+            "demo": True,
             "violations": violations,
             "total_checks": total_checks,
             "reason": f"{violations} physics violation(s) detected • AI-generated content suspected"
@@ -651,34 +1097,49 @@ async def run_demo_with_learning(ws: WebSocket, session_id: str):
             "result": "authentic",
             "confidence": round(confidence, 1),
             "gravity": calculated_g,
+            "demo": True,
             "reason": f"All {total_checks} physics checks passed • Real-world physics confirmed"
         })
+    
+    history_store.record({
+        "video_hash": state.video_hash if state else None,
+        "source": "demo",
+        "pipeline_version": PIPELINE_VERSION,
+        "verdict": "synthetic" if violations > 0 else "authentic",
+        "confidence": round(confidence, 1),
+        "motion_type": "pendulum",
+        "gravity": calculated_g,
+        "checks": physics_checks,
+        "measurements": {"period": measured_period, "length": measured_length}
+    })
+    analyses_total.inc(1, "synthetic" if violations > 0 else "authentic", "demo")
 
 async def process_user_response(ws: WebSocket, session_id: str, response: str):
-    state = sessions.get(session_id)
+    state = session_store.get(session_id)
     if not state:
         return
     
     await send_update(ws, "log", {"level": "user", "message": f"User input: {response}"})
-    await asyncio.sleep(0.5)
+    await pace(state, 0.5)
     
     # Material physics check based on user input
     if "glass" in response.lower():
         await send_update(ws, "log", {"level": "agent", "message": "Applying glass physics..."})
-        await asyncio.sleep(0.3)
+        await pace(state, 0.3)
         await send_update(ws, "log", {"level": "agent", "message": "Glass shatters at ~8 m/s impact velocity"})
-        await asyncio.sleep(0.3)
+        await pace(state, 0.3)
         
         result = physics_kernel.check_material_physics("glass", 15.0, object_intact=True)
         
         if result["status"] == "VIOLATION":
             await send_update(ws, "log", {"level": "agent", "message": "✗ MATERIAL VIOLATION: Glass should have shattered"})
             
-            fake_signatures.append({
+            signature_index.add({
+                "model": "Unknown AI Model",
+                "pattern": "material_violation",
                 "motion_type": "impact",
-                "physics_looks_real": False,
-                "reason": "Glass intact at lethal velocity",
-                "timestamp": time.time()
+                "description": "Glass intact at lethal velocity",
+                "physics_signature": {"impact_velocity": 15.0}
             })
             
             await send_update(ws, "verdict", {
@@ -687,25 +1148,192 @@ async def process_user_response(ws: WebSocket, session_id: str, response: str):
                 "gravity": 9.8,
                 "reason": "Glass should shatter at 15 m/s impact • Physics violated"
             })
+            history_store.record({
+                "video_hash": state.video_hash,
+                "source": "user_response",
+                "pipeline_version": PIPELINE_VERSION,
+                "verdict": "synthetic",
+                "confidence": 97.5,
+                "motion_type": "impact",
+                "gravity": 9.8,
+                "checks": [result],
+                "measurements": {"impact_velocity": 15.0}
+            })
+            analyses_total.inc(1, "synthetic", "user_response")
     else:
         await send_update(ws, "log", {"level": "agent", "message": f"Material '{response}' noted for analysis"})
 
 @app.post("/upload_video")
 async def upload_video(file: UploadFile = File(...)):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-        content = await file.read()
-        tmp.write(content)
-        return {"file_path": tmp.name, "size": len(content)}
+    try:
+        upload = await ingest_upload_file(file)
+    except UploadError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    session_store.add_upload(upload)
+    return {"file_path": upload.path, **upload.describe()}
+
+# REST jobs: the WebSocket pipeline on a bounded queue, polled or followed over SSE
+job_queue = JobQueue(
+    run_full_analysis,
+    workers=int(os.getenv("VERITAS_JOB_WORKERS", "8")),
+    max_pending=int(os.getenv("VERITAS_JOB_QUEUE", "1000")),
+    timeout=float(os.getenv("VERITAS_JOB_TIMEOUT", "600")),
+    job_ttl=float(os.getenv("VERITAS_JOB_TTL", "3600")),
+    shared=shared_state
+)
+SSE_KEEPALIVE = 15  # seconds between comments on an idle event stream
+
+def queue_full(error: QueueFull) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+@app.post("/analyses", status_code=202)
+async def submit_analysis(file: UploadFile = File(None), video_id: str = None, mode: str = "fast"):
+    """Queue an analysis of an uploaded `file`, or of an earlier /upload_video by `video_id`"""
+    if mode not in PIPELINE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(PIPELINE_MODES)}")
+    try:
+        # Refuse before spooling a video that could not be queued anyway
+        job_queue.check_capacity()
+    except QueueFull as e:
+        raise queue_full(e)
+    
+    if file is not None:
+        try:
+            upload = await ingest_upload_file(file)
+        except UploadError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        owned = True
+    elif video_id:
+        upload = session_store.get_upload(video_id)
+        if upload is None:
+            raise HTTPException(status_code=404, detail="Unknown or expired video_id")
+        owned = False
+    else:
+        raise HTTPException(status_code=400, detail="Send a video file or a video_id")
+    
+    try:
+        job = job_queue.submit(upload, owns_video=owned, mode=mode)
+    except QueueFull as e:
+        if owned:
+            upload.discard()
+        raise queue_full(e)
+    return {"id": job.id, "status": job.status,
+            "status_url": f"/analyses/{job.id}", "events_url": f"/analyses/{job.id}/events"}
+
+@app.get("/analyses/{job_id}")
+async def get_analysis(job_id: str):
+    summary = await job_queue.get_summary(job_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired analysis")
+    return summary
+
+@app.delete("/analyses/{job_id}")
+async def cancel_analysis(job_id: str):
+    if not job_queue.cancel(job_id):
+        raise HTTPException(status_code=404, detail="No queued or running analysis with this id")
+    return await job_queue.get_summary(job_id)
+
+@app.get("/analyses/{job_id}/events")
+async def analysis_events(job_id: str, request: Request):
+    """Server-sent events: every pipeline message, then an "end" event with the final summary"""
+    job = job_queue.get(job_id)
+    if job is None:
+        # Events live on the worker running the job; the summary may be shared
+        raise HTTPException(status_code=404, detail="Unknown analysis (or running on another worker)")
+    try:
+        last_seen = int(request.headers.get("last-event-id", 0))
+    except ValueError:
+        last_seen = 0
+    
+    async def stream():
+        seen = last_seen
+        while True:
+            changed = job.changed
+            for seen, event in job.events_after(seen):
+                yield f"id: {seen}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            if job.finished:
+                yield f"event: end\ndata: {json.dumps(job.describe())}\n\n"
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), SSE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keepalive\n\n"
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/health")
 async def health():
     return {
         "status": "online", 
-        "gemini": "connected" if client else "not configured",
-        "known_fakes": len(fake_signatures),
+        "gemini": "connected" if gemini.available else "not configured",
+        "known_fakes": len(signature_index),
+        "result_cache": result_cache.stats(),
+        "reduced_videos": reduced_cache.stats(),
+        "cpu_pool": cpu_pool.stats(),
+        "sessions": session_store.stats(),
+        "gemini_limiter": gemini.limiter.stats(),
+        "history": history_store.stats(),
+        "shared_state": shared_state.stats() if shared_state is not None else None,
+        "jobs": job_queue.stats(),
         "version": "4.0.0"
     }
 
+@app.get("/metrics/sessions")
+async def session_metrics():
+    return session_store.stats()
+
+# Queue depths and occupancy are read when scraped, never on the hot path
+registry.gauge("veritas_sessions", "Open WebSocket sessions",
+               fn=lambda: session_store.stats()["sessions"])
+registry.gauge("veritas_active_analyses", "Analyses currently running",
+               fn=lambda: session_store.stats()["active_analyses"])
+registry.gauge("veritas_session_bytes", "Video bytes held by sessions and uploads",
+               fn=lambda: session_store.held_bytes)
+registry.gauge("veritas_gemini_waiting", "Gemini calls queued in the rate limiter",
+               fn=lambda: gemini.limiter.stats()["waiting"] if gemini.loaded else None)
+registry.gauge("veritas_gemini_retry_credits", "Retries left in the Gemini retry budget",
+               fn=lambda: gemini.limiter.retry_credits if gemini.loaded else None)
+registry.gauge("veritas_cpu_jobs_pending", "Decode/tracking jobs queued or running",
+               fn=lambda: cpu_pool.stats()["pending"])
+registry.gauge("veritas_history_pending", "Verdicts waiting to be written to the history store",
+               fn=lambda: history_store.stats().get("writes", {}).get("pending") if history_store.loaded else None)
+registry.gauge("veritas_result_cache_entries", "Verdicts in the result cache",
+               fn=lambda: result_cache.stats()["entries"])
+registry.gauge("veritas_reduced_video_bytes", "Frame bytes held by the reduced-video cache",
+               fn=lambda: reduced_cache.held_bytes)
+registry.gauge("veritas_jobs_queued", "REST analysis jobs waiting for a worker",
+               fn=lambda: job_queue.pending)
+registry.gauge("veritas_jobs_running", "REST analysis jobs being analysed",
+               fn=lambda: job_queue.running)
+registry.gauge("veritas_known_fakes", "Signatures in the fake signature index",
+               fn=lambda: len(signature_index))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of every pipeline metric"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("startup")
+async def startup():
+    # Singletons are built lazily so importing this module (e.g. in spawned
+    # CPU workers) stays cheap; the server builds them in the background
+    # right away so the first analysis does not pay for it
+    if os.getenv("VERITAS_WARMUP", "1") != "0":
+        asyncio.get_running_loop().run_in_executor(None, warm_up, gemini, vision_kernel)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await job_queue.shutdown()
+    session_store.close_all()
+    if history_store.loaded:
+        history_store.close()
+    cpu_pool.shutdown()
+    if shared_state is not None and shared_state.loaded:
+        shared_state.close()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,208 @@
+"""
+VERITAS Metrics
+Counters, gauges and histograms rendered in the Prometheus text format.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+import math
+import time
+
+# Seconds; spans from a JSON parse (~ms) to a slow Gemini call (~1 min)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count, optionally split by labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+
+    def inc(self, amount: float = 1, *label_values):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self._values.items():
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Gauge:
+    """
+    Current value. Either set directly or computed by `fn()` at scrape time,
+    which keeps queue depths and session counts off the hot path entirely.
+    `fn` may return a number, a {label_value: number} dict (one label) or
+    None to skip the sample.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), fn=None):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.fn = fn
+        self._values = {}
+
+    def set(self, value: float, *label_values):
+        self._values[label_values] = value
+
+    def inc(self, amount: float = 1, *label_values):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, amount: float = 1, *label_values):
+        self.inc(-amount, *label_values)
+
+    def samples(self):
+        values = self._values
+        if self.fn is not None:
+            try:
+                current = self.fn()
+            except Exception:
+                return
+            if current is None:
+                return
+            values = ({(k,): v for k, v in current.items()} if isinstance(current, dict)
+                      else {(): current})
+        for label_values, value in values.items():
+            yield self.name, _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    """Bucketed observations with running sum and count (cumulative on export)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        for label_values, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket", _format_labels(self.labels, label_values, le), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labels, label_values), series[-1]
+            yield f"{self.name}_count", _format_labels(self.labels, label_values), cumulative
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+
+class Registry:
+    """
+    Holds every metric of the process. Updates are plain dict/list writes
+    made from the event loop (no locks), so instrumenting a call costs about
+    a microsecond.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple = (), fn=None) -> Gauge:
+        return self.register(Gauge(name, help, labels, fn))
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry and the pipeline's metrics
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    "veritas_stage_seconds", "Wall time of each step on an analysis' critical path", ("stage",))
+stage_task_seconds = registry.histogram(
+    "veritas_stage_task_seconds", "Run time of concurrently scheduled stages", ("stage",))
+analyses_total = registry.counter(
+    "veritas_analyses_total", "Finished analyses by verdict and source", ("verdict", "source"))
+ws_send_seconds = registry.histogram(
+    "veritas_ws_send_seconds", "Time to send one WebSocket message", ("type",))
+json_parse_seconds = registry.histogram(
+    "veritas_json_parse_seconds", "Time to parse a Gemini JSON response")
+json_parse_failures = registry.counter(
+    "veritas_json_parse_failures_total", "Gemini responses that held no parseable JSON")
+schema_errors = registry.counter(
+    "veritas_schema_errors_total", "Gemini answer fields that failed schema validation", ("schema",))
+first_result_seconds = registry.histogram(
+    "veritas_first_result_seconds", "Time from starting a streamed Gemini call to its first parsed element", ("stage",))
+
+gemini_request_seconds = registry.histogram(
+    "veritas_gemini_request_seconds", "Latency of single Gemini attempts", ("outcome",))
+gemini_queue_seconds = registry.histogram(
+    "veritas_gemini_queue_seconds", "Time a Gemini call waited for the rate limiter", ("priority",))
+gemini_retries = registry.counter(
+    "veritas_gemini_retries_total", "Gemini attempts retried after a transient error", ("reason",))
+gemini_tokens = registry.histogram(
+    "veritas_gemini_tokens", "Tokens per Gemini call", ("kind",), buckets=TOKEN_BUCKETS)
+
+
+class StageClock:
+    """
+    Times consecutive stages of one analysis without wrapping them in
+    blocks: each lap(stage) records the time since the previous lap.
+    """
+
+    def __init__(self, histogram: Histogram = stage_seconds):
+        self.histogram = histogram
+        self._last = time.perf_counter()
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        self.histogram.observe(now - self._last, stage)
+        self._last = now
@@ -1,5 +1,5 @@
 import numpy as np
-from scipy.optimize import curve_fit
+from gravity_fit import fit_parabola, fit_parabola_batch
 import math
 
 class PhysicsEngine:
@@ -11,31 +11,46 @@ class PhysicsEngine:
     def __init__(self):
         self.EARTH_GRAVITY = 9.81  # m/s^2
         self.GRAVITY_TOLERANCE = 1.5  # +/- 1.5 m/s^2 allowed
+        self.SHATTER_VELOCITIES = {
+            "glass": 8.0,      # m/s
+            "ceramic": 6.0,
+            "plastic": 15.0,
+            "wood": 20.0,
+            "metal": 50.0
+        }
+        self.DEFAULT_SHATTER_VELOCITY = 10.0
         
     def parabolic_model(self, t, v0, g, h0):
         """Kinematic equation for vertical motion: y = h0 + v0*t - 0.5*g*t^2"""
         return h0 + v0*t - 0.5*g*t**2
 
-    def check_gravity(self, timestamps, y_positions):
+    def check_gravity(self, timestamps, y_positions, weights=None, robust=None):
         """
         Physics Check 1: Gravity Verification
         Fits trajectory to parabolic model to extract 'g'.
+        The model is linear in (h0, v0, g), so it is solved in closed form by
+        least squares; `weights` and `robust` are passed to fit_parabola.
         """
         try:
-            popt, pcov = curve_fit(self.parabolic_model, timestamps, y_positions)
-            v0_pred, g_pred, h0_pred = popt
+            fit = fit_parabola(timestamps, y_positions, weights=weights, robust=robust)
+            g_pred = fit["g"]
             
             error = abs(g_pred - self.EARTH_GRAVITY)
             is_violation = error > self.GRAVITY_TOLERANCE
             
-            return {
+            result = {
                 "check": "GRAVITY",
                 "status": "VIOLATION" if is_violation else "PASS",
                 "measured": round(g_pred, 2),
+                "uncertainty": round(fit["g_err"], 2),
                 "expected": self.EARTH_GRAVITY,
                 "deviation": round((g_pred - self.EARTH_GRAVITY) / self.EARTH_GRAVITY * 100, 1),
                 "confidence": min(95 + error * 2, 99.9) if is_violation else 95 - error * 10
             }
+            if "inliers" in fit:
+                result["points_used"] = int(fit["inliers"].sum())
+                result["outliers"] = int(fit["n_points"] - result["points_used"])
+            return result
         except Exception as e:
             return {"check": "GRAVITY", "status": "ERROR", "error": str(e)}
 
@@ -86,15 +101,7 @@ class PhysicsEngine:
         """
         Physics Check 4: Material Physics (e.g., glass should shatter)
         """
-        shatter_velocities = {
-            "glass": 8.0,      # m/s
-            "ceramic": 6.0,
-            "plastic": 15.0,
-            "wood": 20.0,
-            "metal": 50.0
-        }
-        
-        shatter_threshold = shatter_velocities.get(material_type.lower(), 10.0)
+        shatter_threshold = self.SHATTER_VELOCITIES.get(material_type.lower(), self.DEFAULT_SHATTER_VELOCITY)
         should_break = impact_velocity >= shatter_threshold
         
         is_violation = should_break and object_intact
@@ -157,6 +164,49 @@ class PhysicsEngine:
             "confidence": 92 if is_violation else 88
         }
 
+    def check_reflection_consistency(self, position_errors):
+        """
+        Physics Check 7: Reflection Consistency
+        A mirror/water reflection should line up with its object; errors are
+        the normalized (0-1 of frame size) offsets between each pair.
+        """
+        if len(position_errors) == 0:
+            return {"check": "REFLECTIONS", "status": "INSUFFICIENT_DATA"}
+        
+        max_error = float(np.max(np.abs(position_errors)))
+        max_allowed = 0.1
+        
+        is_violation = max_error > max_allowed
+        
+        return {
+            "check": "REFLECTIONS",
+            "status": "VIOLATION" if is_violation else "PASS",
+            "reflection_error": round(max_error, 3),
+            "max_allowed": max_allowed,
+            "confidence": 85 if is_violation else 75
+        }
+
+    def check_trajectory(self, trajectory_points, scene_height, robust="ransac"):
+        """
+        Gravity check on tracked points of a falling object.
+        Points are {"t", "x", "y"} in normalized image coordinates (top-left
+        origin, y down); `scene_height` is the real-world height of the frame
+        in meters. Outliers are rejected by a robust fit, so noisy tracking
+        still yields a usable g in a single pass.
+        """
+        try:
+            points = [p for p in trajectory_points if p.get("t") is not None and p.get("y") is not None]
+            timestamps = np.array([p["t"] for p in points], dtype=float)
+            heights = (1.0 - np.array([p["y"] for p in points], dtype=float)) * scene_height
+        except (TypeError, ValueError, AttributeError) as e:
+            return {"check": "GRAVITY", "status": "ERROR", "error": f"Malformed trajectory points: {e}"}
+        
+        result = self.check_gravity(timestamps, heights, robust=robust)
+        if result["status"] != "ERROR":
+            result["calculated_g"] = result["measured"]
+            result["source"] = "trajectory_fit"
+        return result
+
     def analyze_trajectory(self, timestamps, y_positions):
         """Legacy method for backward compatibility"""
         return self.check_gravity(timestamps, y_positions)
@@ -207,5 +257,223 @@ class PhysicsEngine:
         
         return results
 
+    # ========== BATCH API ==========
+    # Columnar variants of the checks above for offline re-scoring of stored
+    # measurements. Inputs are array-likes of equal length; results are dicts
+    # of NumPy arrays (one entry per input row) instead of a dict per row.
+
+    @staticmethod
+    def _status(is_violation):
+        return np.where(is_violation, "VIOLATION", "PASS")
+
+    def check_gravity_batch(self, timestamps, y_positions, weights=None):
+        """
+        Batch form of check_gravity.
+        One trajectory per row, NaN-padded when lengths differ; rows with
+        fewer than 3 valid points get status ERROR.
+        """
+        fit = fit_parabola_batch(timestamps, y_positions, weights=weights)
+        g_pred = fit["g"]
+
+        error = np.abs(g_pred - self.EARTH_GRAVITY)
+        is_violation = error > self.GRAVITY_TOLERANCE
+        failed = ~np.isfinite(g_pred)
+
+        return {
+            "check": "GRAVITY",
+            "status": np.where(failed, "ERROR", self._status(is_violation)),
+            "violation": is_violation,
+            "measured": np.round(g_pred, 2),
+            "uncertainty": np.round(fit["g_err"], 2),
+            "expected": self.EARTH_GRAVITY,
+            "deviation": np.round((g_pred - self.EARTH_GRAVITY) / self.EARTH_GRAVITY * 100, 1),
+            "confidence": np.where(is_violation, np.minimum(95 + error * 2, 99.9), 95 - error * 10)
+        }
+
+    def check_pendulum_batch(self, periods, lengths):
+        """
+        Batch form of check_pendulum_physics.
+        g = 4π²L/T² evaluated for every (period, length) pair.
+        """
+        periods = np.asarray(periods, dtype=float)
+        lengths = np.asarray(lengths, dtype=float)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            calculated_g = (4 * math.pi**2 * lengths) / (periods**2)
+        error = np.abs(calculated_g - self.EARTH_GRAVITY)
+        is_violation = error > self.GRAVITY_TOLERANCE
+
+        return {
+            "check": "PENDULUM",
+            "status": self._status(is_violation),
+            "violation": is_violation,
+            "period": periods,
+            "length": lengths,
+            "calculated_g": np.round(calculated_g, 2),
+            "deviation": np.round((calculated_g - self.EARTH_GRAVITY) / self.EARTH_GRAVITY * 100, 1),
+            "confidence": np.where(is_violation, np.minimum(95 + error * 2, 99.9), 94.5)
+        }
+
+    def check_projectile_batch(self, launch_angles, initial_velocities, max_heights, range_distances):
+        """
+        Batch form of check_projectile_motion.
+        """
+        theta_rad = np.radians(np.asarray(launch_angles, dtype=float))
+        v0 = np.asarray(initial_velocities, dtype=float)
+        max_heights = np.asarray(max_heights, dtype=float)
+        range_distances = np.asarray(range_distances, dtype=float)
+
+        expected_max_height = (v0**2 * np.sin(theta_rad)**2) / (2 * self.EARTH_GRAVITY)
+        expected_range = (v0**2 * np.sin(2 * theta_rad)) / self.EARTH_GRAVITY
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            height_error = np.where(expected_max_height > 0,
+                                    np.abs(max_heights - expected_max_height) / expected_max_height, 0.0)
+            range_error = np.where(expected_range > 0,
+                                   np.abs(range_distances - expected_range) / expected_range, 0.0)
+
+        is_violation = (height_error > 0.15) | (range_error > 0.15)
+
+        return {
+            "check": "PROJECTILE",
+            "status": self._status(is_violation),
+            "violation": is_violation,
+            "measured_height": max_heights,
+            "expected_height": np.round(expected_max_height, 2),
+            "measured_range": range_distances,
+            "expected_range": np.round(expected_range, 2),
+            "height_error": np.round(height_error * 100, 1),
+            "range_error": np.round(range_error * 100, 1),
+            "confidence": np.where(is_violation, 92, 88)
+        }
+
+    def check_momentum_batch(self, obj1_before, obj1_after, obj2_before, obj2_after, mass1=1.0, mass2=1.0):
+        """
+        Batch form of check_momentum_conservation.
+        Masses may be scalars or per-row arrays.
+        """
+        mass1 = np.asarray(mass1, dtype=float)
+        mass2 = np.asarray(mass2, dtype=float)
+        p_before = mass1 * np.asarray(obj1_before, dtype=float) + mass2 * np.asarray(obj2_before, dtype=float)
+        p_after = mass1 * np.asarray(obj1_after, dtype=float) + mass2 * np.asarray(obj2_after, dtype=float)
+
+        momentum_diff = np.abs(p_after - p_before)
+        tolerance = np.where(p_before != 0, 0.1 * np.abs(p_before), 0.1)
+        is_violation = momentum_diff > tolerance
+
+        return {
+            "check": "MOMENTUM",
+            "status": self._status(is_violation),
+            "violation": is_violation,
+            "before": np.round(p_before, 2),
+            "after": np.round(p_after, 2),
+            "difference": np.round(momentum_diff, 2),
+            "confidence": np.where(is_violation, 90, 85)
+        }
+
+    def check_shadow_batch(self, light_angles):
+        """
+        Batch form of check_shadow_consistency.
+        `light_angles` is a 2-D array with one row of angles per scene.
+        """
+        light_angles = np.atleast_2d(np.asarray(light_angles, dtype=float))
+        max_variance = 15  # degrees
+
+        if light_angles.shape[1] < 2:
+            insufficient = np.full(light_angles.shape[0], "INSUFFICIENT_DATA")
+            return {"check": "SHADOWS", "status": insufficient, "violation": np.zeros(len(insufficient), dtype=bool)}
+
+        angle_variance = np.var(light_angles, axis=1)
+        is_violation = angle_variance > max_variance
+
+        return {
+            "check": "SHADOWS",
+            "status": self._status(is_violation),
+            "violation": is_violation,
+            "variance": np.round(angle_variance, 1),
+            "max_allowed": max_variance,
+            "confidence": np.where(is_violation, 88, 80)
+        }
+
+    def check_material_batch(self, material_types, impact_velocities, object_intact):
+        """
+        Batch form of check_material_physics.
+        Material names are resolved to shatter thresholds once per unique value.
+        """
+        materials = np.asarray(material_types, dtype=str)
+        impact_velocities = np.asarray(impact_velocities, dtype=float)
+        object_intact = np.asarray(object_intact, dtype=bool)
+
+        unique_materials, inverse = np.unique(np.char.lower(materials), return_inverse=True)
+        thresholds = np.array([
+            self.SHATTER_VELOCITIES.get(m, self.DEFAULT_SHATTER_VELOCITY) for m in unique_materials
+        ], dtype=float)
+        shatter_threshold = thresholds[inverse].reshape(materials.shape)
+
+        should_break = impact_velocities >= shatter_threshold
+        is_violation = should_break & object_intact
+
+        return {
+            "check": "MATERIAL",
+            "status": self._status(is_violation),
+            "violation": is_violation,
+            "material": materials,
+            "impact_velocity": impact_velocities,
+            "shatter_threshold": shatter_threshold,
+            "should_break": should_break,
+            "actually_intact": object_intact,
+            "confidence": np.where(is_violation, 97, 85)
+        }
+
+    def run_batch_analysis(self, motion_type, data):
+        """
+        Batch form of run_full_analysis for rows sharing one motion type.
+        `data` maps the same field names as run_full_analysis to arrays;
+        missing fields fall back to the same defaults, broadcast per row.
+        Returns a dict of check name -> columnar result.
+        """
+        n = len(next(iter(data.values()))) if data else 0
+
+        def column(name, default):
+            return np.asarray(data[name]) if name in data else np.full(n, default)
+
+        results = {}
+
+        if motion_type == "pendulum":
+            results["PENDULUM"] = self.check_pendulum_batch(column("period", 2.0), column("length", 1.0))
+        elif motion_type == "free_fall":
+            results["GRAVITY"] = self.check_gravity_batch(data["timestamps"], data["y_positions"])
+        elif motion_type == "projectile":
+            results["PROJECTILE"] = self.check_projectile_batch(
+                column("launch_angle", 45),
+                column("initial_velocity", 10),
+                column("max_height", 5),
+                column("range", 10)
+            )
+        elif motion_type == "collision":
+            results["MOMENTUM"] = self.check_momentum_batch(
+                column("v1_before", 5),
+                column("v1_after", 0),
+                column("v2_before", 0),
+                column("v2_after", 5)
+            )
+
+        if "shadow_angles" in data:
+            results["SHADOWS"] = self.check_shadow_batch(data["shadow_angles"])
+
+        if "material" in data and "impact_velocity" in data:
+            results["MATERIAL"] = self.check_material_batch(
+                data["material"],
+                data["impact_velocity"],
+                column("object_intact", True)
+            )
+
+        return results
+
 # Singleton instance
 physics_kernel = PhysicsEngine()
+
+
+def fit_trajectory(trajectory_points, scene_height, progress=None):
+    """PhysicsEngine.check_trajectory as a job for the CPU worker pool"""
+    return physics_kernel.check_trajectory(trajectory_points, scene_height)
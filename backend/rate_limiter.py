@@ -0,0 +1,160 @@
+"""
+VERITAS Rate Limiter
+Process-wide token bucket, priority queue and retry budget for Gemini calls.
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import re
+import time
+
+# Lower values are served first while callers are queued for tokens
+PRIORITY_CRITICAL = 0    # detection/trajectory on an analysis' critical path
+PRIORITY_NORMAL = 1      # independent scans
+PRIORITY_BACKGROUND = 2  # explanations and other work nobody is blocked on
+
+RETRYABLE_CODES = {429, 500, 503}
+RETRYABLE_MARKERS = ("429", "RESOURCE_EXHAUSTED", "503", "UNAVAILABLE")
+_RETRY_DELAY = re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s")
+
+
+class RetryBudgetExhausted(RuntimeError):
+    """Raised instead of retrying once the process-wide retry budget is spent."""
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Quota and transient server errors; everything else fails immediately."""
+    if getattr(exc, "code", None) in RETRYABLE_CODES:
+        return True
+    text = str(exc)
+    return any(marker in text for marker in RETRYABLE_MARKERS)
+
+
+def retry_after(exc: Exception):
+    """Server-suggested delay in seconds (Gemini's RetryInfo), or None."""
+    match = _RETRY_DELAY.search(str(exc))
+    return float(match.group(1)) if match else None
+
+
+class RateLimiter:
+    """
+    Token bucket sized to the API quota, shared by every session.
+
+    Callers that find the bucket empty wait in a priority queue and are
+    released one token at a time, so load above the quota turns into queueing
+    at a steady request rate instead of 429s. When the API still rejects a
+    call, pause() stops *all* callers for the backoff period and empties the
+    bucket, so they resume at the refill rate rather than stampeding.
+
+    Retries draw from a budget that only refills with successful calls
+    (`retry_ratio` credits each), which caps retry traffic to a fraction of
+    real traffic during a sustained outage.
+    """
+
+    def __init__(self, rate_per_minute: float = 60, burst: int = 10, max_attempts: int = 4,
+                 base_delay: float = 1.0, max_delay: float = 60.0,
+                 retry_budget: float = 10, retry_ratio: float = 0.1):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_budget = retry_budget
+        self.retry_ratio = retry_ratio
+
+        self.tokens = float(burst)
+        self.retry_credits = float(retry_budget)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._dispatcher = None
+
+        self.granted = 0
+        self.queued = 0
+        self.retries = 0
+        self.budget_exhausted = 0
+
+    def _try_take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if now < self._paused_until or self.tokens < 1:
+            return False
+        self.tokens -= 1
+        self.granted += 1
+        return True
+
+    def _time_to_next_token(self) -> float:
+        wait = max(self._paused_until - time.monotonic(), 0.0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL):
+        """Wait for one request token."""
+        if not self._waiters and self._try_take():
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.queued += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.tokens += 1  # granted just as the caller gave up
+            raise
+
+    async def _dispatch(self):
+        """Hand out tokens to queued callers, highest priority first."""
+        while self._waiters:
+            if self._waiters[0][2].done():
+                heapq.heappop(self._waiters)  # caller was cancelled
+                continue
+            if self._try_take():
+                heapq.heappop(self._waiters)[2].set_result(None)
+                continue
+            await asyncio.sleep(self._time_to_next_token())
+
+    def backoff(self, attempt: int, exc: Exception = None) -> float:
+        """Exponential backoff with equal jitter, never shorter than the server's hint."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** attempt)
+        delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+        hint = retry_after(exc) if exc is not None else None
+        return max(delay, min(hint or 0.0, self.max_delay))
+
+    def pause(self, seconds: float):
+        """Quota hit: stop granting tokens to every caller for `seconds`."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+    def record_success(self):
+        self.retry_credits = min(self.retry_credits + self.retry_ratio, self.retry_budget)
+
+    def spend_retry(self) -> bool:
+        """Take one retry from the budget; False means do not retry."""
+        if self.retry_credits < 1:
+            self.budget_exhausted += 1
+            return False
+        self.retry_credits -= 1
+        self.retries += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_minute": round(self.rate * 60, 1),
+            "tokens": round(self.tokens, 2),
+            "waiting": sum(1 for _, _, f in self._waiters if not f.done()),
+            "paused_for": round(max(self._paused_until - time.monotonic(), 0.0), 1),
+            "granted": self.granted,
+            "queued": self.queued,
+            "retries": self.retries,
+            "retry_credits": round(self.retry_credits, 1),
+            "budget_exhausted": self.budget_exhausted
+        }
@@ -0,0 +1,154 @@
+"""
+VERITAS Result Cache
+Content-addressed store of finished analyses, keyed by video hash.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import time
+
+from shared_state import shared_state
+
+# Event types that carry the analysis result and are replayed on a cache hit
+CACHED_EVENT_TYPES = {"objects_detected", "trajectory_data", "physics_update", "verdict"}
+
+
+class ResultCache:
+    """
+    LRU + TTL cache of analysis event streams.
+    Keys are the video's sha256 combined with the pipeline version, so any
+    change to prompts or physics thresholds invalidates old verdicts. An
+    optional directory backend keeps results across restarts, and an
+    optional `shared` state backend shares them between workers; lookups go
+    memory -> disk -> shared.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 24 * 3600, disk_dir: str = None, shared=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.shared = shared
+        self._entries = OrderedDict()  # key -> (stored_at, events)
+
+        self.hits = 0
+        self.misses = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(video_hash: str, pipeline_version: str) -> str:
+        return f"{pipeline_version}:{video_hash}"
+
+    def _disk_path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.disk_dir, digest[:2], f"{digest}.json")
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    async def get(self, key: str):
+        """Return the cached event list for `key`, or None."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, events = entry
+            if not self._expired(stored_at):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return events
+            del self._entries[key]
+
+        if self.disk_dir:
+            entry = self._read_disk(key)
+            if entry is not None:
+                self._remember(key, *entry)
+                self.hits += 1
+                return entry[1]
+
+        if self.shared is not None:
+            doc = await self.shared.run("get", f"result:{key}")
+            if doc is not None and not self._expired(doc.get("stored_at", 0)):
+                self._remember(key, doc["stored_at"], doc["events"])
+                self.hits += 1
+                return doc["events"]
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, events: list):
+        """Store the event stream of a completed analysis."""
+        stored_at = time.time()
+        self._remember(key, stored_at, events)
+        if self.disk_dir:
+            self._write_disk(key, stored_at, events)
+        if self.shared is not None:
+            self.shared.submit("set", f"result:{key}", {"stored_at": stored_at, "events": events}, ttl=self.ttl)
+
+    def _remember(self, key: str, stored_at: float, events: list):
+        self._entries[key] = (stored_at, events)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str):
+        path = self._disk_path(key)
+        try:
+            with open(path) as f:
+                doc = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if doc.get("key") != key or self._expired(doc.get("stored_at", 0)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return doc["stored_at"], doc["events"]
+
+    def _write_disk(self, key: str, stored_at: float, events: list):
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        # Write-then-rename so concurrent readers never see a partial file
+        with open(tmp_path, "w") as f:
+            json.dump({"key": key, "stored_at": stored_at, "events": events}, f)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk": bool(self.disk_dir),
+            "shared": self.shared is not None
+        }
+
+
+class RecordingSocket:
+    """
+    Forwards messages to a WebSocket while keeping the result-bearing events,
+    so a completed analysis can be stored in the ResultCache. `degraded` is
+    set when part of the result came from a failed call or default answers;
+    such a run is not cached.
+    """
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.events = []
+        self.degraded = False
+
+    async def send_json(self, data: dict):
+        if data.get("type") in CACHED_EVENT_TYPES:
+            self.events.append(data)
+        await self.ws.send_json(data)
+
+
+# Singleton instance
+result_cache = ResultCache(
+    max_entries=int(os.getenv("VERITAS_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("VERITAS_CACHE_TTL", str(24 * 3600))),
+    disk_dir=os.getenv("VERITAS_CACHE_DIR") or None,
+    shared=shared_state
+)
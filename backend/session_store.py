@@ -0,0 +1,318 @@
+"""
+VERITAS Session Store
+Bounded registry of live analysis sessions and uploaded videos.
+"""
+from collections import OrderedDict
+import os
+import time
+
+from shared_state import shared_state
+from video_ingest import VideoUpload
+
+# Session fields that outlive the connection (see SessionStore.publish)
+CONTEXT_FIELDS = ("video_hash", "motion_type", "objects", "physics_data", "mode")
+
+# Longest gap between TTL sweeps while only upload chunks arrive (see SessionStore.over_budget)
+SWEEP_INTERVAL = 60
+
+
+class AnalysisState:
+    """Per-connection analysis state. Slotted: one of these exists per open socket."""
+
+    __slots__ = (
+        "video_path", "video_id", "video_hash", "video_size", "owns_video", "_upload",
+        "physics_data", "motion_type", "objects", "task", "mode", "resumed",
+        "created_at", "last_active", "on_bytes"
+    )
+
+    def __init__(self, mode: str = "paced"):
+        self.on_bytes = None  # fn(delta) told whenever held_bytes changes
+        self.video_path = None
+        self.video_id = None
+        self.video_hash = None
+        self.video_size = 0
+        self.owns_video = False
+        self._upload = None  # VideoUpload in progress
+        self.physics_data = {}
+        self.motion_type = None
+        self.objects = []
+        self.task = None
+        self.mode = mode
+        self.resumed = False
+        self.created_at = self.last_active = time.monotonic()
+
+    @property
+    def busy(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    @property
+    def held_bytes(self) -> int:
+        """Disk bytes this session is responsible for deleting"""
+        held = self.video_size if self.owns_video else 0
+        if self.upload:
+            held += self.upload.size
+        return held
+
+    def _changed(self, delta: int):
+        if delta and self.on_bytes is not None:
+            self.on_bytes(delta)
+
+    @property
+    def upload(self):
+        return self._upload
+
+    @upload.setter
+    def upload(self, upload):
+        self._changed((upload.size if upload else 0) - (self._upload.size if self._upload else 0))
+        self._upload = upload
+
+    def write_chunk(self, chunk: bytes):
+        """Append to the upload in progress (raises UploadError like VideoUpload.write)"""
+        self._upload.write(chunk)
+        self._changed(len(chunk))
+
+    def attach_video(self, upload: VideoUpload, owned: bool = True):
+        """Point the session at a fully written video file"""
+        self.release_video()
+        self.video_path = upload.path
+        self.video_id = upload.video_id
+        self.video_hash = upload.sha256
+        self.video_size = upload.size
+        self.owns_video = owned
+        self._changed(self.video_size if owned else 0)
+
+    def release_video(self):
+        """Delete the session's own upload files"""
+        if self.upload:
+            self.upload.discard()
+            self.upload = None
+        if self.owns_video and self.video_path:
+            try:
+                os.remove(self.video_path)
+            except OSError:
+                pass
+        self._changed(-self.video_size if self.owns_video else 0)
+        self.video_path = None
+        self.video_id = None
+        self.video_hash = None
+        self.video_size = 0
+        self.owns_video = False
+
+    def context(self) -> dict:
+        """What another worker needs to continue this session (no files or tasks)"""
+        return {field: getattr(self, field) for field in CONTEXT_FIELDS}
+
+    def restore(self, context: dict):
+        for field in CONTEXT_FIELDS:
+            if field in context:
+                setattr(self, field, context[field])
+        self.resumed = True
+
+    def close(self):
+        """Cancel any running analysis and delete owned files"""
+        if self.busy:
+            self.task.cancel()
+        self.release_video()
+
+
+class SessionStore:
+    """
+    Sessions keyed by connection id plus videos uploaded over HTTP (keyed by
+    video_id), both kept in least-recently-used order.
+
+    sweep() expires idle sessions and stale uploads by TTL, then evicts the
+    least recently used entries until the session count and the bytes of
+    video held on disk (a running total, see held_bytes) are within limits. Sessions with a running analysis
+    are only evicted when nothing idle is left, and uploads referenced by a
+    live session or pinned (e.g. by a queued REST job) are never deleted
+    from under it.
+
+    With a `shared` state backend, each session's context is published
+    there, so a client reconnecting to another worker with its session id
+    resumes where it left off (e.g. a user_response after the verdict).
+    Videos and running analyses stay with the worker that holds them.
+    """
+
+    def __init__(self, max_sessions: int = 1000, idle_ttl: float = 1800,
+                 upload_ttl: float = 3600, max_bytes: int = 4 * 1024**3, shared=None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.upload_ttl = upload_ttl
+        self.max_bytes = max_bytes
+        self.shared = shared
+
+        self._sessions = OrderedDict()  # session_id -> AnalysisState
+        self._uploads = OrderedDict()   # video_id -> (stored_at, VideoUpload)
+        self._pinned = {}               # video path -> holders not yet in a session
+        self._held = 0                  # bytes held by sessions and uploads
+        self._last_sweep = time.monotonic()
+
+        self.evicted_sessions = 0
+        self.evicted_uploads = 0
+
+    # ---- sessions ----
+
+    def create(self, session_id: str, mode: str = "paced") -> AnalysisState:
+        state = AnalysisState(mode)
+        state.on_bytes = self._add_bytes
+        self._sessions[session_id] = state
+        self.sweep(protect=session_id)
+        return state
+
+    async def resume(self, session_id: str, mode: str = "paced") -> AnalysisState:
+        """New session with its published context restored, if there is one"""
+        context = None
+        if self.shared is not None:
+            context = await self.shared.run("get", f"session:{session_id}")
+        state = self.create(session_id, mode)
+        if context:
+            state.restore(context)
+        return state
+
+    def get(self, session_id: str):
+        """Return the session (marking it active), or None if closed/evicted"""
+        state = self._sessions.get(session_id)
+        if state is not None:
+            state.last_active = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return state
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def publish(self, session_id: str):
+        """Store the session's context in the shared backend (kept for idle_ttl)"""
+        state = self._sessions.get(session_id)
+        if state is not None and self.shared is not None:
+            self.shared.submit("set", f"session:{session_id}", state.context(), ttl=self.idle_ttl)
+
+    def close(self, session_id: str):
+        self.publish(session_id)
+        state = self._sessions.pop(session_id, None)
+        if state is not None:
+            self._close_state(state)
+
+    # ---- HTTP uploads ----
+
+    def add_upload(self, upload: VideoUpload):
+        self._uploads[upload.video_id] = (time.monotonic(), upload)
+        self._held += upload.size
+        self.sweep()
+
+    def get_upload(self, video_id: str):
+        entry = self._uploads.get(video_id)
+        if entry is None:
+            return None
+        self._uploads.move_to_end(video_id)
+        return entry[1]
+
+    def pin_upload(self, upload: VideoUpload):
+        """Keep an upload from being swept until unpin_upload (held outside any session)"""
+        self._pinned[upload.path] = self._pinned.get(upload.path, 0) + 1
+
+    def unpin_upload(self, upload: VideoUpload):
+        count = self._pinned.pop(upload.path, 0) - 1
+        if count > 0:
+            self._pinned[upload.path] = count
+
+    def _upload_in_use(self, upload: VideoUpload) -> bool:
+        return upload.path in self._pinned or any(s.video_path == upload.path for s in self._sessions.values())
+
+    def _drop_upload(self, video_id: str):
+        _, upload = self._uploads.pop(video_id)
+        self._held -= upload.size
+        upload.discard()
+        self.evicted_uploads += 1
+
+    def _drop_session(self, session_id: str):
+        self._close_state(self._sessions.pop(session_id))
+        self.evicted_sessions += 1
+
+    def _close_state(self, state: AnalysisState):
+        state.close()
+        state.on_bytes = None  # a cancelled task finishing late no longer counts
+
+    def _add_bytes(self, delta: int):
+        self._held += delta
+
+    # ---- limits ----
+
+    @property
+    def held_bytes(self) -> int:
+        return self._held
+
+    def sweep(self, protect: str = None):
+        """Apply TTLs, then the session count and byte limits"""
+        now = self._last_sweep = time.monotonic()
+
+        for session_id, state in list(self._sessions.items()):
+            if session_id != protect and not state.busy and now - state.last_active > self.idle_ttl:
+                self._drop_session(session_id)
+        for video_id, (stored_at, upload) in list(self._uploads.items()):
+            if now - stored_at > self.upload_ttl and not self._upload_in_use(upload):
+                self._drop_upload(video_id)
+
+        while len(self._sessions) > self.max_sessions:
+            victim = self._pick_session(protect)
+            if victim is None:
+                break
+            self._drop_session(victim)
+
+        while self._held > self.max_bytes:
+            victim_upload = next((vid for vid, (_, u) in self._uploads.items() if not self._upload_in_use(u)), None)
+            if victim_upload is not None:
+                self._drop_upload(victim_upload)
+                continue
+            victim = self._pick_session(protect, holding_bytes=True)
+            if victim is None:
+                break
+            self._drop_session(victim)
+
+    def over_budget(self, session_id: str) -> bool:
+        """
+        Sweep if the held bytes have crossed max_bytes, e.g. as a chunked
+        upload grows, or if the last sweep is SWEEP_INTERVAL old (so TTLs
+        still expire during long uploads); True if the session still doesn't
+        fit afterwards.
+        """
+        if self._held > self.max_bytes or time.monotonic() - self._last_sweep > SWEEP_INTERVAL:
+            self.sweep(protect=session_id)
+        return self._held > self.max_bytes
+
+    def _pick_session(self, protect: str, holding_bytes: bool = False):
+        """Least recently used session, preferring idle ones"""
+        candidates = [sid for sid, s in self._sessions.items()
+                      if sid != protect and (s.held_bytes or not holding_bytes)]
+        idle = [sid for sid in candidates if not self._sessions[sid].busy]
+        return (idle or candidates or [None])[0]
+
+    def close_all(self):
+        for session_id in list(self._sessions):
+            self.close(session_id)
+        for video_id in list(self._uploads):
+            upload = self._uploads.pop(video_id)[1]
+            self._held -= upload.size
+            upload.discard()
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "active_analyses": sum(1 for s in self._sessions.values() if s.busy),
+            "uploads": len(self._uploads),
+            "bytes_held": self.held_bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "evicted_sessions": self.evicted_sessions,
+            "evicted_uploads": self.evicted_uploads,
+            "shared": self.shared is not None
+        }
+
+
+# Singleton instance
+session_store = SessionStore(
+    max_sessions=int(os.getenv("VERITAS_MAX_SESSIONS", "1000")),
+    idle_ttl=float(os.getenv("VERITAS_SESSION_TTL", "1800")),
+    upload_ttl=float(os.getenv("VERITAS_UPLOAD_TTL", "3600")),
+    max_bytes=int(os.getenv("VERITAS_SESSION_MAX_MB", "4096")) * 1024 * 1024,
+    shared=shared_state
+)
@@ -0,0 +1,321 @@
+"""
+VERITAS Shared State
+Key/value entries and append-only logs shared by every worker process and
+node, so sessions, learned signatures and cached verdicts survive a client
+reconnecting to a different worker.
+
+Backends (VERITAS_SHARED_STATE):
+    memory://                      single process (tests, development)
+    sqlite:///path/to/state.db     workers on one host (WAL mode)
+    redis://host:6379/0            any Redis-compatible server; needs `pip install redis`
+"""
+from concurrent.futures import ThreadPoolExecutor
+from lazy import LazySingleton
+from metrics import registry
+import asyncio
+import bisect
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+shared_state_errors = registry.counter(
+    "veritas_shared_state_errors_total", "Failed shared-state operations", ("op",))
+
+
+class SharedState:
+    """
+    Backend interface. Values are JSON documents; `ttl` is in seconds.
+    Logs are append-only streams read with an opaque cursor:
+    read_log(name, after=cursor) returns [(cursor, record)] in append order.
+
+    The public methods never raise: a failing backend is reported once,
+    then skipped for `retry_after` seconds (reads return their default), so
+    an outage degrades every worker to local state instead of failing
+    analyses.
+
+    They are blocking round trips, so code on the event loop goes through
+    run() (awaited) or submit() (fire-and-forget writes), which execute them
+    on one I/O thread: operations stay in order and a slow backend never
+    stalls the open sockets.
+    """
+
+    backend = None
+
+    def __init__(self, namespace: str = "veritas:", retry_after: float = 5.0):
+        self.namespace = namespace
+        self.retry_after = retry_after
+        self.errors = 0
+        self.last_error = None
+        self._down_until = 0.0
+        self._io = None  # created on first use
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._io is None:
+            self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"shared-{self.backend}")
+        return self._io
+
+    async def run(self, method: str, *args, **kwargs):
+        """Await a public method (e.g. run("get", key)) without blocking the event loop"""
+        call = functools.partial(getattr(self, method), *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), call)
+
+    def submit(self, method: str, *args, **kwargs):
+        """Queue a write from synchronous code; runs inline when no event loop is running"""
+        call = functools.partial(getattr(self, method), *args, **kwargs)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            call()
+            return
+        self._executor().submit(call)
+
+    def _call(self, op: str, fn, default=None):
+        if time.monotonic() < self._down_until:
+            return default
+        try:
+            result = fn()
+        except Exception as e:
+            self.errors += 1
+            shared_state_errors.inc(1, op)
+            if self.last_error is None:
+                print(f"⚠️ Shared state ({self.backend}) unavailable, using local state: {e}")
+            self.last_error = str(e)[:200]
+            self._down_until = time.monotonic() + self.retry_after
+            return default
+        if self.last_error is not None:
+            print(f"✓ Shared state ({self.backend}) reachable again")
+            self.last_error = None
+        return result
+
+    def get(self, key: str, default=None):
+        return self._call("get", lambda: self._get(self.namespace + key), default)
+
+    def set(self, key: str, value, ttl: float = None) -> bool:
+        return self._call("set", lambda: self._set(self.namespace + key, json.dumps(value), ttl) or True, False)
+
+    def delete(self, key: str):
+        self._call("delete", lambda: self._delete(self.namespace + key))
+
+    def append(self, log: str, record: dict, max_len: int = None) -> bool:
+        """Add a record to a log, keeping about the newest `max_len` entries"""
+        return self._call("append", lambda: self._append(self.namespace + log, json.dumps(record), max_len) or True,
+                          False)
+
+    def read_log(self, log: str, after=None, limit: int = 1000) -> list:
+        """Up to `limit` (cursor, record) entries appended after `after` (None: from the start)"""
+        return self._call("read_log", lambda: self._read_log(self.namespace + log, after, limit), [])
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "errors": self.errors,
+            "available": self.last_error is None,
+            "last_error": self.last_error
+        }
+
+    def close(self):
+        """Finish queued writes; backends then release their connection"""
+        if self._io is not None:
+            self._io.shutdown(wait=True)
+            self._io = None
+
+    # ---- implemented by backends (may raise) ----
+
+    def _get(self, key: str):
+        raise NotImplementedError
+
+    def _set(self, key: str, value: str, ttl: float):
+        raise NotImplementedError
+
+    def _delete(self, key: str):
+        raise NotImplementedError
+
+    def _append(self, log: str, value: str, max_len: int):
+        raise NotImplementedError
+
+    def _read_log(self, log: str, after, limit: int) -> list:
+        raise NotImplementedError
+
+
+class MemoryState(SharedState):
+    """In-process backend with the same semantics (values are copied through JSON)"""
+
+    backend = "memory"
+
+    async def run(self, method: str, *args, **kwargs):
+        return getattr(self, method)(*args, **kwargs)  # no I/O, no thread needed
+
+    def submit(self, method: str, *args, **kwargs):
+        getattr(self, method)(*args, **kwargs)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._values = {}  # key -> (expires, json)
+        self._logs = {}    # log -> ([seq], [json])
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key: str):
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires is not None and time.time() > expires:
+            self._values.pop(key, None)
+            return None
+        return json.loads(value)
+
+    def _set(self, key: str, value: str, ttl: float):
+        self._values[key] = (time.time() + ttl if ttl else None, value)
+
+    def _delete(self, key: str):
+        self._values.pop(key, None)
+
+    def _append(self, log: str, value: str, max_len: int):
+        with self._lock:
+            self._seq += 1
+            seqs, values = self._logs.setdefault(log, ([], []))
+            seqs.append(self._seq)
+            values.append(value)
+            if max_len and len(seqs) > max_len:
+                del seqs[:-max_len], values[:-max_len]
+
+    def _read_log(self, log: str, after, limit: int) -> list:
+        with self._lock:
+            seqs, values = self._logs.get(log, ([], []))
+            start = bisect.bisect_right(seqs, after or 0)
+            return [(seq, json.loads(value)) for seq, value in zip(seqs[start:start + limit], values[start:start + limit])]
+
+
+class SQLiteState(SharedState):
+    """
+    One SQLite file shared by the worker processes of a host. WAL mode lets
+    readers proceed while another process writes; expired keys and log
+    entries beyond max_len are purged every PURGE_EVERY writes.
+    """
+
+    backend = "sqlite"
+    PURGE_EVERY = 256
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._writes = 0
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS log (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                             "name TEXT NOT NULL, value TEXT NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS log_name_seq ON log (name, seq)")
+
+    def _purge_due(self) -> bool:
+        self._writes += 1
+        return self._writes % self.PURGE_EVERY == 0
+
+    def _get(self, key: str):
+        with self._lock:
+            row = self._db.execute("SELECT value, expires FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and time.time() > row[1]):
+            return None
+        return json.loads(row[0])
+
+    def _set(self, key: str, value: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                             (key, value, now + ttl if ttl else None))
+            if self._purge_due():
+                self._db.execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires < ?", (now,))
+
+    def _delete(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def _append(self, log: str, value: str, max_len: int):
+        with self._lock:
+            self._db.execute("INSERT INTO log (name, value) VALUES (?, ?)", (log, value))
+            if max_len and self._purge_due():
+                # AUTOINCREMENT never reuses a seq, so cursors stay valid after trimming
+                self._db.execute(
+                    "DELETE FROM log WHERE name = ? AND seq <= "
+                    "(SELECT seq FROM log WHERE name = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                    (log, log, max_len))
+
+    def _read_log(self, log: str, after, limit: int) -> list:
+        with self._lock:
+            rows = self._db.execute("SELECT seq, value FROM log WHERE name = ? AND seq > ? ORDER BY seq LIMIT ?",
+                                    (log, after or 0, limit)).fetchall()
+        return [(seq, json.loads(value)) for seq, value in rows]
+
+    def stats(self) -> dict:
+        return {**super().stats(), "path": self.path}
+
+    def close(self):
+        super().close()
+        with self._lock:
+            self._db.close()
+
+
+class RedisState(SharedState):
+    """
+    Redis (or any server speaking its protocol: Valkey, KeyDB, Dragonfly)
+    for workers on several nodes. Uses only GET/SET/DEL and streams
+    (XADD/XRANGE), so a stand-in such as fakeredis can be passed as `client`.
+    """
+
+    backend = "redis"
+
+    def __init__(self, url: str = None, client=None, **kwargs):
+        super().__init__(**kwargs)
+        if client is None:
+            import redis  # optional dependency, only needed for this backend
+            client = redis.Redis.from_url(url, decode_responses=True, socket_timeout=2, socket_connect_timeout=2)
+        self.client = client
+
+    def _get(self, key: str):
+        value = self.client.get(key)
+        return None if value is None else json.loads(value)
+
+    def _set(self, key: str, value: str, ttl: float):
+        self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def _delete(self, key: str):
+        self.client.delete(key)
+
+    def _append(self, log: str, value: str, max_len: int):
+        self.client.xadd(log, {"v": value}, maxlen=max_len, approximate=True)
+
+    def _read_log(self, log: str, after, limit: int) -> list:
+        # XRANGE's start is inclusive (the exclusive "(" form needs Redis 6.2)
+        entries = self.client.xrange(log, min=after or "-", count=limit + 1 if after else limit)
+        if after and entries and entries[0][0] == after:
+            entries = entries[1:]
+        return [(entry_id, json.loads(fields["v"])) for entry_id, fields in entries[:limit]]
+
+    def close(self):
+        super().close()
+        self.client.close()
+
+
+def open_state(url: str) -> SharedState:
+    """Backend for a VERITAS_SHARED_STATE url"""
+    if url in ("", "memory://"):
+        return MemoryState()
+    if url.startswith("sqlite:///"):
+        return SQLiteState(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisState(url)
+    raise ValueError(f"Unsupported VERITAS_SHARED_STATE url: {url}")
+
+
+# Singleton (built on first use); None keeps every store process-local
+SHARED_STATE_URL = os.getenv("VERITAS_SHARED_STATE", "")
+shared_state = LazySingleton(lambda: open_state(SHARED_STATE_URL), "shared_state") if SHARED_STATE_URL else None
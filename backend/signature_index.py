@@ -0,0 +1,432 @@
+"""
+VERITAS Signature Index
+Indexed store of known fake signatures for the learning loop.
+"""
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+import heapq
+import math
+import os
+import time
+import uuid
+
+from shared_state import shared_state
+
+SIGNATURE_LOG = "signatures"
+SYNC_BATCH = 1000  # log entries read per round trip
+MAX_FIELD_HITS = 64  # closest indexed values a field contributes to one match
+INDEX_BLOCK = 512    # entries per block of a _SortedIndex (split at twice this)
+
+# Pre-loaded known fake signatures (Learning Loop Database)
+SEED_SIGNATURES = [
+    {
+        "id": "sora_gravity_001",
+        "model": "OpenAI Sora",
+        "pattern": "gravity_deviation",
+        "description": "Objects fall 15-20% faster than Earth gravity",
+        "physics_signature": {"gravity_range": [11.5, 12.5], "typical_deviation": 18}
+    },
+    {
+        "id": "sora_water_002",
+        "model": "OpenAI Sora",
+        "pattern": "water_reflection",
+        "description": "Water reflections don't match object positions",
+        "physics_signature": {"reflection_error": 0.3}
+    },
+    {
+        "id": "kling_shadow_001",
+        "model": "Kling AI",
+        "pattern": "shadow_inconsistency",
+        "description": "Multiple shadow directions in single scene",
+        "physics_signature": {"shadow_variance": 25}
+    },
+    {
+        "id": "runway_momentum_001",
+        "model": "Runway Gen-3",
+        "pattern": "momentum_violation",
+        "description": "Collisions violate conservation of momentum",
+        "physics_signature": {"momentum_error": 0.4}
+    },
+    {
+        "id": "pika_pendulum_001",
+        "model": "Pika Labs",
+        "pattern": "pendulum_period",
+        "description": "Pendulum timing doesn't match length",
+        "physics_signature": {"period_error": 0.3}
+    },
+    {
+        "id": "midjourney_anatomy_001",
+        "model": "Midjourney",
+        "pattern": "hand_anatomy",
+        "description": "Incorrect finger count or impossible hand poses",
+        "physics_signature": {"finger_count_error": True}
+    }
+]
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _quantize(value: float, digits: int = 2) -> float:
+    """Round to `digits` significant figures so near-identical values collide"""
+    if value == 0:
+        return 0.0
+    return round(value, digits - 1 - int(math.floor(math.log10(abs(value)))))
+
+
+def signature_from_results(physics_results: list) -> dict:
+    """
+    Numeric physics_signature fields of the checks that failed in one
+    analysis. Values that passed their check describe real physics too, so
+    they are neither stored nor matched on.
+    """
+    observed = {}
+    for result in physics_results:
+        if result.get("status") != "VIOLATION":
+            continue
+        check = result.get("check")
+        if check in ("GRAVITY", "PENDULUM") and _is_number(result.get("calculated_g", result.get("measured"))):
+            observed["gravity"] = result.get("calculated_g", result.get("measured"))
+        elif check == "SHADOWS" and _is_number(result.get("variance")):
+            observed["shadow_variance"] = result["variance"]
+        elif check == "REFLECTIONS" and _is_number(result.get("reflection_error")):
+            observed["reflection_error"] = result["reflection_error"]
+    return observed
+
+
+class _SortedIndex:
+    """
+    Sorted (key, id) pairs kept in blocks of at most 2 * INDEX_BLOCK, so an
+    insert or removal shifts one block instead of the whole index: O(log n
+    + INDEX_BLOCK), which keeps loading millions of signatures near-linear.
+    """
+
+    __slots__ = ("_keys", "_ids", "_maxes")
+
+    def __init__(self):
+        self._keys = []   # blocks of sorted keys
+        self._ids = []    # the ids alongside each block
+        self._maxes = []  # last key of each block
+
+    def insert(self, key: float, sig_id: str):
+        if not self._maxes:
+            self._keys.append([key])
+            self._ids.append([sig_id])
+            self._maxes.append(key)
+            return
+        b = min(bisect_right(self._maxes, key), len(self._maxes) - 1)
+        keys, ids = self._keys[b], self._ids[b]
+        i = bisect_right(keys, key)
+        keys.insert(i, key)
+        ids.insert(i, sig_id)
+        self._maxes[b] = keys[-1]
+        if len(keys) > 2 * INDEX_BLOCK:
+            self._keys[b:b + 1] = [keys[:INDEX_BLOCK], keys[INDEX_BLOCK:]]
+            self._ids[b:b + 1] = [ids[:INDEX_BLOCK], ids[INDEX_BLOCK:]]
+            self._maxes[b:b + 1] = [keys[INDEX_BLOCK - 1], keys[-1]]
+
+    def remove(self, key: float, sig_id: str):
+        for b in range(bisect_left(self._maxes, key), len(self._maxes)):
+            keys, ids = self._keys[b], self._ids[b]
+            i = bisect_left(keys, key)
+            while i < len(keys) and keys[i] == key:
+                if ids[i] == sig_id:
+                    del keys[i]
+                    del ids[i]
+                    if keys:
+                        self._maxes[b] = keys[-1]
+                    else:
+                        del self._keys[b], self._ids[b], self._maxes[b]
+                    return
+                i += 1
+            if i < len(keys):
+                return
+
+    def ascending(self, value: float):
+        """(key, id) pairs with key >= value, smallest first"""
+        first = bisect_left(self._maxes, value)
+        for b in range(first, len(self._maxes)):
+            keys, ids = self._keys[b], self._ids[b]
+            for i in range(bisect_left(keys, value) if b == first else 0, len(keys)):
+                yield keys[i], ids[i]
+
+    def descending(self, value: float, inclusive: bool = False):
+        """(key, id) pairs with key < value (<= if inclusive), largest first"""
+        cut = bisect_right if inclusive else bisect_left
+        for b in range(min(cut(self._maxes, value), len(self._maxes) - 1), -1, -1):
+            keys, ids = self._keys[b], self._ids[b]
+            for i in range(cut(keys, value) - 1, -1, -1):
+                yield keys[i], ids[i]
+
+    def nearest(self, value: float, spread: float, limit: int) -> list:
+        """Up to `limit` ids with keys within `spread` of `value`, closest first: O(log n + limit)"""
+        below, above = self.descending(value), self.ascending(value)
+        left, right = next(below, None), next(above, None)
+        found = []
+        while len(found) < limit:
+            left_gap = value - left[0] if left else math.inf
+            right_gap = right[0] - value if right else math.inf
+            if min(left_gap, right_gap) > spread:
+                break
+            if left_gap <= right_gap:
+                found.append(left[1])
+                left = next(below, None)
+            else:
+                found.append(right[1])
+                right = next(above, None)
+        return found
+
+
+class SignatureIndex:
+    """
+    Known fake signatures with hash indexes on pattern and motion type and
+    sorted range indexes over numeric `physics_signature` fields, so a match
+    costs O(log n + k) instead of a scan over every stored signature.
+
+    Scalar fields match within a relative `tolerance`, and each observed
+    field contributes at most its `max_hits` closest values, so k stays
+    bounded even when thousands of signatures cluster around a typical
+    value (a gravity near 12 m/s², say); "<name>_range" fields
+    ([lo, hi]) are indexed as intervals on <name>, so gravity=11.8 hits
+    gravity_range=[11.5, 12.5]. Learned signatures that quantize to the same
+    key are merged (their `count` grows), and once `max_entries` is reached
+    the least recently seen learned signature is dropped; seeds are kept.
+
+    With a `shared` state backend, every learned signature is also appended
+    to a shared log, and each worker replays the other workers' entries
+    (await sync() before matching; it reads at most every `sync_interval`
+    seconds), so all of them learn from every analysis. Replays go through
+    the same merge path, so counts converge.
+    """
+
+    def __init__(self, seeds: list = None, max_entries: int = 100_000, tolerance: float = 0.1,
+                 shared=None, sync_interval: float = 1.0, max_hits: int = MAX_FIELD_HITS):
+        self.max_entries = max_entries
+        self.tolerance = tolerance
+        self.max_hits = max_hits
+        self.shared = shared
+        self.sync_interval = sync_interval
+        self.node_id = uuid.uuid4().hex[:12]
+        self._log_cursor = None
+        self._synced_at = None
+        self._syncing = False
+
+        self._signatures = OrderedDict()  # id -> signature, least recently seen first
+        self._pinned = set()
+        self._by_pattern = {}
+        self._by_motion = {}
+        self._by_key = {}                 # dedup key -> id
+        self._points = {}                 # field -> _SortedIndex of values
+        self._intervals = {}              # field -> _SortedIndex of interval starts
+        self._interval_ends = {}          # (field, id) -> interval end
+        self._max_width = {}              # field -> widest interval seen
+
+        self.merged = 0
+        self.evicted = 0
+        self.replayed = 0
+
+        for seed in seeds or []:
+            self._add(seed, pinned=True)
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __iter__(self):
+        return iter(self._signatures.values())
+
+    @staticmethod
+    def _fields(signature: dict):
+        """Yield (kind, field, value) for every indexable physics_signature entry"""
+        for name, value in (signature.get("physics_signature") or {}).items():
+            if name.endswith("_range") and isinstance(value, (list, tuple)) and len(value) == 2 \
+                    and all(_is_number(v) for v in value):
+                yield "interval", name[:-len("_range")], (min(value), max(value))
+            elif _is_number(value):
+                yield "point", name, value
+
+    def _dedup_key(self, signature: dict):
+        fields = tuple(sorted(
+            (kind, name, tuple(map(_quantize, value)) if kind == "interval" else _quantize(value))
+            for kind, name, value in self._fields(signature)
+        ))
+        return signature.get("pattern"), signature.get("motion_type"), fields
+
+    def add(self, signature: dict, pinned: bool = False):
+        """
+        Store a signature, or merge it into a near-identical one.
+        Returns (stored_signature, is_new).
+        """
+        stored, is_new = self._add(signature, pinned)
+        if self.shared is not None and not pinned:
+            self.shared.submit("append", SIGNATURE_LOG, {"origin": self.node_id, "signature": {**signature, "id": stored["id"]}},
+                               max_len=self.max_entries)
+        return stored, is_new
+
+    async def sync(self, force: bool = False) -> int:
+        """Replay signatures other workers added since the last sync; returns how many"""
+        if self.shared is None or self._syncing:
+            return 0  # one reader at a time, or entries would be replayed twice
+        now = time.monotonic()
+        if not force and self._synced_at is not None and now - self._synced_at < self.sync_interval:
+            return 0
+        self._synced_at = now
+
+        self._syncing = True
+        replayed = 0
+        try:
+            while True:
+                entries = await self.shared.run("read_log", SIGNATURE_LOG, after=self._log_cursor, limit=SYNC_BATCH)
+                for cursor, record in entries:
+                    self._log_cursor = cursor
+                    if record.get("origin") != self.node_id and isinstance(record.get("signature"), dict):
+                        self._add(record["signature"])
+                        replayed += 1
+                if len(entries) < SYNC_BATCH:
+                    break
+        finally:
+            self._syncing = False
+        self.replayed += replayed
+        return replayed
+
+    def _add(self, signature: dict, pinned: bool = False):
+        key = self._dedup_key(signature)
+        existing_id = self._by_key.get(key)
+        if existing_id is not None:
+            existing = self._signatures[existing_id]
+            existing["count"] = existing.get("count", 1) + 1
+            existing["last_seen"] = time.time()
+            self._signatures.move_to_end(existing_id)
+            self.merged += 1
+            return existing, False
+
+        signature = {**signature}
+        signature.setdefault("id", f"learned_{uuid.uuid4().hex[:12]}")
+        signature.setdefault("count", 1)
+        signature["last_seen"] = time.time()
+        sig_id = signature["id"]
+        if sig_id in self._signatures:
+            self._remove(sig_id)
+
+        self._signatures[sig_id] = signature
+        self._by_key[key] = sig_id
+        if pinned:
+            self._pinned.add(sig_id)
+        if signature.get("pattern"):
+            self._by_pattern.setdefault(signature["pattern"], set()).add(sig_id)
+        if signature.get("motion_type"):
+            self._by_motion.setdefault(signature["motion_type"], set()).add(sig_id)
+        for kind, name, value in self._fields(signature):
+            if kind == "interval":
+                lo, hi = value
+                self._intervals.setdefault(name, _SortedIndex()).insert(lo, sig_id)
+                self._interval_ends[(name, sig_id)] = hi
+                self._max_width[name] = max(self._max_width.get(name, 0.0), hi - lo)
+            else:
+                self._points.setdefault(name, _SortedIndex()).insert(value, sig_id)
+
+        while len(self._signatures) > self.max_entries:
+            victim = next((i for i in self._signatures if i not in self._pinned), None)
+            if victim is None:
+                break
+            self._remove(victim)
+            self.evicted += 1
+
+        return signature, True
+
+    def _remove(self, sig_id: str):
+        signature = self._signatures.pop(sig_id)
+        self._pinned.discard(sig_id)
+        self._by_key.pop(self._dedup_key(signature), None)
+        if signature.get("pattern"):
+            self._by_pattern.get(signature["pattern"], set()).discard(sig_id)
+        if signature.get("motion_type"):
+            self._by_motion.get(signature["motion_type"], set()).discard(sig_id)
+        for kind, name, value in self._fields(signature):
+            if kind == "interval":
+                self._intervals[name].remove(value[0], sig_id)
+                del self._interval_ends[(name, sig_id)]
+            else:
+                self._points[name].remove(value, sig_id)
+
+    def _field_hits(self, name: str, value: float) -> set:
+        hits = set()
+        points = self._points.get(name)
+        if points:
+            hits.update(points.nearest(value, abs(value) * self.tolerance, self.max_hits))
+        intervals = self._intervals.get(name)
+        if intervals:
+            # Only intervals starting within max_width below the value can contain it;
+            # walk back from the value so the cap keeps the closest starts
+            lowest = value - self._max_width[name]
+            found = 0
+            for start, sig_id in intervals.descending(value, inclusive=True):
+                if start < lowest:
+                    break
+                if self._interval_ends[(name, sig_id)] >= value:
+                    hits.add(sig_id)
+                    found += 1
+                    if found >= self.max_hits:
+                        break
+        return hits
+
+    def _field_matches(self, sig_id: str, name: str, value: float) -> bool:
+        fields = self._signatures[sig_id].get("physics_signature") or {}
+        point, interval = fields.get(name), fields.get(f"{name}_range")
+        if _is_number(point) and abs(point - value) <= abs(value) * self.tolerance:
+            return True
+        return isinstance(interval, (list, tuple)) and len(interval) == 2 \
+            and all(_is_number(v) for v in interval) and min(interval) <= value <= max(interval)
+
+    def match(self, observed: dict = None, pattern: str = None, motion_type: str = None, limit: int = 5) -> list:
+        """
+        Signatures matching the observed numeric fields, best first (most
+        fields matched, then most often seen). `pattern` / `motion_type`
+        restrict the result; with no observed fields they select on their own.
+        """
+        # Each field's closest hits are the candidates; each candidate is then
+        # scored on every observed field, not only the one that found it
+        observed = {name: value for name, value in (observed or {}).items() if _is_number(value)}
+        scores = {}
+        for name, value in observed.items():
+            for sig_id in self._field_hits(name, value):
+                if sig_id not in scores:
+                    scores[sig_id] = sum(self._field_matches(sig_id, other, v) for other, v in observed.items())
+
+        filters = []
+        if pattern is not None:
+            filters.append(self._by_pattern.get(pattern, set()))
+        if motion_type is not None:
+            filters.append(self._by_motion.get(motion_type, set()))
+
+        if observed:
+            candidates = set(scores)
+            for allowed in filters:
+                candidates &= allowed
+        elif filters:
+            candidates = set.intersection(*filters)
+        else:
+            return []
+
+        ranked = heapq.nlargest(limit, candidates, key=lambda i: (scores.get(i, 0), self._signatures[i].get("count", 1)))
+        return [self._signatures[i] for i in ranked]
+
+    def stats(self) -> dict:
+        return {
+            "signatures": len(self._signatures),
+            "pinned": len(self._pinned),
+            "indexed_fields": sorted(set(self._points) | set(self._intervals)),
+            "merged": self.merged,
+            "evicted": self.evicted,
+            "max_entries": self.max_entries,
+            "shared": self.shared is not None,
+            "replayed": self.replayed
+        }
+
+
+# Singleton instance
+signature_index = SignatureIndex(
+    seeds=SEED_SIGNATURES,
+    max_entries=int(os.getenv("VERITAS_MAX_SIGNATURES", "100000")),
+    shared=shared_state
+)
@@ -0,0 +1,208 @@
+"""
+VERITAS Vector Index
+Numeric feature vectors for physics signatures and nearest-neighbour search.
+"""
+import numpy as np
+
+EARTH_GRAVITY = 9.81
+
+# (field, scale): each feature is expressed in multiples of the tolerance the
+# corresponding physics check allows, so one unit means "just at the limit"
+# for every dimension and no single field dominates the distance. A missing
+# field encodes as 0, i.e. physically nominal.
+FEATURES = (
+    ("gravity", 1.5),           # m/s² from Earth (PhysicsEngine.GRAVITY_TOLERANCE)
+    ("shadow_variance", 15.0),  # deg² (check_shadow_consistency)
+    ("reflection_error", 0.1),  # fraction of frame (check_reflection_consistency)
+    ("momentum_error", 0.1),    # relative (check_momentum_conservation)
+    ("period_error", 0.15),     # relative (pendulum/projectile checks)
+    ("finger_count_error", 1.0),
+    ("text_error", 1.0),
+)
+FEATURE_NAMES = tuple(name for name, _ in FEATURES)
+
+
+def signature_vector(physics_signature: dict) -> np.ndarray:
+    """
+    Encode a physics_signature dict as a float32 feature vector.
+    Gravity may be given as `gravity`, `gravity_range` (midpoint) or
+    `typical_deviation` (percent from Earth gravity).
+    """
+    sig = physics_signature or {}
+    values = dict.fromkeys(FEATURE_NAMES, 0.0)
+
+    g = sig.get("gravity")
+    if g is None and isinstance(sig.get("gravity_range"), (list, tuple)) and len(sig["gravity_range"]) == 2:
+        g = sum(sig["gravity_range"]) / 2
+    if g is None and sig.get("typical_deviation") is not None:
+        g = EARTH_GRAVITY * (1 + float(sig["typical_deviation"]) / 100)
+    if g is not None:
+        values["gravity"] = float(g) - EARTH_GRAVITY
+
+    for name in FEATURE_NAMES[1:]:
+        value = sig.get(name)
+        if isinstance(value, bool):
+            values[name] = 1.0 if value else 0.0
+        elif isinstance(value, (int, float)):
+            values[name] = float(value)
+
+    return np.array([values[name] / scale for name, scale in FEATURES], dtype=np.float32)
+
+
+def _sq_distances(X: np.ndarray, X_sq: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """Squared L2 distances from q to every row of X, with ||x||² precomputed"""
+    return X_sq - 2 * (X @ q) + q @ q
+
+
+class _Bucket:
+    """Growable block of vectors with their squared norms and ids"""
+
+    __slots__ = ("vectors", "sq", "ids", "count")
+
+    def __init__(self, dim: int):
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.sq = np.empty(0, dtype=np.float32)
+        self.ids = []
+        self.count = 0
+
+    def extend(self, ids: list, vectors: np.ndarray):
+        n = self.count + len(vectors)
+        if n > len(self.vectors):
+            # Amortized doubling so adds are O(1) per vector
+            capacity = max(n, 2 * len(self.vectors), 16)
+            grown = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+            grown[:self.count] = self.vectors[:self.count]
+            sq = np.empty(capacity, dtype=np.float32)
+            sq[:self.count] = self.sq[:self.count]
+            self.vectors, self.sq = grown, sq
+        self.vectors[self.count:n] = vectors
+        self.sq[self.count:n] = np.einsum("ij,ij->i", vectors, vectors)
+        self.ids.extend(ids)
+        self.count = n
+
+    def distances(self, q: np.ndarray) -> np.ndarray:
+        return _sq_distances(self.vectors[:self.count], self.sq[:self.count], q)
+
+
+class VectorIndex:
+    """
+    Nearest-neighbour index over fixed-size float32 vectors.
+
+    Up to `exact_threshold` vectors every query is an exact brute-force scan
+    (one matrix-vector product). Above it the index switches to an IVF
+    layout: vectors are clustered into ~sqrt(n) lists with k-means, new
+    vectors are appended to the list of their nearest centroid, and a query
+    scans only the `n_probe` lists whose centroids are closest. Lists are
+    re-clustered whenever the index has doubled since the last build.
+    """
+
+    def __init__(self, dim: int, exact_threshold: int = 20_000, n_probe: int = 8, seed: int = 0):
+        self.dim = dim
+        self.exact_threshold = exact_threshold
+        self.n_probe = n_probe
+        self.seed = seed
+
+        self._flat = _Bucket(dim)
+        self._lists = None
+        self._centroids = None
+        self._centroid_sq = None
+        self._built = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def exact(self) -> bool:
+        return self._lists is None
+
+    def add(self, ids: list, vectors) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        ids = list(ids)
+        self._count += len(vectors)
+
+        if self.exact:
+            self._flat.extend(ids, vectors)
+            if self._count > self.exact_threshold:
+                self._build(self._flat.ids, self._flat.vectors[:self._flat.count])
+                self._flat = None
+            return
+
+        if self._count >= 2 * self._built:
+            all_ids = [i for bucket in self._lists for i in bucket.ids] + ids
+            all_vectors = np.concatenate([b.vectors[:b.count] for b in self._lists] + [vectors])
+            self._build(all_ids, all_vectors)
+            return
+
+        assign = self._assign(vectors, self._centroids)
+        for lst in np.unique(assign):
+            rows = np.flatnonzero(assign == lst)
+            self._lists[lst].extend([ids[r] for r in rows], vectors[rows])
+
+    def _build(self, ids: list, X: np.ndarray, iterations: int = 10, sample_per_list: int = 64):
+        """Cluster the vectors into ~sqrt(n) lists with k-means on a subsample"""
+        n_lists = max(int(np.sqrt(len(X))), 1)
+        rng = np.random.default_rng(self.seed)
+        sample = X[rng.choice(len(X), min(len(X), n_lists * sample_per_list), replace=False)]
+        centroids = sample[:n_lists].copy()
+
+        for _ in range(iterations):
+            assign = self._assign(sample, centroids)
+            counts = np.bincount(assign, minlength=n_lists)
+            nonempty = counts > 0
+            for d in range(self.dim):
+                sums = np.bincount(assign, weights=sample[:, d], minlength=n_lists)
+                centroids[nonempty, d] = sums[nonempty] / counts[nonempty]
+
+        assign = self._assign(X, centroids)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(n_lists + 1))
+        self._lists = []
+        for lst in range(n_lists):
+            rows = order[bounds[lst]:bounds[lst + 1]]
+            bucket = _Bucket(self.dim)
+            bucket.extend([ids[r] for r in rows], X[rows])
+            self._lists.append(bucket)
+
+        self._centroids = centroids
+        self._centroid_sq = np.einsum("ij,ij->i", centroids, centroids)
+        self._built = len(X)
+
+    @staticmethod
+    def _assign(X: np.ndarray, centroids: np.ndarray, block: int = 65536) -> np.ndarray:
+        c_sq = np.einsum("ij,ij->i", centroids, centroids)
+        out = np.empty(len(X), dtype=np.intp)
+        for start in range(0, len(X), block):
+            chunk = X[start:start + block]
+            out[start:start + block] = np.argmin(c_sq[None, :] - 2 * chunk @ centroids.T, axis=1)
+        return out
+
+    def search(self, query, k: int = 3) -> list:
+        """Return up to k (id, distance) pairs, nearest first"""
+        if self._count == 0:
+            return []
+        q = np.asarray(query, dtype=np.float32).reshape(self.dim)
+
+        if self.exact:
+            buckets = [self._flat]
+        else:
+            # Probe the nearest non-empty lists, so a query near empty
+            # clusters still scans n_probe lists' worth of vectors
+            c_dist = _sq_distances(self._centroids, self._centroid_sq, q)
+            counts = np.fromiter((b.count for b in self._lists), dtype=np.int64, count=len(self._lists))
+            c_dist[counts == 0] = np.inf
+            n_probe = min(self.n_probe, int(np.count_nonzero(counts)))
+            probe = np.argpartition(c_dist, n_probe - 1)[:n_probe]
+            buckets = [self._lists[p] for p in probe]
+
+        d = np.concatenate([b.distances(q) for b in buckets])
+        starts = np.cumsum([0] + [b.count for b in buckets])
+        k = min(k, len(d))
+        top = np.argpartition(d, k - 1)[:k] if k < len(d) else np.arange(len(d))
+        top = top[np.argsort(d[top])]
+
+        results = []
+        for i in top:
+            b = int(np.searchsorted(starts, i, side="right")) - 1
+            results.append((buckets[b].ids[i - starts[b]], float(np.sqrt(max(d[i], 0.0)))))
+        return results
@@ -0,0 +1,142 @@
+"""
+VERITAS Video Ingest
+Streams uploaded video to disk in chunks, hashing on the fly.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+import uuid
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+MAX_UPLOAD_BYTES = int(os.getenv("VERITAS_MAX_UPLOAD_MB", "500")) * 1024 * 1024
+UPLOAD_DIR = os.getenv("VERITAS_UPLOAD_DIR") or None
+
+
+class UploadError(ValueError):
+    """Raised when an upload is malformed or exceeds the size limit."""
+
+
+class VideoUpload:
+    """
+    A video being written to a temp file.
+    Memory use is bounded by the chunk size regardless of the clip length;
+    the sha256 is computed incrementally so the file never has to be re-read.
+    """
+
+    def __init__(self, suffix: str = ".mp4", max_bytes: int = MAX_UPLOAD_BYTES):
+        self.video_id = uuid.uuid4().hex
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.sha256 = None
+
+        fd, self.path = tempfile.mkstemp(suffix=suffix, prefix="veritas_", dir=UPLOAD_DIR)
+        self._file = os.fdopen(fd, "wb")
+        self._hasher = hashlib.sha256()
+
+    @property
+    def complete(self) -> bool:
+        return self.sha256 is not None
+
+    def write(self, chunk: bytes):
+        if self._file is None:
+            raise UploadError("Upload already finished")
+        if self.size + len(chunk) > self.max_bytes:
+            self.discard()
+            raise UploadError(f"Video exceeds {self.max_bytes // (1024 * 1024)} MB limit")
+
+        self._file.write(chunk)
+        self._hasher.update(chunk)
+        self.size += len(chunk)
+
+    def finish(self) -> str:
+        """Close the file and return the content hash."""
+        if self._file is None:
+            raise UploadError("Upload already finished")
+        if self.size == 0:
+            self.discard()
+            raise UploadError("Empty upload")
+
+        self._file.close()
+        self._file = None
+        self.sha256 = self._hasher.hexdigest()
+        return self.sha256
+
+    def discard(self):
+        """Abort the upload and delete the temp file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def describe(self) -> dict:
+        return {"video_id": self.video_id, "size": self.size, "sha256": self.sha256}
+
+
+class LocalVideo:
+    """
+    A video already on disk (batch jobs), presented like a finished
+    VideoUpload. The file belongs to the caller and is never deleted.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.video_id = uuid.uuid4().hex
+        self.size = 0
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                hasher.update(chunk)
+                self.size += len(chunk)
+        self.sha256 = hasher.hexdigest()
+
+    @property
+    def complete(self) -> bool:
+        return True
+
+    def discard(self):
+        pass
+
+    def describe(self) -> dict:
+        return {"video_id": self.video_id, "size": self.size, "sha256": self.sha256}
+
+
+def ingest_base64(video_base64: str) -> VideoUpload:
+    """
+    Decode a base64 video (optionally a data: URL) straight to disk.
+    Decodes slice by slice so only one chunk of decoded bytes is held at a time.
+    """
+    if video_base64.startswith("data:") and "," in video_base64:
+        video_base64 = video_base64.split(",", 1)[1]
+
+    upload = VideoUpload()
+    # Slice length must be a multiple of 4 to decode independently
+    step = (CHUNK_SIZE // 3) * 4
+    try:
+        for start in range(0, len(video_base64), step):
+            upload.write(base64.b64decode(video_base64[start:start + step], validate=True))
+        upload.finish()
+    except binascii.Error as e:
+        upload.discard()
+        raise UploadError("Malformed base64 video data") from e
+    return upload
+
+
+async def ingest_upload_file(file) -> VideoUpload:
+    """Stream a FastAPI UploadFile to disk without reading it into memory."""
+    upload = VideoUpload(suffix=os.path.splitext(file.filename or "")[1] or ".mp4")
+    try:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            upload.write(chunk)
+        upload.finish()
+    except Exception:
+        upload.discard()
+        raise
+    return upload
@@ -0,0 +1,276 @@
+"""
+VERITAS Video Reducer
+Shrinks a clip to what the model needs before it is sent to Gemini: frames
+sampled over the motion at a rate that fits a token budget, cropped to the
+region around the moving subject, and downscaled so each frame costs a
+single image tile.
+"""
+from collections import OrderedDict
+import asyncio
+import math
+import os
+
+import numpy as np
+
+from motion_tracker import cv2, iter_frames, MotionTracker, ANALYSIS_WIDTH
+
+TOKENS_PER_TILE = 258     # Gemini tokens per image tile
+SINGLE_TILE_SIDE = 384    # images within 384x384 are one tile
+TILE_SIDE = 768           # larger images are cut into 768x768 tiles
+SOURCE_WIDTH = 768        # frames kept for cropping are stored at (at most) this width
+CROP_PADDING = 0.25       # margin around the subject's motion box, relative to its size
+MIN_CROP = 0.4            # a crop keeps at least this fraction of each dimension
+MAX_CROP_AREA = 0.8       # crops covering more of the frame than this are not worth it
+SPAN_PADDING = 0.25       # seconds kept before and after the motion
+JPEG_QUALITY = 85
+
+TOKEN_BUDGET = int(os.getenv("VERITAS_VIDEO_TOKEN_BUDGET", "8000"))
+MAX_SIDE = int(os.getenv("VERITAS_VIDEO_MAX_SIDE", str(SINGLE_TILE_SIDE)))
+MAX_FPS = float(os.getenv("VERITAS_VIDEO_MAX_FPS", "10"))
+CROP = os.getenv("VERITAS_VIDEO_CROP", "1") != "0"
+
+
+def frame_tokens(width: int, height: int) -> int:
+    """Gemini's token cost of one image of this size"""
+    if max(width, height) <= SINGLE_TILE_SIDE:
+        return TOKENS_PER_TILE
+    return TOKENS_PER_TILE * math.ceil(width / TILE_SIDE) * math.ceil(height / TILE_SIDE)
+
+
+def crop_box(boxes: list, padding: float = CROP_PADDING, min_size: float = MIN_CROP):
+    """
+    Region covering the subject's motion boxes ((x, y, w, h), normalized),
+    padded and clamped to the frame. The 5th-95th percentile of the box
+    edges is used so a few stray blobs do not blow the crop up. Returns
+    (x, y, w, h) or None when cropping would save little.
+    """
+    if not boxes:
+        return None
+    boxes = np.asarray(boxes, dtype=float)
+    low = 5 if len(boxes) >= 10 else 0
+    x0 = np.percentile(boxes[:, 0], low)
+    y0 = np.percentile(boxes[:, 1], low)
+    x1 = np.percentile(boxes[:, 0] + boxes[:, 2], 100 - low)
+    y1 = np.percentile(boxes[:, 1] + boxes[:, 3], 100 - low)
+
+    region = []
+    for lo, hi in ((x0, x1), (y0, y1)):
+        margin = (hi - lo) * padding
+        lo, hi = lo - margin, hi + margin
+        if hi - lo < min_size:
+            center = (lo + hi) / 2
+            lo, hi = center - min_size / 2, center + min_size / 2
+        # Shift back inside the frame (keeping the size) before clamping
+        if lo < 0.0:
+            lo, hi = 0.0, hi - lo
+        if hi > 1.0:
+            lo, hi = lo - (hi - 1.0), 1.0
+        region.append((max(lo, 0.0), hi))
+
+    (x0, x1), (y0, y1) = region
+    if (x1 - x0) * (y1 - y0) > MAX_CROP_AREA:
+        return None
+    return float(x0), float(y0), float(x1 - x0), float(y1 - y0)
+
+
+def reduce_video(video_path: str, token_budget: int = TOKEN_BUDGET, max_side: int = MAX_SIDE,
+                 max_fps: float = MAX_FPS, crop: bool = CROP, progress=None) -> dict:
+    """
+    One decode pass that tracks the subject (MotionTracker) and keeps frames
+    on a time grid of at most `max_fps`; the grid spacing doubles whenever
+    more frames are held than the budget could use, so memory stays bounded
+    for clips of any length. Afterwards the frames inside the motion span are
+    cropped to the subject, downscaled to `max_side` and as many as
+    `token_budget` allows are picked evenly and JPEG-encoded.
+
+    Returns {"frames": [jpeg bytes], "timestamps", "crop", "size", "tokens",
+    "track": MotionTracker.result()}. Runs in a CPU worker process.
+    """
+    if cv2 is None:
+        raise RuntimeError("opencv-python is not installed")
+
+    max_frames = max(1, token_budget // TOKENS_PER_TILE)
+    tracker = MotionTracker()
+    boxes = []   # (t, x, y, w, h) of the dominant blob
+    kept = []    # (t, source frame) on the sampling grid
+    step = 1.0 / max_fps
+    for _, t, frame, _, energy, is_cut, source in iter_frames(video_path, ANALYSIS_WIDTH, progress,
+                                                              keep_source=True):
+        box = tracker.update(t, frame, energy, is_cut)
+        if box is not None:
+            boxes.append((t, *box))
+        if not kept or t - kept[-1][0] >= step - 1e-6:
+            h, w = source.shape[:2]
+            if w > SOURCE_WIDTH:
+                # Bilinear is enough here: the final downscale (INTER_AREA) does the filtering
+                source = cv2.resize(source, (SOURCE_WIDTH, int(h * SOURCE_WIDTH / w)), interpolation=cv2.INTER_LINEAR)
+            kept.append((t, source))
+            if len(kept) > 2 * max_frames:
+                step *= 2
+                kept = kept[::2]
+
+    track = tracker.result()
+    result = {"frames": [], "timestamps": [], "crop": None, "size": None, "tokens": 0, "track": track}
+    if not kept:
+        return result
+
+    # Only the motion (plus a little context) is worth tokens
+    if len(track["t"]) >= 2:
+        lo, hi = track["t"].min() - SPAN_PADDING, track["t"].max() + SPAN_PADDING
+        in_span = [k for k in kept if lo <= k[0] <= hi]
+        kept = in_span or kept
+        boxes = [b[1:] for b in boxes if lo <= b[0] <= hi]
+    else:
+        boxes = []
+    region = crop_box(boxes) if crop else None
+
+    height, width = kept[0][1].shape[:2]
+    if region is not None:
+        x, y, w, h = region
+        left, top = int(x * width), int(y * height)
+        right, bottom = max(int((x + w) * width), left + 1), max(int((y + h) * height), top + 1)
+    else:
+        left, top, right, bottom = 0, 0, width, height
+    scale = min(1.0, max_side / max(right - left, bottom - top))
+    size = (max(1, round((right - left) * scale)), max(1, round((bottom - top) * scale)))
+
+    per_frame = frame_tokens(*size)
+    count = max(1, min(len(kept), token_budget // per_frame))
+    picks = sorted(set(np.linspace(0, len(kept) - 1, count).round().astype(int).tolist()))
+
+    for i in picks:
+        t, source = kept[i]
+        image = source[top:bottom, left:right]
+        if image.shape[1] != size[0] or image.shape[0] != size[1]:
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if ok:
+            result["frames"].append(jpeg.tobytes())
+            result["timestamps"].append(round(float(t), 3))
+
+    result.update(crop=region, size=size, tokens=per_frame * len(result["frames"]))
+    return result
+
+
+class ReducedVideo:
+    """The frames sent to Gemini in place of the clip, and how they map back to it"""
+
+    __slots__ = ("frames", "timestamps", "crop", "size", "tokens", "bytes")
+
+    def __init__(self, frames: list, timestamps: list, crop, size, tokens: int):
+        self.frames = frames
+        self.timestamps = timestamps
+        self.crop = crop
+        self.size = size
+        self.tokens = tokens
+        self.bytes = sum(len(frame) for frame in frames)
+
+    @classmethod
+    def from_result(cls, result: dict):
+        if not result["frames"]:
+            return None
+        return cls(result["frames"], result["timestamps"], result["crop"], result["size"], result["tokens"])
+
+    def parts(self) -> list:
+        """Gemini content parts: a timestamp label before each frame"""
+        from google.genai import types
+
+        parts = []
+        for t, frame in zip(self.timestamps, self.frames):
+            parts.append(types.Part.from_text(text=f"t={t:.2f}s"))
+            parts.append(types.Part.from_bytes(data=frame, mime_type="image/jpeg"))
+        return parts
+
+    def prompt_note(self) -> str:
+        note = (f"The video is given as {len(self.frames)} frames, each preceded by its timestamp; "
+                "use these timestamps for t.")
+        if self.crop is not None:
+            note += (" The frames are cropped to the region around the moving subject: give x/y relative "
+                     "to the frames as shown, and heights for what the frames show.")
+        return note
+
+    def to_full_frame(self, point: dict) -> dict:
+        """A point in (cropped) frame coordinates, in the coordinates of the whole clip"""
+        if self.crop is None:
+            return point
+        x, y, w, h = self.crop
+        return {**point, "x": round(x + point["x"] * w, 4), "y": round(y + point["y"] * h, 4)}
+
+    def full_frame_height(self, height):
+        """Real-world height of the whole frame given that of the cropped one"""
+        if self.crop is None or not height:
+            return height
+        return height / self.crop[3]
+
+    def describe(self) -> dict:
+        return {
+            "frames": len(self.frames),
+            "size": list(self.size),
+            "tokens": self.tokens,
+            "bytes": self.bytes,
+            "cropped": self.crop is not None
+        }
+
+
+class ReducedVideoCache:
+    """
+    LRU of prepared videos by content key, bounded by bytes. Concurrent
+    requests for the same key (the detection and trajectory prompts, or two
+    sessions uploading the same clip) share one reduction.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (bytes, value)
+        self._inflight = {}
+        self.held_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(video_hash: str, token_budget: int = TOKEN_BUDGET, max_side: int = MAX_SIDE,
+            max_fps: float = MAX_FPS, crop: bool = CROP) -> str:
+        return f"{video_hash}:{token_budget}:{max_side}:{max_fps}:{int(crop)}"
+
+    async def get_or_create(self, key: str, factory, size_of=lambda value: 0):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done, size_of))
+        # Shielded: one cancelled analysis must not cancel the reduction for the others
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task, size_of):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        value = task.result()
+        size = size_of(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (size, value)
+        self.held_bytes += size
+        while self.held_bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self.held_bytes -= evicted
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.held_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+# Singleton instance
+reduced_cache = ReducedVideoCache(max_bytes=int(os.getenv("VERITAS_REDUCED_CACHE_MB", "256")) * 1024 * 1024)
@@ -1,60 +1,60 @@
-import os
-import time
-from google import genai
-from dotenv import load_dotenv
-import json
-
-load_dotenv()
+from gemini_client import gemini
+from lazy import LazySingleton
+from worker_pool import cpu_pool
+from video_reducer import reduce_video, reduced_cache, ReducedVideo
+import motion_tracker
 
 class VisionEngine:
     """
     The Eyes of VERITAS.
-    Uses Gemini 1.5 Pro to watch video and extract physics data (x, y, t).
+    Tracks motion locally with OpenCV and falls back to Gemini to extract
+    physics data (x, y, t).
     """
     
     def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
+        if not gemini.available:
             print("⚠️ WARNING: GEMINI_API_KEY not found in .env")
-            self.client = None
-        else:
-            self.client = genai.Client(api_key=self.api_key)
+        if not motion_tracker.available():
+            print("⚠️ WARNING: opencv-python not installed - local motion tracking disabled")
 
-    def extract_motion_data(self, video_path: str):
+    async def prepare_video(self, video_path: str, video_hash: str = None, progress=None):
         """
-        Uploads video to Gemini and asks for frame-by-frame coordinates.
+        Track the subject and reduce the clip to the frames sent to Gemini, in
+        one decode pass on the CPU worker pool. Returns {"track", "reduced"}:
+        the track holds "t", "x", "y" arrays in normalized image coordinates
+        (top-left origin, y down), or "error", and "reduced" is a ReducedVideo
+        or None when Gemini tracked the clip. Results are cached by content
+        hash so the detection and trajectory prompts (and later uploads of the
+        same clip) share one reduction.
         """
-        if not self.client:
+        if not motion_tracker.available():
+            return {"track": await self._extract_with_gemini(video_path), "reduced": None}
+
+        async def reduce():
+            print(f"👁️ Vision Engine reducing locally: {video_path}")
+            result = await cpu_pool.submit(reduce_video, video_path, progress=progress)
+            return {"track": {**result["track"], "source": "local_tracking"},
+                    "reduced": ReducedVideo.from_result(result)}
+
+        try:
+            if video_hash is None:
+                return await reduce()
+            return await reduced_cache.get_or_create(
+                reduced_cache.key(video_hash), reduce,
+                size_of=lambda prepared: prepared["reduced"].bytes if prepared["reduced"] else 0)
+        except ValueError as e:
+            return {"track": {"error": str(e)}, "reduced": None}
+
+    async def _extract_with_gemini(self, video_path: str):
+        """
+        Placeholder for tracking through Gemini (uploading the clip with the
+        File API). Without OpenCV there is no local track, and the trajectory
+        prompt supplies the points instead.
+        """
+        if not gemini.available:
             return {"error": "API Key missing"}
 
         print(f"👁️ Vision Engine processing: {video_path}")
-        
-        # 1. Upload Video
-        # In a real impl, we would use File API:
-        # video_file = self.client.files.upload(path=video_path)
-        
-        # 2. Vision Prompt
-        prompt = """
-        Dynamic Physics Analysis Request:
-        Track the center of mass of the primary moving object in this video.
-        Output a JSON object with a list of "frames":
-        {
-            "frames": [
-                {"timestamp": 0.0, "x": 0.5, "y": 0.5},
-                {"timestamp": 0.033, "x": 0.51, "y": 0.48},
-                ...
-            ]
-        }
-        Coordinate System: Normalized (0-1), Top-Left origin.
-        """
-        
-        # Mocking the call for now as we don't have a real video to upload
-        # response = self.client.models.generate_content(
-        #     model="gemini-2.0-flash-exp",
-        #     contents=[video_file, prompt]
-        # )
-        
-        # return json.loads(response.text)
         return {"status": "MOCK_VISION_DATA_READY"}
 
-vision_kernel = VisionEngine()
+vision_kernel = LazySingleton(VisionEngine, "vision_kernel")
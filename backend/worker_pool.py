@@ -0,0 +1,129 @@
+"""
+VERITAS Worker Pool
+Process pool for CPU-heavy analysis stages (decoding, tracking, fitting).
+"""
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import itertools
+import multiprocessing
+import os
+
+
+class QueueFull(RuntimeError):
+    """Raised by submit(block=False) when every pending slot is taken."""
+
+
+def _run_job(progress_queue, job_id, fn, args):
+    """Executed in a worker process; forwards progress through the shared queue."""
+    def report(fraction):
+        progress_queue.put((job_id, fraction))
+    return fn(*args, progress=report)
+
+
+class CPUWorkerPool:
+    """
+    Runs CPU-bound functions in worker processes so the event loop only
+    does socket I/O.
+
+    At most `max_pending` jobs are queued or running; further submitters wait
+    for a slot (or get QueueFull when not blocking), which pushes back on new
+    analyses instead of growing an unbounded backlog. Jobs receive a
+    `progress(fraction)` callable whose reports are delivered to the
+    submitter's callback on the event loop. The pump that delivers them
+    holds a default-executor thread only while jobs are in flight.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None):
+        self.workers = workers or int(os.getenv("VERITAS_CPU_WORKERS", "0")) or os.cpu_count() or 1
+        self.max_pending = max_pending or int(os.getenv("VERITAS_CPU_QUEUE", "0")) or self.workers * 4
+
+        # Created on first use so importing this module (including in the
+        # worker processes themselves) has no side effects
+        self._executor = None
+        self._manager = None
+        self._progress_queue = None
+        self._pump_task = None
+        self._slots = None
+
+        self._job_ids = itertools.count(1)
+        self._callbacks = {}
+        self.pending = 0
+
+    def _start(self):
+        ctx = multiprocessing.get_context("spawn")
+        self._manager = ctx.Manager()
+        self._progress_queue = self._manager.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+        self._slots = asyncio.Semaphore(self.max_pending)
+
+    async def _pump(self):
+        """Deliver progress reports from worker processes to their callbacks."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                item = await loop.run_in_executor(None, self._progress_queue.get)
+            except (EOFError, OSError):
+                return  # manager shut down
+            if item is None:
+                if not self.pending:
+                    return  # idle: give the thread back until the next submit
+                continue
+            job_id, fraction = item
+            callback = self._callbacks.get(job_id)
+            if callback is None:
+                continue
+            try:
+                result = callback(fraction)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                print(f"⚠️ Progress callback failed: {e}")
+
+    async def submit(self, fn, *args, progress=None, block: bool = True):
+        """
+        Run fn(*args, progress=...) in a worker process and return its result.
+        `fn` must be a picklable module-level function.
+        """
+        if self._executor is None:
+            self._start()
+        if not block and self._slots.locked():
+            raise QueueFull(f"{self.max_pending} CPU jobs already pending")
+
+        async with self._slots:
+            job_id = next(self._job_ids)
+            if progress:
+                self._callbacks[job_id] = progress
+            self.pending += 1
+            if self._pump_task is None or self._pump_task.done():
+                self._pump_task = asyncio.create_task(self._pump())
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(
+                    self._executor, _run_job, self._progress_queue, job_id, fn, args
+                )
+            finally:
+                self.pending -= 1
+                self._callbacks.pop(job_id, None)
+                if not self.pending:
+                    # Wake the pump so it can stop (a manager round trip, kept off the loop)
+                    loop.run_in_executor(None, self._progress_queue.put, None)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "started": self._executor is not None
+        }
+
+    def shutdown(self):
+        if self._executor is None:
+            return
+        self._progress_queue.put(None)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._manager.shutdown()
+        self._executor = None
+
+
+# Singleton instance
+cpu_pool = CPUWorkerPool()
@@ -0,0 +1,158 @@
+"""
+VERITAS Write Buffer
+Write-behind batching for slow storage backends.
+"""
+import atexit
+import threading
+import time
+
+
+class WriteBehindBuffer:
+    """
+    Collects records and hands them to `flush_fn(records)` in batches from a
+    background thread, so callers on the request path only pay for a list
+    append.
+
+    A batch is written once `max_batch` records are pending or the oldest
+    has waited `max_delay` seconds. Records of a failed batch are put back
+    (up to `max_pending`, oldest dropped first) and retried with the next
+    batch. Once a record has been in `max_attempts` failed batches, its
+    batch is written in halves and the records that still fail on their own
+    are dropped, so one record the backend rejects cannot hold up the rest.
+    close() - also registered with atexit - stops the thread after a final
+    flush.
+    """
+
+    def __init__(self, flush_fn, max_batch: int = 64, max_delay: float = 2.0,
+                 max_pending: int = 10_000, max_attempts: int = 5, name: str = "write-buffer"):
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.name = name
+
+        self._pending = []  # (record, failed attempts)
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+
+        atexit.register(self.close)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def append(self, record):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed")
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((record, 0))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if len(self._pending) >= self.max_batch:
+                        break
+                    if self._pending:
+                        remaining = self._oldest + self.max_delay - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+            if not self.flush():
+                # Back off instead of hammering a failing backend
+                with self._cond:
+                    self._cond.wait(self.max_delay)
+
+    def _take(self) -> list:
+        with self._cond:
+            batch, self._pending = self._pending, []
+            self._oldest = None
+            return batch
+
+    def flush(self) -> bool:
+        """Write everything pending now (also used for read-your-writes); False if a batch failed"""
+        with self._flush_lock:
+            batch = self._take()
+            for start in range(0, len(batch), self.max_batch):
+                chunk = batch[start:start + self.max_batch]
+                try:
+                    self.flush_fn([record for record, _ in chunk])
+                except Exception as e:
+                    self.failures += 1
+                    if max(attempts for _, attempts in chunk) + 1 >= self.max_attempts:
+                        self._write_split(chunk)
+                        continue
+                    print(f"⚠️ {self.name}: batch of {len(chunk)} failed ({e}), will retry")
+                    self._requeue([(record, attempts + 1) for record, attempts in chunk]
+                                  + batch[start + self.max_batch:])
+                    return False
+                self.written += len(chunk)
+                self.batches += 1
+        return True
+
+    def _write_split(self, entries: list):
+        """Write a batch that keeps failing in halves; a record that fails alone is dropped"""
+        middle = len(entries) // 2
+        for part in (entries[:middle], entries[middle:]):
+            if not part:
+                continue
+            try:
+                self.flush_fn([record for record, _ in part])
+            except Exception as e:
+                if len(part) > 1:
+                    self._write_split(part)
+                else:
+                    self.dropped += 1
+                    print(f"⚠️ {self.name}: dropping a record after {self.max_attempts} failed attempts ({e})")
+                continue
+            self.written += len(part)
+            self.batches += 1
+
+    def _requeue(self, entries: list):
+        with self._cond:
+            self._pending = entries + self._pending
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                del self._pending[:overflow]
+                self.dropped += overflow
+            if self._pending and self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def close(self):
+        """Final flush and stop the background thread"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "written": self.written,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dropped": self.dropped
+        }
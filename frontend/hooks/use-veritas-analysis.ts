@@ -16,6 +16,10 @@ interface AnalysisMessage {
     reason?: string;
     objects?: Array<{ id: number; type: string; confidence: number }>;
     points?: Array<{ t: number; x: number; y: number }>;
+    point?: { t: number; x: number; y: number };
+    index?: number;
+    session_id?: string;
+    resumed?: boolean;
 }
 
 interface UseVeritasAnalysisReturn {
@@ -29,12 +33,19 @@ interface UseVeritasAnalysisReturn {
     objects: Array<{ id: number; type: string; confidence: number }>;
     trajectory: Array<{ t: number; x: number; y: number }>;
     startAnalysis: (videoData?: string) => void;
+    uploadVideo: (file: File) => Promise<void>;
     sendUserResponse: (response: string) => void;
     reset: () => void;
 }
 
+// Video is streamed to the backend as binary WebSocket frames of this size
+const UPLOAD_CHUNK_SIZE = 1024 * 1024;
+const MAX_BUFFERED_BYTES = 8 * UPLOAD_CHUNK_SIZE;
+
 export function useVeritasAnalysis(): UseVeritasAnalysisReturn {
     const wsRef = useRef<WebSocket | null>(null);
+    // Sent back on reconnect so any backend worker can resume the session
+    const sessionIdRef = useRef<string | null>(null);
     const [isConnected, setIsConnected] = useState(false);
     const [isAnalyzing, setIsAnalyzing] = useState(false);
     const [messages, setMessages] = useState<Array<{ level: string; message: string }>>([]);
@@ -48,7 +59,8 @@ export function useVeritasAnalysis(): UseVeritasAnalysisReturn {
     const connect = useCallback(() => {
         if (wsRef.current?.readyState === WebSocket.OPEN) return;
 
-        const ws = new WebSocket("ws://localhost:8000/ws/analyze");
+        const query = sessionIdRef.current ? `?session_id=${encodeURIComponent(sessionIdRef.current)}` : "";
+        const ws = new WebSocket(`ws://localhost:8000/ws/analyze${query}`);
 
         ws.onopen = () => {
             setIsConnected(true);
@@ -64,6 +76,10 @@ export function useVeritasAnalysis(): UseVeritasAnalysisReturn {
             const data: AnalysisMessage = JSON.parse(event.data);
 
             switch (data.type) {
+                case "session":
+                    sessionIdRef.current = data.session_id || null;
+                    break;
+
                 case "log":
                     setMessages(prev => [...prev, { level: data.level || "agent", message: data.message || "" }]);
                     break;
@@ -81,6 +97,14 @@ export function useVeritasAnalysis(): UseVeritasAnalysisReturn {
                     setTrajectory(data.points || []);
                     break;
 
+                case "trajectory_point":
+                    // Streamed ahead of trajectory_data, which replaces them
+                    if (data.point) {
+                        const point = data.point;
+                        setTrajectory(prev => (data.index === 0 ? [point] : [...prev, point]));
+                    }
+                    break;
+
                 case "physics_update":
                     setPhysics({
                         gravity: data.gravity || 0,
@@ -131,6 +155,23 @@ export function useVeritasAnalysis(): UseVeritasAnalysisReturn {
         }));
     }, [connect]);
 
+    const uploadVideo = useCallback(async (file: File) => {
+        const ws = wsRef.current;
+        if (!ws || ws.readyState !== WebSocket.OPEN) return;
+
+        ws.send(JSON.stringify({ type: "upload_start", filename: file.name, size: file.size }));
+
+        for (let offset = 0; offset < file.size; offset += UPLOAD_CHUNK_SIZE) {
+            // Respect socket backpressure so large clips never sit in memory
+            while (ws.bufferedAmount > MAX_BUFFERED_BYTES) {
+                await new Promise(resolve => setTimeout(resolve, 20));
+            }
+            ws.send(await file.slice(offset, offset + UPLOAD_CHUNK_SIZE).arrayBuffer());
+        }
+
+        ws.send(JSON.stringify({ type: "upload_end" }));
+    }, []);
+
     const sendUserResponse = useCallback((response: string) => {
         if (!wsRef.current || wsRef.current.readyState !== WebSocket.OPEN) return;
 
@@ -169,6 +210,7 @@ export function useVeritasAnalysis(): UseVeritasAnalysisReturn {
         objects,
         trajectory,
         startAnalysis,
+        uploadVideo,
         sendUserResponse,
         reset
     };